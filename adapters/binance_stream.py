@@ -0,0 +1,108 @@
+import os
+import time
+import json
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from utils.http import get_session
+
+# Mode streaming opsional: langganan combined stream miniTicker Binance untuk
+# sekumpulan simbol dan simpan price book di memori. get_crypto_price_idr
+# membaca dari sini tanpa round trip; kalau harga basi/tidak ada, tetap jatuh
+# ke rantai REST biasa.
+#
+# Config (env):
+#   BINANCE_STREAM_SYMBOLS  "BTC,ETH,SOL" (kosong = mode streaming mati)
+#   BINANCE_WS_URL          base URL WebSocket (default wss://stream.binance.com:9443;
+#                           bisa diarahkan ke server WebSocket lokal untuk tes)
+#   BINANCE_STREAM_STALE    detik sebelum harga dianggap basi (default 15)
+
+_SYMBOLS = [s.strip().upper() for s in os.getenv("BINANCE_STREAM_SYMBOLS", "").split(",") if s.strip()]
+_WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443").rstrip("/")
+_STALE_AFTER = float(os.getenv("BINANCE_STREAM_STALE", "15"))
+_RECONNECT_MIN, _RECONNECT_MAX = 1.0, 30.0
+
+log = logging.getLogger(__name__)
+
+_book: Dict[str, Tuple[float, float]] = {}  # SYMBOL -> (usd, monotonic ts)
+_task: Optional[asyncio.Task] = None
+_state = {"connected": False, "messages": 0, "reconnects": 0, "last_error": None}
+
+def stream_price_usd(symbol: str) -> Optional[float]:
+    """Harga USDT dari price book, atau None kalau tidak ada / basi."""
+    entry = _book.get(symbol.upper())
+    if entry is None:
+        return None
+    usd, ts = entry
+    if time.monotonic() - ts > _STALE_AFTER:
+        return None
+    return usd
+
+def _stream_url() -> str:
+    streams = "/".join(f"{s.lower()}usdt@miniTicker" for s in _SYMBOLS)
+    return f"{_WS_URL}/stream?streams={streams}"
+
+def _handle(raw: str):
+    msg = json.loads(raw)
+    data = msg.get("data", msg)
+    pair = data.get("s") or ""
+    close = data.get("c")
+    if pair.endswith("USDT") and close is not None:
+        _book[pair[:-4]] = (float(close), time.monotonic())
+        _state["messages"] += 1
+
+async def _consume():
+    backoff = _RECONNECT_MIN
+    while True:
+        try:
+            async with get_session().ws_connect(_stream_url(), heartbeat=20) as ws:
+                _state["connected"] = True
+                backoff = _RECONNECT_MIN
+                while True:
+                    # Tidak ada pesan selama STALE -> anggap koneksi macet, reconnect.
+                    msg = await ws.receive(timeout=_STALE_AFTER)
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        try:
+                            _handle(msg.data)
+                        except (ValueError, TypeError):
+                            continue
+                    elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED,
+                                      aiohttp.WSMsgType.ERROR):
+                        break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _state["last_error"] = f"{type(e).__name__}: {e}"
+            log.warning("stream error: %s", _state["last_error"])
+        _state["connected"] = False
+        _state["reconnects"] += 1
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, _RECONNECT_MAX)
+
+def start_stream():
+    global _task
+    if _SYMBOLS and _task is None:
+        _task = asyncio.create_task(_consume())
+
+async def stop_stream():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    _state["connected"] = False
+
+def stream_stats():
+    now = time.monotonic()
+    return {
+        **_state,
+        "enabled": bool(_SYMBOLS),
+        "symbols": _SYMBOLS,
+        "fresh": sorted(s for s, (_, ts) in _book.items() if now - ts <= _STALE_AFTER),
+    }
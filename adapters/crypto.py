@@ -1,7 +1,16 @@
-import yfinance as yf
-import requests
+import os
+import asyncio
+from typing import Dict, List, Set
+
+from utils import health, history
 from utils.cache import cached
+from utils.executor import run_blocking
+from utils.http import get_json
+from utils.hedge import hedge_config, ordered_attempts, race
+from utils.quota import QuotaExceeded, busy_result
 from .fx import get_fx_rate
+from .binance_stream import stream_price_usd
+from .yahoo_chart import chart_last
 
 _COINGECKO_MAP = {
     "BTC": "bitcoin",
@@ -23,7 +32,15 @@ _COINGECKO_MAP = {
     "LTC": "litecoin"
 }
 
+# Base URL API (override untuk server lokal, mis. bench/load_bench.py)
+COINGECKO_URL = os.getenv("COINGECKO_URL", "https://api.coingecko.com").rstrip("/")
+BINANCE_URL = os.getenv("BINANCE_URL", "https://api.binance.com").rstrip("/")
+
+# Urutan provider & hedge delay (override: HEDGE_ORDER_CRYPTO / HEDGE_DELAY_CRYPTO)
+CRYPTO_ORDER, CRYPTO_HEDGE_DELAY = hedge_config("crypto", ["yahoo_chart", "coingecko", "binance", "yfinance"], 0.5)
+
 def _yf_price_usd(symbol: str):
+    import yfinance as yf  # lazy: pandas/numpy hanya saat fallback ini jalan
     t = yf.Ticker(f"{symbol}-USD")
     hist = t.history(period="1d", interval="1m")
     if hist is None or hist.empty:
@@ -32,56 +49,192 @@ def _yf_price_usd(symbol: str):
         return None
     return float(hist["Close"].dropna().iloc[-1])
 
-def _coingecko_price_usd(symbol: str):
-    try:
-        coin_id = _COINGECKO_MAP.get(symbol.upper(), symbol.lower())
-        r = requests.get("https://api.coingecko.com/api/v3/simple/price",
-                         params={"ids": coin_id, "vs_currencies": "usd"},
-                         timeout=8)
-        if r.ok:
-            data = r.json()
-            val = data.get(coin_id, {}).get("usd")
-            return float(val) if val is not None else None
-    except Exception:
-        return None
+async def _yahoo_chart_price_usd(symbol: str):
+    return (await chart_last(f"{symbol.upper()}-USD", range_="1d", interval="1m"))[0]
+
+async def _coingecko_price_usd(symbol: str):
+    # Error jaringan/429 dibiarkan raise: race() mencatatnya ke utils.health.
+    coin_id = _COINGECKO_MAP.get(symbol.upper(), symbol.lower())
+    data = await get_json("coingecko", f"{COINGECKO_URL}/api/v3/simple/price",
+                          params={"ids": coin_id, "vs_currencies": "usd"},
+                          timeout=8)
+    if data:
+        val = data.get(coin_id, {}).get("usd")
+        return float(val) if val is not None else None
     return None
 
-def _binance_price_usd(symbol: str):
+async def _binance_price_usd(symbol: str):
     """Fetch price from Binance public API in USDT (≈ USD)."""
+    # Map common symbols directly to USDT pairs
+    pair = f"{symbol.upper()}USDT"
+    data = await get_json("binance", f"{BINANCE_URL}/api/v3/ticker/price",
+                          params={"symbol": pair}, timeout=8)
+    if data:
+        price = data.get("price")
+        if price is not None:
+            return float(price)  # USDT ≈ USD
+    return None
+
+# Fungsi batch di bawah menambahkan simbol yang ditahan kuota kita sendiri ke
+# `throttled`, supaya get_crypto_prices_idr bisa menjawab busy_result() untuk
+# simbol itu, bukan "No data".
+
+async def _coingecko_prices_usd(symbols: List[str], throttled: Set[str]) -> Dict[str, float]:
+    """Satu request simple/price untuk banyak ids sekaligus."""
+    ids = {sym: _COINGECKO_MAP.get(sym, sym.lower()) for sym in symbols}
     try:
-        # Map common symbols directly to USDT pairs
-        pair = f"{symbol.upper()}USDT"
-        r = requests.get("https://api.binance.com/api/v3/ticker/price",
-                         params={"symbol": pair}, timeout=8)
-        if r.ok:
-            price = r.json().get("price")
-            if price is not None:
-                return float(price)  # USDT ≈ USD
+        data = await health.track("coingecko", lambda: get_json(
+            "coingecko", f"{COINGECKO_URL}/api/v3/simple/price",
+            params={"ids": ",".join(sorted(set(ids.values()))), "vs_currencies": "usd"},
+            timeout=8))
+    except QuotaExceeded:
+        throttled.update(symbols)
+        return {}
+    except Exception:
+        return {}
+    out = {}
+    for sym, coin_id in ids.items():
+        val = (data or {}).get(coin_id, {}).get("usd")
+        if val is not None:
+            out[sym] = float(val)
+    return out
+
+async def _binance_prices_usd(symbols: List[str], throttled: Set[str]) -> Dict[str, float]:
+    """
+    Satu request ticker/price tanpa parameter (semua pair). Parameter `symbols`
+    ditolak Binance kalau ada satu saja pair yang tidak dikenal, jadi ambil
+    semua lalu filter.
+    """
+    try:
+        data = await health.track("binance", lambda: get_json(
+            "binance", f"{BINANCE_URL}/api/v3/ticker/price", timeout=8))
+    except QuotaExceeded:
+        throttled.update(symbols)
+        return {}
+    except Exception:
+        return {}
+    wanted = {f"{sym}USDT": sym for sym in symbols}
+    out = {}
+    for row in data or []:
+        sym = wanted.get(row.get("symbol"))
+        if sym and row.get("price") is not None:
+            out[sym] = float(row["price"])  # USDT ≈ USD
+    return out
+
+async def _yahoo_chart_prices_usd(symbols: List[str], throttled: Set[str]) -> Dict[str, float]:
+    async def one(sym):
+        try:
+            return sym, await health.track("yahoo_chart", lambda: _yahoo_chart_price_usd(sym))
+        except QuotaExceeded:
+            throttled.add(sym)
+            return sym, None
+        except Exception:
+            return sym, None
+    pairs = await asyncio.gather(*(one(s) for s in symbols))
+    return {sym: usd for sym, usd in pairs if usd is not None}
+
+async def _yf_prices_usd(symbols: List[str], throttled: Set[str]) -> Dict[str, float]:
+    async def one(sym):
+        try:
+            return sym, await health.track("yfinance", lambda: run_blocking("yfinance", _yf_price_usd, sym))
+        except QuotaExceeded:
+            throttled.add(sym)
+            return sym, None
+        except Exception:
+            return sym, None
+    pairs = await asyncio.gather(*(one(s) for s in symbols))
+    return {sym: usd for sym, usd in pairs if usd is not None}
+
+async def _usdidr_rate():
+    try:
+        fx = await get_fx_rate("USDIDR")
+        return fx["rate"] if fx.get("ok") else None
     except Exception:
         return None
-    return None
 
-@cached(ttl=45)
-async def get_crypto_price_idr(symbol: str):
+@cached(ttl=45, persist=True)
+async def get_crypto_price_idr_rest(symbol: str):
     sym = symbol.upper().strip()
-    usd = None
-    # 1) Yahoo
+    # Yahoo chart / CoinGecko / Binance / yfinance di-race dengan hedging
+    attempts = ordered_attempts(CRYPTO_ORDER, {
+        "yahoo_chart": lambda: _yahoo_chart_price_usd(sym),
+        "yfinance": lambda: run_blocking("yfinance", _yf_price_usd, sym),
+        "coingecko": lambda: _coingecko_price_usd(sym),
+        "binance": lambda: _binance_price_usd(sym),
+    })
     try:
-        usd = _yf_price_usd(sym)
-    except Exception:
-        usd = None
-    # 2) CoinGecko
-    if usd is None:
-        usd = _coingecko_price_usd(sym)
-    # 3) Binance
-    if usd is None:
-        usd = _binance_price_usd(sym)
+        _, usd = await race(attempts, CRYPTO_HEDGE_DELAY)
+    except QuotaExceeded:
+        return busy_result()
     if usd is None:
         return {"ok": False, "error": "No data from Yahoo, CoinGecko, or Binance"}
     # Convert to IDR
-    try:
-        fx = await get_fx_rate("USDIDR")
-        idr = usd * fx["rate"] if fx.get("ok") else None
-    except Exception:
-        idr = None
-    return {"ok": True, "usd": usd, "idr": idr}
+    rate = await _usdidr_rate()
+    return {"ok": True, "usd": usd, "idr": usd * rate if rate else None}
+
+async def get_crypto_price_idr(symbol: str):
+    """
+    Harga dari price book WebSocket Binance kalau aktif dan masih segar
+    (tanpa network), selain itu rantai REST ber-cache.
+    """
+    sym = symbol.upper().strip()
+    usd = stream_price_usd(sym)
+    if usd is not None:
+        history.record("crypto", sym, usd)
+        rate = await _usdidr_rate()
+        return {"ok": True, "usd": usd, "idr": usd * rate if rate else None}
+    return await get_crypto_price_idr_rest(sym)
+
+async def get_crypto_prices_idr(symbols: List[str], refresh: bool = False) -> Dict[str, dict]:
+    """
+    Batch: {SYMBOL: hasil seperti get_crypto_price_idr}. Simbol yang ada di
+    price book WebSocket atau masih ada di cache tidak di-fetch; sisanya pakai satu request CoinGecko, lalu
+    satu request Binance untuk yang belum ketemu, lalu chart JSON Yahoo per
+    simbol (yfinance hanya untuk sisa terakhir). Konversi IDR memakai satu lookup USDIDR, dan hasil sukses
+    mengisi cache per simbol. Simbol yang tidak ketemu karena ditahan kuota
+    mendapat busy_result() (tidak di-cache). refresh=True mengabaikan cache (prefetch).
+    """
+    syms = list(dict.fromkeys(s.upper().strip() for s in symbols if s.strip()))
+    results: Dict[str, dict] = {}
+    missing = []
+    streamed = {}
+    for sym in syms:
+        found, val = (False, None) if refresh else get_crypto_price_idr_rest.peek(sym)
+        if found:
+            results[sym] = val
+        elif stream_price_usd(sym) is not None:
+            streamed[sym] = stream_price_usd(sym)
+        else:
+            missing.append(sym)
+
+    if streamed:
+        rate = await _usdidr_rate()
+        for sym, usd in streamed.items():
+            history.record("crypto", sym, usd)
+            results[sym] = {"ok": True, "usd": usd, "idr": usd * rate if rate else None}
+
+    if missing:
+        throttled: Set[str] = set()
+        usd = await _coingecko_prices_usd(missing, throttled)
+        rest = [s for s in missing if s not in usd]
+        if rest:
+            usd.update(await _binance_prices_usd(rest, throttled))
+            rest = [s for s in rest if s not in usd]
+        if rest:
+            usd.update(await _yahoo_chart_prices_usd(rest, throttled))
+            rest = [s for s in rest if s not in usd]
+        if rest:
+            usd.update(await _yf_prices_usd(rest, throttled))
+
+        rate = await _usdidr_rate()
+        for sym in missing:
+            if sym in usd:
+                res = {"ok": True, "usd": usd[sym], "idr": usd[sym] * rate if rate else None}
+                get_crypto_price_idr_rest.prime(res, sym)
+            elif sym in throttled:
+                res = busy_result()
+            else:
+                res = {"ok": False, "error": "No data from CoinGecko, Binance, or Yahoo"}
+            results[sym] = res
+
+    return {sym: results[sym] for sym in syms}
@@ -1,75 +1,188 @@
-import yfinance as yf
-import requests
+import os
+import time
+import asyncio
+from typing import Dict, List, Optional
+
 from utils.cache import cached
+from utils.executor import run_blocking
+from utils.http import get_json
+from utils.hedge import hedge_config, ordered_attempts, race
+from utils.quota import QuotaExceeded, busy_result
 from utils.sheets import get_setting
+from .yahoo_chart import chart_last
+
+# Kode mata uang yang dikenali untuk klasifikasi pair (mis. di watchlist)
+FX_CODES = {
+    "USD", "IDR", "EUR", "JPY", "SGD", "GBP", "AUD", "CNY", "HKD", "MYR",
+    "THB", "KRW", "CHF", "CAD", "NZD", "INR", "PHP", "SAR", "AED", "TWD", "VND",
+}
+
+# Base URL API (override untuk server lokal, mis. bench/load_bench.py)
+EXCHANGERATE_HOST_URL = os.getenv("EXCHANGERATE_HOST_URL", "https://api.exchangerate.host").rstrip("/")
+OPEN_ER_API_URL = os.getenv("OPEN_ER_API_URL", "https://open.er-api.com").rstrip("/")
+
+# Urutan provider & hedge delay (override: HEDGE_ORDER_FX / HEDGE_DELAY_FX)
+FX_ORDER, FX_HEDGE_DELAY = hedge_config("fx", ["yahoo_chart", "exchangerate_host", "yfinance"], 0.5)
+
+# Tabel kurs berbasis USD: satu request per refresh, pair apa pun diturunkan
+# lewat triangulasi (EURIDR = IDR/USD ÷ EUR/USD). Rantai per-pair di atas
+# hanya dipakai kalau tabel tidak tersedia atau tidak memuat kodenya.
+#   FX_TABLE_TTL                detik tabel di-cache (default 300)
+#   HEDGE_ORDER_FX_TABLE / HEDGE_DELAY_FX_TABLE  urutan & hedge sumber tabel
+FX_TABLE_TTL = int(os.getenv("FX_TABLE_TTL", "300"))
+FX_TABLE_ORDER, FX_TABLE_HEDGE_DELAY = hedge_config("fx_table", ["exchangerate_host", "open_er_api"], 1.0)
 
 def _yf_rate(symbol: str):
+    import yfinance as yf  # lazy: pandas/numpy hanya saat fallback ini jalan
     t = yf.Ticker(symbol)
     hist = t.history(period="1d")
     if hist is None or hist.empty:
         return None
     return float(hist["Close"].dropna().iloc[-1])
 
-def _yahoo_chart_rate(symbol: str):
-    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
-    params = {"range": "5d", "interval": "1d"}
-    headers = {"User-Agent": "Mozilla/5.0"}
-    r = requests.get(url, params=params, headers=headers, timeout=8)
-    if not r.ok:
+async def _yahoo_chart_rate(symbol: str):
+    return (await chart_last(symbol))[0]
+
+async def _erh_rate(base: str, quote: str):
+    data = await get_json("exchangerate_host", f"{EXCHANGERATE_HOST_URL}/latest",
+                          params={"base": base, "symbols": quote}, timeout=6)
+    rate = (data or {}).get("rates", {}).get(quote)
+    return float(rate) if rate is not None else None
+
+# ===== Tabel USD =====
+def _clean_rates(raw) -> Optional[Dict[str, float]]:
+    rates = {}
+    for code, val in (raw or {}).items():
+        try:
+            if val:
+                rates[str(code).upper()] = float(val)
+        except (TypeError, ValueError):
+            continue
+    if not rates:
         return None
-    data = r.json()
-    result = (data or {}).get("chart", {}).get("result")
-    if not result:
+    rates["USD"] = 1.0
+    return rates
+
+async def _erh_table():
+    data = await get_json("exchangerate_host", f"{EXCHANGERATE_HOST_URL}/latest",
+                          params={"base": "USD"}, timeout=6)
+    rates = _clean_rates((data or {}).get("rates"))
+    return {"rates": rates, "ts": (data or {}).get("timestamp")} if rates else None
+
+async def _open_er_table():
+    data = await get_json("open_er_api", f"{OPEN_ER_API_URL}/v6/latest/USD", timeout=6)
+    if (data or {}).get("result") != "success":
         return None
-    r0 = result[0]
-    closes = r0.get("indicators", {}).get("quote", [{}])[0].get("close", [])
-    closes = [c for c in closes if c is not None]
-    if not closes:
+    rates = _clean_rates(data.get("rates"))
+    return {"rates": rates, "ts": data.get("time_last_update_unix")} if rates else None
+
+@cached(ttl=FX_TABLE_TTL, persist=True)
+async def get_fx_table():
+    """
+    Return {"ok": True, "base": "USD", "rates": {KODE: unit per USD},
+    "ts": epoch data provider (atau waktu fetch), "source": provider}.
+    """
+    attempts = ordered_attempts(FX_TABLE_ORDER, {
+        "exchangerate_host": _erh_table,
+        "open_er_api": _open_er_table,
+    })
+    try:
+        source, table = await race(attempts, FX_TABLE_HEDGE_DELAY)
+    except QuotaExceeded:
+        return busy_result()
+    if table is None:
+        return {"ok": False, "error": "No USD rate table from exchangerate.host or open.er-api.com"}
+    return {"ok": True, "base": "USD", "rates": table["rates"],
+            "ts": float(table["ts"] or time.time()), "source": source}
+
+async def _usd_idr_override() -> Optional[float]:
+    try:
+        manual = await get_setting("usd_idr_override")
+        return float(manual) if manual else None
+    except Exception:
         return None
-    return float(closes[-1])
 
-def _erh_rate(base: str, quote: str):
+async def _table_rates() -> Optional[dict]:
+    """Tabel dengan usd_idr_override diterapkan, atau None kalau tidak ada."""
     try:
-        r = requests.get("https://api.exchangerate.host/latest", params={"base": base, "symbols": quote}, timeout=6)
-        if r.ok:
-            data = r.json()
-            return float(data["rates"][quote])
+        table = await get_fx_table()
     except Exception:
         return None
-    return None
+    if not table.get("ok"):
+        return None
+    manual = await _usd_idr_override()
+    if manual:
+        table = {**table, "rates": {**table["rates"], "IDR": manual}}
+    return table
 
-@cached(ttl=60)
+def cross_rate(rates: Dict[str, float], base: str, quote: str) -> Optional[float]:
+    """Kurs base->quote dari tabel unit-per-USD."""
+    if base not in rates or quote not in rates:
+        return None
+    return rates[quote] / rates[base]
+
+def _from_table(table: Optional[dict], base: str, quote: str) -> Optional[dict]:
+    if table is None:
+        return None
+    rate = cross_rate(table["rates"], base, quote)
+    if not rate:
+        return None
+    return {"ok": True, "rate": rate, "ts": table["ts"], "source": table["source"]}
+
+def _split_pair(pair: str):
+    pair = pair.upper().replace("=X", "").replace("/", "").strip()
+    return pair, pair[:3], pair[3:]
+
+# ===== Public API =====
+@cached(ttl=60, persist=True)
 async def get_fx_rate(pair: str):
-    pair = pair.upper().replace("=X","")
-    base, quote = pair[:3], pair[3:]
+    pair, base, quote = _split_pair(pair)
     yf_symbol = f"{base}{quote}=X"
     # 0) Manual override from Sheets (usd_idr_override etc)
+    if base == "USD" and quote == "IDR":
+        manual = await _usd_idr_override()
+        if manual:
+            return {"ok": True, "rate": manual, "source": "override"}
+    # 0b) Triangulasi dari tabel USD (satu request untuk semua pair)
+    res = _from_table(await _table_rates(), base, quote)
+    if res:
+        return res
+    # 1) Yahoo Chart API, 2) exchangerate.host, 3) yfinance — di-race
+    attempts = ordered_attempts(FX_ORDER, {
+        "yfinance": lambda: run_blocking("yfinance", _yf_rate, yf_symbol),
+        "yahoo_chart": lambda: _yahoo_chart_rate(yf_symbol),
+        "exchangerate_host": lambda: _erh_rate(base, quote),
+    })
     try:
-        if base == "USD" and quote == "IDR":
-            manual = await get_setting("usd_idr_override")
-            if manual:
-                return {"ok": True, "rate": float(manual)}
-    except Exception:
-        pass
-    # 1) Yahoo via yfinance
-    try:
-        rate = _yf_rate(yf_symbol)
-        if rate:
-            return {"ok": True, "rate": rate}
-    except Exception:
-        pass
-    # 2) Yahoo Chart API
-    try:
-        rate = _yahoo_chart_rate(yf_symbol)
-        if rate:
-            return {"ok": True, "rate": rate}
-    except Exception:
-        pass
-    # 3) exchangerate.host fallback
-    try:
-        rate = _erh_rate(base, quote)
-        if rate:
-            return {"ok": True, "rate": rate}
-    except Exception:
-        pass
+        _, rate = await race(attempts, FX_HEDGE_DELAY, is_valid=bool)
+    except QuotaExceeded:
+        return busy_result()
+    if rate:
+        return {"ok": True, "rate": rate}
     return {"ok": False, "error": "No data from Yahoo (yfinance/chart) or exchangerate.host; consider setting 'usd_idr_override' in Sheet"}
+
+async def get_fx_rates(pairs: List[str], refresh: bool = False) -> Dict[str, dict]:
+    """
+    Batch: {PAIR: hasil seperti get_fx_rate}. Semua pair dihitung dari satu
+    tabel USD; yang tidak tercakup tabel jatuh ke get_fx_rate per pair.
+    refresh=True mengambil ulang tabel (prefetch).
+    """
+    norm = list(dict.fromkeys(_split_pair(p)[0] for p in pairs if p.strip()))
+    if refresh:
+        await get_fx_table.refresh_key(get_fx_table.key_for())
+    table = await _table_rates()
+    results: Dict[str, dict] = {}
+    rest = []
+    for pair in norm:
+        _, base, quote = _split_pair(pair)
+        res = _from_table(table, base, quote)
+        if res is None:
+            rest.append(pair)
+            continue
+        get_fx_rate.prime(res, pair)
+        results[pair] = res
+    if rest:
+        singles = await asyncio.gather(*(get_fx_rate(p) for p in rest), return_exceptions=True)
+        for pair, res in zip(rest, singles):
+            results[pair] = res if isinstance(res, dict) else {"ok": False, "error": str(res)}
+    return {pair: results[pair] for pair in norm}
@@ -1,16 +1,15 @@
-import re
-from typing import Optional, List
-
-import aiohttp
-from bs4 import BeautifulSoup
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
 
+from utils import health, metrics, quota
 from utils.cache import cached
+from utils.http import get_conditional
 from utils.sheets import get_setting
 from .fx import get_fx_rate
-
-# ===== Helpers =====
-_IDR_NUM = re.compile(r"[^0-9]")
-_RP_REGEX = re.compile(r"Rp\s*[0-9\.\,]+", re.I)
+from .gold_extract import extract_antam, extract_sweep
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
@@ -21,123 +20,148 @@ HEADERS = {
     "Cache-Control": "no-cache",
 }
 
-def _parse_idr(text: str) -> Optional[int]:
-    if not text:
-        return None
-    digits = _IDR_NUM.sub("", text)
-    try:
-        return int(digits) if digits else None
-    except Exception:
-        return None
-
-def _pick_reasonable(values: List[int]) -> Optional[int]:
-    """
-    Pilih angka yang 'masuk akal' untuk harga per gram ritel Indonesia.
-    Biasanya 900k - 3.0M (tergantung kondisi pasar).
-    Kita pilih nilai terkecil yang >= 800k untuk menghindari harga per-mg.
-    """
-    vals = sorted(v for v in values if 800_000 <= v <= 3_500_000)
-    return vals[0] if vals else None
-
-async def _fetch_html(session: aiohttp.ClientSession, url: str) -> str:
-    async with session.get(url, timeout=25, headers=HEADERS) as resp:
-        resp.raise_for_status()
-        return await resp.text()
+log = logging.getLogger(__name__)
+
+# ===== Sumber =====
+# (nama, provider, url, extractor) — urutan = prioritas.
+# URL bisa dioverride (GOLD_URL_ANTAM / _PEGADAIAN / _HARGAEMAS) untuk server lokal.
+SOURCES = [
+    ("Antam", "antam",
+     os.getenv("GOLD_URL_ANTAM", "https://www.logammulia.com/id/harga-emas-hari-ini"), extract_antam),
+    ("Pegadaian", "pegadaian",
+     os.getenv("GOLD_URL_PEGADAIAN", "https://www.pegadaian.co.id/harga-emas-hari-ini"), extract_sweep),
+    # harga-emas.org sering menampilkan 1 gram
+    ("HargaEmas.org", "hargaemas",
+     os.getenv("GOLD_URL_HARGAEMAS", "https://harga-emas.org/1-gram/"), extract_sweep),
+]
+
+# Detik menunggu sumber berprioritas lebih tinggi sebelum memakai hasil yang
+# sudah ada dari sumber lain.
+GOLD_DEADLINE = float(os.getenv("GOLD_DEADLINE", "8"))
+# Nilai terakhir yang baik per sumber dipakai selama belum lebih tua dari ini.
+GOLD_LAST_GOOD_MAX_AGE = float(os.getenv("GOLD_LAST_GOOD_MAX_AGE", str(6 * 3600)))
+
+# url -> (etag, last_modified, nilai hasil parse)
+_validators: Dict[str, Tuple[Optional[str], Optional[str], int]] = {}
+# nama sumber -> (nilai, monotonic ts)
+_last_good: Dict[str, Tuple[int, float]] = {}
+_refresh_task: Optional[asyncio.Task] = None
 
 # ===== Scrapers =====
-async def _scrape_antam_idr(session: aiohttp.ClientSession) -> Optional[int]:
-    url = "https://www.logammulia.com/id/harga-emas-hari-ini"
-    try:
-        html = await _fetch_html(session, url)
-        soup = BeautifulSoup(html, "lxml")
-
-        # Pola 1: tabel dengan atribut data-title
-        td = soup.find("td", attrs={"data-title": re.compile(r"Harga Emas per Gram", re.I)})
-        if td and td.text.strip():
-            val = _parse_idr(td.text)
-            if val:
-                print("[gold] Antam: ketemu via data-title =", val)
-                return val
-
-        # Pola 2: cari label + next Rp…
-        label = soup.find(string=re.compile(r"Harga Emas per Gram", re.I))
-        if label:
-            nxt = label.parent.find_next(string=_RP_REGEX)
-            if nxt:
-                val = _parse_idr(nxt)
-                if val:
-                    print("[gold] Antam: ketemu via label-sibling =", val)
-                    return val
-
-        # Pola 3: regex sweeping semua 'Rp ...'
-        texts = soup.find_all(string=_RP_REGEX)
-        candidates = [_parse_idr(t) for t in texts]
-        candidates = [c for c in candidates if c]
-        val = _pick_reasonable(candidates)
-        if val:
-            print("[gold] Antam: ketemu via regex fallback =", val)
-            return val
-
-        print("[gold] Antam: tidak ketemu selector manapun")
-        return None
-    except Exception as e:
-        print(f"[gold] Antam error: {e}")
+async def _fetch_source(name: str, provider: str, url: str, extract) -> Optional[int]:
+    """Conditional GET; 304 memakai nilai parse sebelumnya tanpa parse ulang."""
+    etag, last_mod, prev = _validators.get(url, (None, None, None))
+    status, html, etag, last_mod = await get_conditional(
+        provider, url, etag=etag, last_modified=last_mod, headers=HEADERS, timeout=25)
+    if status == 304 and prev:
+        log.debug("%s: 304 not modified = %s", name, prev)
+        metrics.GOLD_SOURCE.inc(name, "not_modified")
+        return prev
+    val, how = extract(html)
+    if not val:
+        log.info("%s: tidak menemukan angka yang wajar", name)
+        metrics.GOLD_SOURCE.inc(name, "no_value")
         return None
+    log.debug("%s: ketemu via %s = %s", name, how, val)
+    metrics.GOLD_SOURCE.inc(name, "ok")
+    if etag or last_mod:
+        _validators[url] = (etag, last_mod, val)
+    return val
 
-async def _scrape_pegadaian_idr(session: aiohttp.ClientSession) -> Optional[int]:
-    url = "https://www.pegadaian.co.id/harga-emas-hari-ini"
+async def _scrape_source(name: str, provider: str, url: str, extract) -> Optional[int]:
     try:
-        html = await _fetch_html(session, url)
-        soup = BeautifulSoup(html, "lxml")
-
-        texts = soup.find_all(string=_RP_REGEX)
-        candidates = []
-        for t in texts:
-            v = _parse_idr(t)
-            if v:
-                candidates.append(v)
-        val = _pick_reasonable(candidates)
-        if val:
-            print("[gold] Pegadaian: ketemu =", val)
-        else:
-            print("[gold] Pegadaian: regex tidak menemukan angka yang wajar")
-        return val
+        # Breaker per situs (utils.health); halaman tanpa angka wajar
+        # (mis. layout berubah) juga dihitung gagal.
+        val = await health.track(provider, lambda: _fetch_source(name, provider, url, extract), is_ok=bool)
+    except health.CircuitOpen:
+        return None
     except Exception as e:
-        print(f"[gold] Pegadaian error: {e}")
+        log.warning("%s error: %s", name, e)
+        metrics.GOLD_SOURCE.inc(name, "error")
         return None
+    if val:
+        _last_good[name] = (val, time.monotonic())
+    return val
 
-async def _scrape_hargaemas_idr(session: aiohttp.ClientSession) -> Optional[int]:
+async def _scrape_gold() -> Tuple[Optional[int], Optional[str]]:
     """
-    Fallback tambahan: harga-emas.org sering menampilkan 1 gram.
-    Kita sweep angka 'Rp …' lalu pilih yang masuk akal.
+    Ambil ketiga sumber bersamaan. Hasil dipakai menurut prioritas: sumber
+    ditunggu selama sumber berprioritas lebih tinggi masih jalan, sampai
+    GOLD_DEADLINE; lewat itu pakai hasil terbaik yang sudah ada. Sumber yang
+    belum selesai dibiarkan jalan di latar belakang (mengisi _last_good).
     """
-    url = "https://harga-emas.org/1-gram/"
-    try:
-        html = await _fetch_html(session, url)
-        soup = BeautifulSoup(html, "lxml")
-        texts = soup.find_all(string=_RP_REGEX)
-        candidates = []
-        for t in texts:
-            v = _parse_idr(t)
-            if v:
-                candidates.append(v)
-        val = _pick_reasonable(candidates)
-        if val:
-            print("[gold] HargaEmas.org: ketemu =", val)
+    tasks = [
+        (name, asyncio.ensure_future(_scrape_source(name, provider, url, extract)))
+        for name, provider, url, extract in SOURCES
+    ]
+    deadline = asyncio.get_running_loop().time() + GOLD_DEADLINE
+    while True:
+        for name, task in tasks:
+            if not task.done():
+                break
+            if task.result():
+                return task.result(), name
         else:
-            print("[gold] HargaEmas.org: regex tidak menemukan angka yang wajar")
-        return val
+            return None, None  # semua selesai dan gagal
+        pending = [t for _, t in tasks if not t.done()]
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            break
+        await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+    for name, task in tasks:
+        if task.done() and task.result():
+            return task.result(), name
+    return None, None
+
+def _best_last_good() -> Tuple[Optional[int], Optional[str]]:
+    now = time.monotonic()
+    for name, *_ in SOURCES:
+        entry = _last_good.get(name)
+        if entry and now - entry[1] <= GOLD_LAST_GOOD_MAX_AGE:
+            return entry[0], name
+    return None, None
+
+async def _gold_result(idr_per_gram: float, source: str, stale: bool = False) -> dict:
+    # Konversi ke USD/gram (opsional, pakai rate internal kamu)
+    usd_per_gram = None
+    try:
+        fx = await get_fx_rate("USDIDR")
+        if fx.get("ok") and fx.get("rate"):
+            usd_per_gram = float(idr_per_gram) / float(fx["rate"])
     except Exception as e:
-        print(f"[gold] HargaEmas.org error: {e}")
-        return None
+        log.warning("FX error: %s", e)
+        usd_per_gram = None
+
+    return {
+        "ok": True,
+        "usd": usd_per_gram,
+        "idr": float(idr_per_gram),
+        "source": source,
+        "stale": stale,
+        "error": None
+    }
+
+async def _background_refresh():
+    quota.set_priority(quota.BACKGROUND)
+    idr_per_gram, source = await _scrape_gold()
+    if idr_per_gram:
+        get_gold_price_idr.prime(await _gold_result(idr_per_gram, source))
+
+def _kick_background_refresh():
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.ensure_future(_background_refresh())
 
 # ===== Public API =====
-@cached(ttl=1800)  # 30 menit biar hemat request
+@cached(ttl=1800, negative_ttl=60, persist=True)  # 30 menit biar hemat request; gagal cuma 1 menit
 async def get_gold_price_idr():
     """
     Return:
-      {"ok": bool, "usd": float|None, "idr": float|None, "source": str|None, "error": str|None}
-    Urutan sumber: Antam -> Pegadaian -> HargaEmas.org
+      {"ok": bool, "usd": float|None, "idr": float|None, "source": str|None,
+       "stale": bool, "error": str|None}
+    Prioritas sumber: Antam -> Pegadaian -> HargaEmas.org (diambil bersamaan).
+    Kalau ada nilai terakhir yang baik, itu langsung dipakai (stale=True)
+    sementara refresh jalan di latar belakang dan mengisi ulang cache.
     """
     # Override manual (IDR/gram)
     try:
@@ -145,56 +169,27 @@ async def get_gold_price_idr():
     except Exception:
         override_idr = None
 
-    idr_per_gram: Optional[float] = None
-    source: Optional[str] = None
-
     if override_idr:
         try:
             idr_per_gram = float(override_idr)
-            source = "override"
-            print(f"[gold] gunakan override: {idr_per_gram}")
+            log.debug("gunakan override: %s", idr_per_gram)
+            return await _gold_result(idr_per_gram, "override")
         except Exception:
-            idr_per_gram = None
+            pass
 
-    if idr_per_gram is None:
-        async with aiohttp.ClientSession() as session:
-            # 1) Antam
-            idr_per_gram = await _scrape_antam_idr(session)
-            source = "Antam" if idr_per_gram else None
-
-            # 2) Pegadaian
-            if idr_per_gram is None:
-                idr_per_gram = await _scrape_pegadaian_idr(session)
-                source = "Pegadaian" if idr_per_gram else None
-
-            # 3) HargaEmas.org
-            if idr_per_gram is None:
-                idr_per_gram = await _scrape_hargaemas_idr(session)
-                source = "HargaEmas.org" if idr_per_gram else None
+    idr_per_gram, source = _best_last_good()
+    if idr_per_gram is not None:
+        _kick_background_refresh()
+        return await _gold_result(idr_per_gram, source, stale=True)
 
+    idr_per_gram, source = await _scrape_gold()
     if idr_per_gram is None:
         return {
             "ok": False,
             "usd": None,
             "idr": None,
             "source": None,
+            "stale": False,
             "error": "Gagal ambil Antam/Pegadaian/HargaEmas.org"
         }
-
-    # Konversi ke USD/gram (opsional, pakai rate internal kamu)
-    usd_per_gram = None
-    try:
-        fx = await get_fx_rate("USDIDR")
-        if fx.get("ok") and fx.get("rate"):
-            usd_per_gram = float(idr_per_gram) / float(fx["rate"])
-    except Exception as e:
-        print(f"[gold] FX error: {e}")
-        usd_per_gram = None
-
-    return {
-        "ok": True,
-        "usd": usd_per_gram,
-        "idr": float(idr_per_gram),
-        "source": source,
-        "error": None
-    }
+    return await _gold_result(idr_per_gram, source)
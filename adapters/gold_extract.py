@@ -0,0 +1,118 @@
+import re
+from typing import List, Optional, Pattern, Tuple
+
+from lxml import etree
+
+# Ekstraksi harga emas yang ramping: HTML di-feed per potongan ke pull parser
+# lxml (C), elemen yang sudah selesai langsung di-clear supaya memori tetap
+# kecil, dan scan berhenti di match pertama yang meyakinkan. Tidak ada
+# pohon BeautifulSoup dan tidak ada find_all(string=...) atas semua node.
+
+_IDR_NUM = re.compile(r"[^0-9]")
+_RP_REGEX = re.compile(r"Rp\s*[0-9\.\,]+", re.I)
+
+ANTAM_LABEL = re.compile(r"Harga Emas per Gram", re.I)
+# Teks yang menyebut "1 gr"/"1 gram" (bukan "0,01 gr").
+ONE_GRAM = re.compile(r"(?<![\d.,])1\s*(?:gr|gram)\b", re.I)
+# Berapa node teks setelah teks `confident` yang masih dianggap satu baris.
+_CONFIDENT_SPAN = 3
+
+_CHUNK = 16 * 1024
+_SKIP_TAGS = {"script", "style", "noscript", "template"}
+
+def _parse_idr(text: str) -> Optional[int]:
+    if not text:
+        return None
+    digits = _IDR_NUM.sub("", text)
+    try:
+        return int(digits) if digits else None
+    except Exception:
+        return None
+
+def _reasonable(v: int) -> bool:
+    return 800_000 <= v <= 3_500_000
+
+def _pick_reasonable(values: List[int]) -> Optional[int]:
+    """
+    Pilih angka yang 'masuk akal' untuk harga per gram ritel Indonesia.
+    Biasanya 900k - 3.0M (tergantung kondisi pasar).
+    Kita pilih nilai terkecil yang >= 800k untuk menghindari harga per-mg.
+    """
+    vals = sorted(v for v in values if _reasonable(v))
+    return vals[0] if vals else None
+
+def scan_gold_html(html: str, *, data_title: Optional[Pattern] = None,
+                   label: Optional[Pattern] = None,
+                   confident: Optional[Pattern] = None) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Return (harga, metode). Urutan keyakinan:
+      - "data-title": <td data-title=...> yang cocok dengan `data_title`
+      - "label":      angka Rp pertama setelah teks yang cocok dengan `label`
+      - "confident":  angka Rp wajar di node teks yang cocok dengan `confident`
+                      atau di beberapa node teks sesudahnya (mis. sel berat
+                      "1 gr" lalu sel harga)
+      - "sweep":      angka wajar terkecil dari semua 'Rp ...' (seperti dulu)
+    Teks diproses saat elemen pemiliknya selesai (text + tail anak-anaknya),
+    jadi urutannya mengikuti dokumen di tingkat sibling.
+    """
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    candidates: List[int] = []
+    keep = None          # subtree yang harus utuh sampai selesai (td data-title)
+    after_label = False
+    near_confident = 0   # sisa node teks yang masih "dekat" teks confident
+
+    def _events():
+        for i in range(0, len(html), _CHUNK):
+            parser.feed(html[i:i + _CHUNK])
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    for event, el in _events():
+        tag = el.tag if isinstance(el.tag, str) else None
+        if event == "start":
+            if (keep is None and data_title is not None and tag == "td"
+                    and data_title.search(el.get("data-title") or "")):
+                keep = el
+            continue
+
+        if keep is not None:
+            if el is not keep:
+                continue
+            keep = None
+            val = _parse_idr("".join(el.itertext()))
+            if val:
+                return val, "data-title"
+
+        texts = []
+        if tag is not None and tag not in _SKIP_TAGS and el.text:
+            texts.append(el.text)
+        texts.extend(child.tail for child in el if child.tail)
+        for text in texts:
+            if not text.strip():
+                continue
+            if label is not None and not after_label and label.search(text):
+                after_label = True
+                text = text[label.search(text).end():]
+            if confident is not None and confident.search(text):
+                near_confident = _CONFIDENT_SPAN + 1
+            for match in _RP_REGEX.findall(text):
+                val = _parse_idr(match)
+                if not val:
+                    continue
+                if after_label:
+                    return val, "label"
+                if near_confident and _reasonable(val):
+                    return val, "confident"
+                candidates.append(val)
+            near_confident = max(0, near_confident - 1)
+        el.clear(keep_tail=True)
+
+    val = _pick_reasonable(candidates)
+    return val, ("sweep" if val else None)
+
+def extract_antam(html: str) -> Tuple[Optional[int], Optional[str]]:
+    return scan_gold_html(html, data_title=ANTAM_LABEL, label=ANTAM_LABEL)
+
+def extract_sweep(html: str) -> Tuple[Optional[int], Optional[str]]:
+    return scan_gold_html(html, confident=ONE_GRAM)
@@ -0,0 +1,165 @@
+import time
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+from utils import alerts, history, prefetch
+from utils.sheets import get_watchlist
+from .stocks import get_stock_price, get_stock_prices, resolve_stock_symbol
+from .crypto import _COINGECKO_MAP, get_crypto_price_idr_rest, get_crypto_prices_idr
+from .fx import FX_CODES, get_fx_rate, get_fx_rates, get_fx_table
+from .gold import get_gold_price_idr
+
+# Quote multi-aset untuk watchlist: entri diklasifikasi jadi saham, crypto,
+# FX dan emas, lalu tiap grup di-fetch sekaligus secara paralel.
+
+GOLD_ALIASES = {"GOLD", "EMAS", "XAU", "XAUIDR", "ANTAM GOLD"}
+
+def classify_asset(asset: str) -> Tuple[str, str]:
+    """Return (kind, symbol) dengan kind salah satu: gold, fx, crypto, stock."""
+    sym = asset.upper().strip()
+    if sym in GOLD_ALIASES:
+        return "gold", "GOLD"
+    if sym.endswith("=X"):
+        return "fx", sym[:-2]
+    if len(sym) == 6 and sym[:3] in FX_CODES and sym[3:] in FX_CODES:
+        return "fx", sym
+    if sym.endswith("-USD"):
+        return "crypto", sym[:-4]
+    if sym in _COINGECKO_MAP:
+        return "crypto", sym
+    return "stock", sym
+
+async def _gold_one(_: List[str]) -> Dict[str, dict]:
+    return {"GOLD": await get_gold_price_idr()}
+
+_FETCHERS = {
+    "stock": get_stock_prices,
+    "crypto": get_crypto_prices_idr,
+    "fx": get_fx_rates,
+    "gold": _gold_one,
+}
+
+async def get_quotes(assets: List[str]) -> List[Tuple[str, str, dict]]:
+    """
+    Return [(asset, kind, data)] dengan urutan sama seperti input.
+    Satu panggilan batch per grup; semua grup jalan bersamaan.
+    """
+    classified = [(a, *classify_asset(a)) for a in assets]
+    groups: Dict[str, List[str]] = {}
+    for _, kind, sym in classified:
+        groups.setdefault(kind, [])
+        if sym not in groups[kind]:
+            groups[kind].append(sym)
+
+    kinds = list(groups)
+    fetched = await asyncio.gather(*(_FETCHERS[k](groups[k]) for k in kinds), return_exceptions=True)
+    by_kind = {}
+    for kind, res in zip(kinds, fetched):
+        by_kind[kind] = res if isinstance(res, dict) else {}
+
+    out = []
+    for asset, kind, sym in classified:
+        data = by_kind[kind].get(sym) or {"ok": False, "error": "no data"}
+        out.append((asset, kind, data))
+    return out
+
+# ===== Prefetch wiring =====
+_SINGLE = {
+    "stock": get_stock_price,
+    "crypto": get_crypto_price_idr_rest,
+    "fx": get_fx_rate,
+}
+_WATCH_REFRESH = 60  # detik; batasi baca Sheet oleh prefetcher
+_watch_targets: List[Tuple[Any, tuple]] = []
+_watch_ts = 0.0
+
+async def watch_prefetch_targets() -> List[Tuple[Any, tuple]]:
+    """Entri watchlist Sheet -> [(wrapper, args)] untuk prefetcher."""
+    global _watch_targets, _watch_ts
+    now = time.monotonic()
+    if now - _watch_ts >= _WATCH_REFRESH:
+        _watch_ts = now
+        targets = []
+        for asset in await get_watchlist():
+            kind, sym = classify_asset(asset)
+            if kind == "gold":
+                targets.append((get_gold_price_idr, ()))
+            else:
+                targets.append((_SINGLE[kind], (sym,)))
+        _watch_targets = targets
+    return _watch_targets
+
+def setup_prefetch():
+    prefetch.pin(get_fx_table)
+    prefetch.pin(get_fx_rate, "USDIDR")
+    prefetch.pin(get_gold_price_idr)
+    prefetch.track(get_stock_price, batch=get_stock_prices)
+    prefetch.track(get_crypto_price_idr_rest, batch=get_crypto_prices_idr)
+    prefetch.track(get_fx_rate, batch=get_fx_rates)
+    prefetch.add_source(watch_prefetch_targets)
+
+# ===== Riwayat harga (/change) =====
+def _stock_history_symbol(raw: str) -> str:
+    """Ticker mentah -> simbol Yahoo hasil resolusi, supaya BBCA & BBCA.JK satu seri."""
+    raw = raw.upper().strip()
+    found, resolution = resolve_stock_symbol.peek(raw)
+    return resolution["symbol"] if found and resolution.get("ok") else raw
+
+def history_key(asset: str) -> Tuple[str, str]:
+    """(kind, symbol) tempat riwayat harga asset ini disimpan."""
+    kind, sym = classify_asset(asset)
+    if kind == "stock":
+        sym = _stock_history_symbol(sym)
+    return kind, sym
+
+def setup_history():
+    # Crypto disimpan dalam USD (harga sumbernya), emas dalam IDR/gram;
+    # nilai emas stale adalah harga lama yang disajikan ulang, jadi dilewati.
+    history.track(get_stock_price, "stock", lambda v: v.get("price"), symbol_of=_stock_history_symbol)
+    history.track(get_crypto_price_idr_rest, "crypto", lambda v: v.get("usd"))
+    history.track(get_fx_rate, "fx", lambda v: v.get("rate"))
+    history.track(get_gold_price_idr, "gold", lambda v: None if v.get("stale") else v.get("idr"))
+
+# ===== Alert harga =====
+async def resolve_asset(asset: str) -> Dict[str, Any]:
+    """
+    Validasi asset untuk alert: {"ok": True, "kind", "symbol"} dengan simbol
+    saham sudah di-resolve ke simbol Yahoo (kunci yang sama dengan riwayat
+    harga), atau {"ok": False, "error"} kalau simbolnya tidak bisa dipakai.
+    """
+    kind, sym = classify_asset(asset)
+    if kind == "stock":
+        resolution = await resolve_stock_symbol(sym)
+        if not resolution.get("ok"):
+            return {"ok": False, "error": resolution.get("error") or f"Simbol {sym} tidak dikenal"}
+        return {"ok": True, "kind": kind, "symbol": resolution["symbol"]}
+    if kind == "gold":
+        return {"ok": True, "kind": kind, "symbol": sym}
+    data = await _SINGLE[kind](sym)
+    if not data.get("ok"):
+        return {"ok": False, "error": data.get("error") or f"Tidak ada data untuk {sym}"}
+    return {"ok": True, "kind": kind, "symbol": sym}
+
+def _alert_feed(kind: str, symbol: str, price: float):
+    if kind != "crypto":
+        alerts.observe(kind, symbol, "", price)
+        return
+    # Riwayat crypto dalam USD; alert IDR memakai USDIDR yang ada di cache (di-pin prefetch).
+    alerts.observe("crypto", symbol, "USD", price)
+    found, fx = get_fx_rate.peek("USDIDR")
+    if found and fx.get("ok"):
+        alerts.observe("crypto", symbol, "IDR", price * fx["rate"])
+
+async def alert_prefetch_targets() -> List[Tuple[Any, tuple]]:
+    """Simbol yang punya alert -> [(wrapper, args)], supaya harganya tetap mengalir."""
+    targets = []
+    for kind, sym, _ in alerts.watched():
+        if kind == "gold":
+            targets.append((get_gold_price_idr, ()))
+        else:
+            targets.append((_SINGLE[kind], (sym,)))
+    return targets
+
+def setup_alerts():
+    history.add_listener(_alert_feed)
+    prefetch.add_source(alert_prefetch_targets)
@@ -1,58 +1,91 @@
-import yfinance as yf
-import requests
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from utils import health
 from utils.cache import cached
+from utils.executor import run_blocking
+from utils.hedge import hedge_config, ordered_attempts, provider_of, race
+from utils.quota import QuotaExceeded, busy_result
+from .tickers import indexed_symbol
+from .yahoo_chart import chart_last
 
 CANDIDATE_SUFFIXES = ["", ".JK"]  # try raw first, then Indonesian exchange
 
+# Urutan tier & hedge delay (override: HEDGE_ORDER_STOCKS / HEDGE_DELAY_STOCKS).
+# Chart JSON duluan: tanpa pandas; tier yfinance cuma fallback.
+STOCK_ORDER, STOCK_HEDGE_DELAY = hedge_config("stocks", ["yahoo_chart", "yf_fast", "yf_history"], 0.7)
+
+# Cache resolusi ticker -> (simbol Yahoo, tier yang berhasil).
+#   STOCK_RESOLVE_TTL           detik resolusi positif diingat (default 7 hari)
+#   STOCK_RESOLVE_NEGATIVE_TTL  detik ticker yang tidak ada diingat (default 6 jam)
+STOCK_RESOLVE_TTL = int(os.getenv("STOCK_RESOLVE_TTL", str(7 * 86400)))
+STOCK_RESOLVE_NEGATIVE_TTL = float(os.getenv("STOCK_RESOLVE_NEGATIVE_TTL", str(6 * 3600)))
+
 def _yf_fast_last(sym: str):
+    import yfinance as yf  # lazy: pandas/numpy hanya saat fallback ini jalan
     t = yf.Ticker(sym)
     info = getattr(t, "fast_info", {}) or {}
     return info.get("last_price"), (info.get("currency") if isinstance(info, dict) else None)
 
 def _yf_history_last(sym: str):
+    import yfinance as yf
     t = yf.Ticker(sym)
     hist = t.history(period="5d")
     if hist is None or hist.empty:
         return None
     return float(hist["Close"].dropna().iloc[-1])
 
-def _yahoo_chart_last(sym: str):
-    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{sym}"
-    params = {"range": "5d", "interval": "1d"}
-    headers = {"User-Agent": "Mozilla/5.0"}
-    r = requests.get(url, params=params, headers=headers, timeout=8)
-    if not r.ok:
-        return None, None
-    data = r.json()
-    result = (data or {}).get("chart", {}).get("result")
-    if not result:
-        return None, None
-    r0 = result[0]
-    currency = r0.get("meta", {}).get("currency")
-    closes = r0.get("indicators", {}).get("quote", [{}])[0].get("close", [])
-    closes = [c for c in closes if c is not None]
-    if not closes:
-        return None, currency
-    return float(closes[-1]), currency
-
-def _try_symbol(sym: str):
-    # 1) fast_info
-    last, currency = _yf_fast_last(sym)
-    if last is not None:
-        return {"ok": True, "price": float(last), "currency": currency or "IDR"}
-    # 2) history
-    last = _yf_history_last(sym)
-    if last is not None:
-        return {"ok": True, "price": float(last), "currency": currency or "IDR"}
-    # 3) chart API
-    last, currency2 = _yahoo_chart_last(sym)
-    if last is not None:
-        return {"ok": True, "price": float(last), "currency": (currency2 or "IDR")}
-    return {"ok": False}
-
-@cached(ttl=60)
-async def get_stock_price(ticker: str):
-    raw = ticker.upper().strip()
+async def _tier_fast(sym: str):
+    last, currency = await run_blocking("yfinance", _yf_fast_last, sym)
+    if last is None:
+        return None
+    return {"ok": True, "price": float(last), "currency": currency or "IDR"}
+
+async def _tier_history(sym: str):
+    last = await run_blocking("yfinance", _yf_history_last, sym)
+    if last is None:
+        return None
+    return {"ok": True, "price": float(last), "currency": "IDR"}
+
+async def _tier_chart(sym: str):
+    last, currency = await chart_last(sym)
+    if last is None:
+        return None
+    return {"ok": True, "price": float(last), "currency": (currency or "IDR")}
+
+_TIERS = {
+    "yf_fast": _tier_fast,
+    "yf_history": _tier_history,
+    "yahoo_chart": _tier_chart,
+}
+
+_DEFINITIVE_TIERS = {"yahoo_chart"}
+
+async def _try_symbol(sym: str) -> Tuple[dict, Optional[str], bool]:
+    """
+    Return (hasil, tier yang menang, answered). answered=True kalau minimal
+    satu tier yang bisa membedakan "simbol tidak ada" dari error (chart JSON:
+    404 / "Not Found") menjawab tanpa data, jadi provider yang sedang down
+    atau menolak (401/403) tidak dianggap bukti ticker tidak ada. yfinance
+    tidak dihitung: ia menelan error HTTP dan mengembalikan kosong.
+    """
+    answered = []
+
+    def _tier(name):
+        async def run():
+            val = await _TIERS[name](sym)
+            if name in _DEFINITIVE_TIERS:
+                answered.append(name)
+            return val
+        return run
+
+    # 1) chart API, 2) fast_info, 3) history — di-race dengan hedging
+    attempts = ordered_attempts(STOCK_ORDER, {name: _tier(name) for name in _TIERS})
+    tier, res = await race(attempts, STOCK_HEDGE_DELAY)
+    return res or {"ok": False}, tier, bool(answered)
+
+def _candidates(raw: str) -> List[str]:
     # Build candidates: raw, and if not already with .JK, try raw + .JK
     candidates = []
     seen = set()
@@ -64,12 +97,174 @@ async def get_stock_price(ticker: str):
     # Ensure the original raw ticker is first
     if raw not in candidates:
         candidates.insert(0, raw)
+    # Ticker yang ada di index dicoba pertama dengan suffix bursanya
+    known = indexed_symbol(raw)
+    if known:
+        candidates = [known] + [c for c in candidates if c != known]
+    return candidates
 
+async def _probe(raw: str) -> Tuple[dict, dict]:
+    """
+    Coba kandidat berurutan. Return (quote, resolusi); resolusi negatif hanya
+    kalau semua kandidat dijawab provider tanpa data (bukan karena error).
+    """
+    candidates = _candidates(raw)
+    definitive = True
+    busy = False
     for sym in candidates:
         try:
-            res = _try_symbol(sym)
+            res, tier, answered = await _try_symbol(sym)
+        except QuotaExceeded:
+            definitive, busy = False, True
+            continue
+        except Exception:
+            definitive = False
+            continue
+        if res.get("ok"):
+            return res, {"ok": True, "symbol": sym, "tier": tier}
+        definitive = definitive and answered
+    if busy:
+        # Ditahan kuota: bukan bukti ticker tidak ada, jangan di-cache.
+        return busy_result(), busy_result(definitive=False)
+    error = f"No data for {raw} (tried: {', '.join(candidates)})"
+    return {"ok": False, "error": error}, {"ok": False, "error": error, "definitive": definitive}
+
+@cached(ttl=STOCK_RESOLVE_TTL, negative_ttl=STOCK_RESOLVE_NEGATIVE_TTL, max_entries=4096, persist=True)
+async def resolve_stock_symbol(ticker: str):
+    """
+    {"ok": True, "symbol": "ANTM.JK", "tier": "yahoo_chart"} untuk kandidat
+    yang hidup. Biasanya diisi get_stock_price/get_stock_prices lewat prime().
+    """
+    return (await _probe(ticker.upper().strip()))[1]
+
+def _remember(raw: str, resolution: dict):
+    # Gagal karena provider error jangan sampai di-cache sebagai "tidak ada".
+    if resolution.get("ok") or resolution.get("definitive"):
+        resolve_stock_symbol.prime(resolution, raw)
+
+@cached(ttl=60, persist=True)
+async def get_stock_price(ticker: str):
+    raw = ticker.upper().strip()
+    found, resolution = resolve_stock_symbol.peek(raw)
+    if found and not resolution.get("ok"):
+        return {"ok": False, "error": resolution.get("error") or f"No data for {raw}"}
+    if found:
+        # Sudah pernah di-resolve: langsung simbol & tier yang terakhir berhasil.
+        sym, tier = resolution["symbol"], resolution.get("tier")
+        if tier in _TIERS:
+            try:
+                res = await health.track(provider_of(tier), lambda: _TIERS[tier](sym))
+                if res:
+                    return res
+            except Exception:
+                pass
+        try:
+            res, tier, _ = await _try_symbol(sym)
             if res.get("ok"):
+                if tier != resolution.get("tier"):
+                    _remember(raw, {"ok": True, "symbol": sym, "tier": tier})
                 return res
         except Exception:
+            pass
+    res, resolution = await _probe(raw)
+    _remember(raw, resolution)
+    return res
+
+def _yf_download_last(symbols: List[str]) -> Dict[str, float]:
+    """Satu yf.download multi-ticker; return {symbol: close terakhir}."""
+    import yfinance as yf
+    df = yf.download(symbols, period="5d", group_by="ticker", progress=False, threads=False)
+    out = {}
+    if df is None or df.empty:
+        return out
+    multi = getattr(df.columns, "nlevels", 1) > 1
+    for sym in symbols:
+        try:
+            if multi:
+                if sym not in df.columns.get_level_values(0):
+                    continue
+                closes = df[sym]["Close"].dropna()
+            else:
+                closes = df["Close"].dropna()
+        except KeyError:
             continue
-    return {"ok": False, "error": f"No data for {raw} (tried: {', '.join(candidates)})"}
+        if not closes.empty:
+            out[sym] = float(closes.iloc[-1])
+    return out
+
+async def _chart_first(candidates: List[str]) -> Tuple[Optional[str], Optional[dict]]:
+    """Kandidat pertama yang dijawab chart JSON: (simbol, hasil) atau (None, None)."""
+    for sym in candidates:
+        try:
+            res = await health.track("yahoo_chart", lambda: _tier_chart(sym))
+        except Exception:
+            return None, None  # provider error/breaker open: serahkan ke fallback
+        if res:
+            return sym, res
+    return None, None
+
+async def get_stock_prices(tickers: List[str], refresh: bool = False) -> Dict[str, dict]:
+    """
+    Batch: {TICKER: hasil seperti get_stock_price}. Ticker yang belum ada di
+    cache di-fetch lewat chart JSON secara paralel (tanpa pandas); sisanya
+    dengan satu yf.download (semua kandidat sekaligus), dan yang tetap kosong
+    jatuh ke get_stock_price per ticker. refresh=True mengabaikan cache (prefetch).
+    """
+    raws = list(dict.fromkeys(t.upper().strip() for t in tickers if t.strip()))
+    results: Dict[str, dict] = {}
+    missing = []
+    for raw in raws:
+        found, val = (False, None) if refresh else get_stock_price.peek(raw)
+        if found:
+            results[raw] = val
+        else:
+            missing.append(raw)
+
+    if missing:
+        wanted = {}
+        for raw in missing:
+            found, resolution = resolve_stock_symbol.peek(raw)
+            if not found:
+                wanted[raw] = _candidates(raw)
+            elif resolution.get("ok"):
+                wanted[raw] = [resolution["symbol"]]
+            else:
+                results[raw] = {"ok": False, "error": resolution.get("error") or f"No data for {raw}"}
+
+        def _store(raw, cands, sym, res, tier):
+            # Resolusi dulu supaya listener cache (riwayat harga) sudah
+            # melihat simbol Yahoo-nya saat harga di-prime.
+            if len(cands) > 1:
+                _remember(raw, {"ok": True, "symbol": sym, "tier": tier})
+            get_stock_price.prime(res, raw)
+            results[raw] = res
+
+        charted = await asyncio.gather(*(_chart_first(cands) for cands in wanted.values()))
+        unresolved = {}
+        for (raw, cands), (sym, res) in zip(wanted.items(), charted):
+            if res is None:
+                unresolved[raw] = cands
+            else:
+                _store(raw, cands, sym, res, "yahoo_chart")
+
+        all_syms = list(dict.fromkeys(s for c in unresolved.values() for s in c))
+        try:
+            last = await run_blocking("yfinance", _yf_download_last, all_syms) if all_syms else {}
+        except Exception:
+            last = {}
+        rest = []
+        for raw, cands in unresolved.items():
+            sym = next((s for s in cands if s in last), None)
+            if sym is None:
+                rest.append(raw)
+                continue
+            res = {"ok": True, "price": last[sym], "currency": "IDR" if sym.endswith(".JK") else None}
+            _store(raw, cands, sym, res, None)
+        if rest:
+            singles = await asyncio.gather(*(
+                get_stock_price.refresh_key(get_stock_price.key_for(raw)) if refresh else get_stock_price(raw)
+                for raw in rest
+            ))
+            results.update(zip(rest, singles))
+
+    return {raw: results[raw] for raw in raws}
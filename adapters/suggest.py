@@ -0,0 +1,107 @@
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tickers import ticker_names
+from .crypto import _COINGECKO_MAP, get_crypto_price_idr_rest
+from .binance_stream import stream_price_usd
+from .fx import FX_CODES, get_fx_rate
+from .stocks import get_stock_price
+from .gold import get_gold_price_idr
+from .quotes import GOLD_ALIASES
+
+# Autocomplete simbol untuk inline query (@bot BB…): index prefix di memori
+# berupa list key terurut + bisect, dibangun sekali dari map CoinGecko, index
+# ticker IDX/US (data/tickers.csv), pasangan kode FX dan alias emas. Satu
+# pencarian = bisect + scan entri yang prefiksnya cocok, tanpa network; harga
+# hanya diambil dari cache (peek), jadi salah ketik tidak pernah sampai ke
+# upstream.
+
+# (key, rank, kind, symbol, name); rank: 0 simbol, 1 alias/basis, 2 nama
+Entry = Tuple[str, int, str, str, str]
+
+_keys: List[str] = []
+_entries: List[Entry] = []
+
+# Batas entri yang di-scan per pencarian (prefix pendek seperti "B" cocok ratusan).
+_SCAN_LIMIT = 300
+_CLEAN_RE = re.compile(r"[/\s]+")
+
+def _build() -> List[Entry]:
+    entries: List[Entry] = []
+    for sym, cg_id in _COINGECKO_MAP.items():
+        name = cg_id.replace("-", " ").title()
+        entries.append((sym, 0, "crypto", sym, name))
+        entries.append((sym + "USD", 1, "crypto", sym, name))
+        entries.extend((key, 2, "crypto", sym, name) for key in _name_keys(name))
+    for sym, name in ticker_names().items():
+        entries.append((sym, 0, "stock", sym, name))
+        base = sym.split(".", 1)[0]
+        if base != sym:
+            entries.append((base, 1, "stock", sym, name))
+        entries.extend((key, 2, "stock", sym, name) for key in _name_keys(name))
+    for base in FX_CODES:
+        for quote in FX_CODES:
+            if base != quote:
+                # Pair ke/dari IDR paling sering dicari, jadi didahulukan.
+                rank = 0 if "IDR" in (base, quote) else 1
+                entries.append((base + quote, rank, "fx", base + quote, f"{base}/{quote}"))
+    for alias in GOLD_ALIASES:
+        entries.append((alias.replace(" ", ""), 1, "gold", "GOLD", "Emas per gram"))
+    entries.sort()
+    return entries
+
+def _name_keys(name: str) -> List[str]:
+    words = name.upper().split()
+    # Nama lengkap dan tiap kata, supaya "BANK CEN" dan "CENTRAL" sama-sama ketemu.
+    return list(dict.fromkeys([_clean("".join(words))] + [w for w in words if len(w) > 2]))
+
+def _clean(text: str) -> str:
+    return _CLEAN_RE.sub("", text.upper())
+
+def load_index() -> int:
+    """(Re)build index; return jumlah key."""
+    global _keys, _entries
+    entries = _build()
+    _entries = entries
+    _keys = [e[0] for e in entries]
+    return len(entries)
+
+def suggest(query: str, limit: int = 10) -> List[Dict[str, str]]:
+    """
+    Simbol yang key-nya diawali `query`: [{"kind", "symbol", "name"}], urut
+    exact match dulu, lalu match simbol sebelum match nama, lalu yang terpendek.
+    """
+    if not _entries:
+        load_index()
+    q = _clean(query)
+    if not q:
+        return []
+    i = bisect_left(_keys, q)
+    best: Dict[Tuple[str, str], tuple] = {}
+    end = min(len(_keys), i + _SCAN_LIMIT)
+    while i < end and _keys[i].startswith(q):
+        key, rank, kind, sym, name = _entries[i]
+        score = (key != q, rank, len(sym), sym)
+        if (kind, sym) not in best or score < best[(kind, sym)][0]:
+            best[(kind, sym)] = (score, name)
+        i += 1
+    ranked = sorted(best.items(), key=lambda item: item[1][0])[:limit]
+    return [{"kind": kind, "symbol": sym, "name": name} for (kind, sym), (_, name) in ranked]
+
+def cached_quote(kind: str, symbol: str) -> Optional[Dict[str, Any]]:
+    """Quote dari cache/price book saja (tanpa network), atau None."""
+    if kind == "crypto":
+        usd = stream_price_usd(symbol)
+        if usd is not None:
+            return {"ok": True, "usd": usd, "idr": None}
+        found, val = get_crypto_price_idr_rest.peek(symbol)
+    elif kind == "stock":
+        found, val = get_stock_price.peek(symbol)
+        if not found and "." in symbol:
+            found, val = get_stock_price.peek(symbol.split(".", 1)[0])
+    elif kind == "fx":
+        found, val = get_fx_rate.peek(symbol)
+    else:
+        found, val = get_gold_price_idr.peek()
+    return val if found and val and val.get("ok") else None
@@ -0,0 +1,68 @@
+import os
+import csv
+import logging
+from typing import Dict, Optional
+
+# Index ticker saham yang dikenal (IDX dan US) supaya suffix bursa yang benar
+# langsung dicoba pertama: "ANTM" -> "ANTM.JK", "AAPL" -> "AAPL". File CSV
+# berkolom symbol,name dengan symbol dalam format Yahoo; dimuat lazily sekali.
+# Ticker yang tidak ada di index tetap di-resolve lewat kandidat biasa.
+# data/tickers.csv bawaan hanya sampel (IDX besar + US populer); cara membuat
+# index IDX lengkap ada di README.
+#
+# Config (env):
+#   STOCK_TICKER_INDEX  path CSV (default data/tickers.csv; kosong = tanpa index)
+
+TICKER_INDEX_PATH = os.getenv(
+    "STOCK_TICKER_INDEX",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tickers.csv"),
+)
+
+log = logging.getLogger(__name__)
+
+_by_base: Dict[str, str] = {}   # "ANTM" -> "ANTM.JK"
+_names: Dict[str, str] = {}     # "ANTM.JK" -> "Aneka Tambang"
+_loaded = False
+
+def _base(symbol: str) -> str:
+    return symbol.split(".", 1)[0]
+
+def load_ticker_index(path: Optional[str] = None) -> int:
+    """Muat (ulang) index; return jumlah ticker. File tidak ada = index kosong."""
+    global _loaded
+    path = TICKER_INDEX_PATH if path is None else path
+    by_base, names = {}, {}
+    if path and os.path.exists(path):
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    sym = (row.get("symbol") or "").upper().strip()
+                    if not sym:
+                        continue
+                    names[sym] = (row.get("name") or "").strip()
+                    by_base.setdefault(_base(sym), sym)  # baris pertama menang
+        except (OSError, csv.Error) as e:
+            log.warning("gagal memuat index %s: %s", path, e)
+    _by_base.clear()
+    _by_base.update(by_base)
+    _names.clear()
+    _names.update(names)
+    _loaded = True
+    return len(names)
+
+def _ensure_loaded():
+    if not _loaded:
+        load_ticker_index()
+
+def indexed_symbol(raw: str) -> Optional[str]:
+    """Simbol Yahoo dari index untuk ticker mentah, atau None kalau tidak dikenal."""
+    _ensure_loaded()
+    raw = raw.upper().strip()
+    if raw in _names:
+        return raw
+    return _by_base.get(raw)
+
+def ticker_names() -> Dict[str, str]:
+    """{simbol Yahoo: nama} dari index."""
+    _ensure_loaded()
+    return dict(_names)
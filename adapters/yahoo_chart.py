@@ -0,0 +1,45 @@
+import os
+from typing import Optional, Tuple
+
+from utils.http import get_json
+
+# Quote ringan dari Yahoo chart API: JSON di-parse langsung, tanpa yfinance/
+# pandas. Dipakai sebagai tier utama saham, FX dan crypto; yfinance hanya
+# di-import (lazily) kalau tier fallback-nya benar-benar jalan.
+#
+# Config (env):
+#   YAHOO_CHART_URL  base URL (default https://query1.finance.yahoo.com;
+#                    bisa diarahkan ke server lokal, mis. bench/load_bench.py)
+
+YAHOO_CHART_URL = os.getenv("YAHOO_CHART_URL", "https://query1.finance.yahoo.com").rstrip("/")
+_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+async def chart_last(symbol: str, range_: str = "5d", interval: str = "1d") -> Tuple[Optional[float], Optional[str]]:
+    """
+    Return (harga terakhir, currency). Harga = meta.regularMarketPrice kalau
+    ada, selain itu close terakhir yang tidak kosong; (None, None) kalau
+    simbol tidak dikenal (404 atau error "Not Found" dari Yahoo). Error
+    lain (401/403, error body selain "Not Found") di-raise, supaya tidak
+    dianggap bukti simbolnya tidak ada.
+    """
+    url = f"{YAHOO_CHART_URL}/v8/finance/chart/{symbol}"
+    params = {"range": range_, "interval": interval}
+    data = await get_json("yahoo_chart", url, params=params, headers=_HEADERS, timeout=8, missing=(404,))
+    chart = (data or {}).get("chart") or {}
+    result = chart.get("result")
+    if not result:
+        error = chart.get("error")
+        if error and error.get("code") != "Not Found":
+            raise RuntimeError(f"Yahoo chart error: {error.get('code')}: {error.get('description')}")
+        return None, None
+    r0 = result[0]
+    meta = r0.get("meta") or {}
+    currency = meta.get("currency")
+    price = meta.get("regularMarketPrice")
+    if price is not None:
+        return float(price), currency
+    closes = ((r0.get("indicators") or {}).get("quote") or [{}])[0].get("close") or []
+    closes = [c for c in closes if c is not None]
+    if not closes:
+        return None, currency
+    return float(closes[-1]), currency
@@ -5,13 +5,34 @@ from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from telegram import Update
 from telegram.ext import Application, ApplicationBuilder
-from bot_handlers import register_handlers
-from utils.sheets import diag_info
+from bot_handlers import notify_alert, register_handlers
+from utils.sheets import (
+    diag_info, start_settings_refresh, stop_settings_refresh,
+    start_watchlist_sync, stop_watchlist_sync,
+)
 from utils.formatting import ok_status
+from utils.executor import executor_stats, shutdown_executor
+from utils.cache import cache_stats
+from utils.alerts import alert_stats, set_notifier, start_alerts, stop_alerts
+from utils.health import health_stats
+from utils.history import history_stats
+from utils.metrics import render_metrics, start_loop_monitor, stop_loop_monitor
+from utils.http import start_http, close_http
+from utils.persist import open_persistent_cache, close_persistent_cache, persist_stats
+from utils.prefetch import start_prefetch, stop_prefetch, prefetch_stats
+from utils.quota import quota_stats
+from adapters.quotes import setup_alerts, setup_history, setup_prefetch
+from adapters.binance_stream import start_stream, stop_stream, stream_stats
+from adapters.suggest import load_index
+from utils.updates import (
+    QueueFull, enqueue, start_update_workers, stop_update_workers, update_queue_stats,
+)
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "secret")
 RENDER_EXTERNAL_URL = os.getenv("RENDER_EXTERNAL_URL", "").rstrip("/")
+# Base URL Bot API alternatif (mis. server lokal bench/load_bench.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
 
 if not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN is required")
@@ -30,26 +51,75 @@ tg_app = None
 @app.on_event("startup")
 async def on_startup():
     global tg_app
-    tg_app = ApplicationBuilder().token(BOT_TOKEN).concurrent_updates(True).build()
+    start_loop_monitor()
+    await start_http()
+    await open_persistent_cache()
+    builder = ApplicationBuilder().token(BOT_TOKEN).concurrent_updates(True)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_URL}/bot")
+    tg_app = builder.build()
     register_handlers(tg_app)
+    start_settings_refresh()
+    start_watchlist_sync()
+    setup_history()
+    setup_alerts()
+    set_notifier(lambda alert, price: notify_alert(tg_app.bot, alert, price))
+    await start_alerts()
+    setup_prefetch()
+    load_index()
+    start_prefetch()
+    start_stream()
     if RENDER_EXTERNAL_URL and WEBHOOK_SECRET:
         webhook_url = f"{RENDER_EXTERNAL_URL}/webhook/{WEBHOOK_SECRET}"
-        await tg_app.bot.set_webhook(webhook_url, drop_pending_updates=True, allowed_updates=["message", "callback_query"])
+        await tg_app.initialize()
+        start_update_workers(tg_app.process_update)
+        # Jangan buang pending update: itu update yang ditolak 503 saat instance
+        # lama menguras antrian (utils.updates.stop_update_workers).
+        await tg_app.bot.set_webhook(webhook_url, drop_pending_updates=False, allowed_updates=["message", "callback_query", "inline_query"])
     else:
         asyncio.create_task(tg_app.run_polling(allowed_updates=Update.ALL_TYPES))
 
 @app.on_event("shutdown")
 async def on_shutdown():
     global tg_app
+    await stop_update_workers()
+    await stop_prefetch()
+    await stop_alerts()
+    await stop_stream()
+    await stop_settings_refresh()
+    await stop_watchlist_sync()
     if tg_app:
         await tg_app.shutdown()
         tg_app = None
+    await close_http()
+    await close_persistent_cache()
+    shutdown_executor()
+    await stop_loop_monitor()
 
 @app.get("/diag")
 async def diag():
     info = await diag_info()
     return JSONResponse(info)
 
+@app.get("/stats")
+async def stats():
+    return JSONResponse({
+        "executor": executor_stats(),
+        "cache": cache_stats(),
+        "prefetch": prefetch_stats(),
+        "binance_stream": stream_stats(),
+        "webhook": update_queue_stats(),
+        "persist": persist_stats(),
+        "providers": health_stats(),
+        "quota": quota_stats(),
+        "history": history_stats(),
+        "alerts": alert_stats(),
+    })
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/healthz")
 async def healthz():
     return PlainTextResponse("ok")
@@ -63,8 +133,16 @@ async def telegram_webhook(secret: str, request: Request):
     try:
         data = await request.json()
     except Exception:
-        data = {}
-    update = Update.de_json(data, tg_app.bot)
-    await tg_app.initialize()
-    await tg_app.process_update(update)
-    return JSONResponse(ok_status("processed"))
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get("update_id"), int):
+        raise HTTPException(status_code=400, detail="invalid update")
+    try:
+        update = Update.de_json(data, tg_app.bot)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid update")
+    # Fast-ack: proses di worker pool, jangan tahan balasan ke Telegram.
+    try:
+        queued = enqueue(update.update_id, update)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="busy, retry later")
+    return JSONResponse(ok_status("queued" if queued else "duplicate"))
@@ -0,0 +1,305 @@
+"""
+Server lokal tiruan semua upstream bot, untuk bench/load_bench.py:
+
+    /yahoo       Yahoo chart API          (YAHOO_CHART_URL)
+    /coingecko   CoinGecko simple/price   (COINGECKO_URL)
+    /binance     Binance ticker/price     (BINANCE_URL)
+    /erh         exchangerate.host        (EXCHANGERATE_HOST_URL)
+    /opener      open.er-api.com          (OPEN_ER_API_URL)
+    /gold/<src>  halaman Antam/Pegadaian/HargaEmas.org dari bench/fixtures
+                 (GOLD_URL_ANTAM / _PEGADAIAN / _HARGAEMAS), dengan ETag/304
+    /sheets      Google Sheets API v4 in-memory (SHEETS_API_URL)
+    /telegram    Telegram Bot API        (TELEGRAM_API_URL)
+
+Tiap upstream punya latency (+ jitter), peluang gagal (HTTP 503) dan peluang
+"hang" (tidak menjawab sampai timeout klien) yang bisa diatur, serta counter
+panggilan. Balasan sendMessage diteruskan ke callback on_reply(chat_id, text)
+supaya harness bisa mengukur latency ujung ke ujung.
+"""
+import os
+import time
+import random
+import asyncio
+import hashlib
+from typing import Callable, Dict, List, Optional
+from urllib.parse import unquote
+
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+UPSTREAMS = [
+    "yahoo_chart", "coingecko", "binance", "exchangerate_host", "open_er_api",
+    "antam", "pegadaian", "hargaemas", "sheets", "telegram",
+]
+
+COINS = {
+    "bitcoin": 65000.0, "wrapped-bitcoin": 64900.0, "ethereum": 3200.0, "solana": 150.0,
+    "binancecoin": 580.0, "dogecoin": 0.15, "cardano": 0.45, "ripple": 0.55, "tron": 0.12,
+    "matic-network": 0.7, "polygon-ecosystem-token": 0.5, "polkadot": 6.5, "avalanche-2": 30.0,
+    "chainlink": 14.0, "the-open-network": 6.0, "litecoin": 80.0,
+}
+BINANCE = {
+    "BTC": 65000.0, "ETH": 3200.0, "SOL": 150.0, "BNB": 580.0, "DOGE": 0.15, "ADA": 0.45,
+    "XRP": 0.55, "TRX": 0.12, "POL": 0.5, "DOT": 6.5, "AVAX": 30.0, "LINK": 14.0, "TON": 6.0,
+    "LTC": 80.0, "WBTC": 64900.0,
+}
+USD_RATES = {
+    "USD": 1.0, "IDR": 16250.0, "EUR": 0.92, "JPY": 151.0, "SGD": 1.35, "GBP": 0.79, "AUD": 1.52,
+    "CNY": 7.24, "HKD": 7.82, "MYR": 4.72, "THB": 36.5, "KRW": 1370.0, "CHF": 0.9, "CAD": 1.37,
+    "NZD": 1.66, "INR": 83.4, "PHP": 57.5, "SAR": 3.75, "AED": 3.67, "TWD": 32.3, "VND": 25400.0,
+}
+
+def _price_for(symbol: str) -> float:
+    h = int(hashlib.md5(symbol.encode()).hexdigest()[:8], 16)
+    return round(100 + h % 10000 + (h % 100) / 100, 2)
+
+class UpstreamConfig:
+    def __init__(self, latency_ms: float = 50, jitter: float = 0.2, fail: float = 0.0, hang: float = 0.0):
+        self.latency_ms, self.jitter, self.fail, self.hang = latency_ms, jitter, fail, hang
+
+class FakeUpstreams:
+    def __init__(self, config: Dict[str, UpstreamConfig], watchlist: List[str],
+                 on_reply: Optional[Callable[[int, str], None]] = None, hang_seconds: float = 60):
+        self.config = config
+        self.on_reply = on_reply
+        self.hang_seconds = hang_seconds
+        self.calls: Dict[str, int] = {name: 0 for name in UPSTREAMS}
+        self.sheets: Dict[str, List[List[str]]] = {
+            "settings": [["key", "value"]],
+            "watchlist": [["asset"]] + [[a] for a in watchlist],
+        }
+        self.gold_pages = {}
+        for name in ("antam", "pegadaian", "hargaemas"):
+            with open(os.path.join(FIXTURES, f"{name}.html"), "r", encoding="utf-8") as f:
+                html = f.read()
+            self.gold_pages[name] = (html, '"%s"' % hashlib.md5(html.encode()).hexdigest())
+        self._message_id = 0
+        self.app = web.Application(client_max_size=4 * 1024 * 1024)
+        self.app.router.add_get("/yahoo/v8/finance/chart/{sym}", self.yahoo_chart)
+        self.app.router.add_get("/coingecko/api/v3/simple/price", self.coingecko)
+        self.app.router.add_get("/binance/api/v3/ticker/price", self.binance)
+        self.app.router.add_get("/erh/latest", self.erh)
+        self.app.router.add_get("/opener/v6/latest/USD", self.open_er)
+        self.app.router.add_get("/gold/{src}", self.gold)
+        self.app.router.add_route("*", "/sheets/{tail:.*}", self.sheets_api)
+        self.app.router.add_post("/telegram/{token}/{method}", self.telegram)
+        self._runner: Optional[web.AppRunner] = None
+
+    def reset_calls(self):
+        for name in self.calls:
+            self.calls[name] = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, backlog=4096)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def env(self, base: str) -> Dict[str, str]:
+        """Env untuk app.py supaya semua upstream mengarah ke server ini."""
+        return {
+            "YAHOO_CHART_URL": f"{base}/yahoo",
+            "COINGECKO_URL": f"{base}/coingecko",
+            "BINANCE_URL": f"{base}/binance",
+            "EXCHANGERATE_HOST_URL": f"{base}/erh",
+            "OPEN_ER_API_URL": f"{base}/opener",
+            "GOLD_URL_ANTAM": f"{base}/gold/antam",
+            "GOLD_URL_PEGADAIAN": f"{base}/gold/pegadaian",
+            "GOLD_URL_HARGAEMAS": f"{base}/gold/hargaemas",
+            "SHEETS_API_URL": f"{base}/sheets",
+            "TELEGRAM_API_URL": f"{base}/telegram",
+        }
+
+    async def _inject(self, name: str):
+        """Hitung panggilan, tunggu latency, dan mungkin gagal / hang."""
+        self.calls[name] += 1
+        cfg = self.config.get(name) or UpstreamConfig()
+        r = random.random()
+        if r < cfg.hang:
+            await asyncio.sleep(self.hang_seconds)
+        delay = cfg.latency_ms / 1000 * (1 + random.uniform(-cfg.jitter, cfg.jitter))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if r < cfg.hang + cfg.fail:
+            raise web.HTTPServiceUnavailable(text="injected failure")
+
+    # ===== Harga =====
+    async def yahoo_chart(self, request: web.Request):
+        await self._inject("yahoo_chart")
+        sym = request.match_info["sym"].upper()
+        if sym.endswith("=X"):
+            pair = sym[:-2]
+            base, quote = pair[:3], pair[3:]
+            if base not in USD_RATES or quote not in USD_RATES:
+                raise web.HTTPNotFound()
+            price, currency = USD_RATES[quote] / USD_RATES[base], quote
+        else:
+            price, currency = _price_for(sym), ("IDR" if sym.endswith(".JK") else "USD")
+        return web.json_response({"chart": {"result": [{
+            "meta": {"symbol": sym, "currency": currency},
+            "indicators": {"quote": [{"close": [price * 0.99, None, price]}]},
+        }], "error": None}})
+
+    async def coingecko(self, request: web.Request):
+        await self._inject("coingecko")
+        ids = [i for i in request.query.get("ids", "").split(",") if i]
+        return web.json_response({i: {"usd": COINS[i]} for i in ids if i in COINS})
+
+    async def binance(self, request: web.Request):
+        await self._inject("binance")
+        pair = request.query.get("symbol")
+        if pair is None:
+            return web.json_response([{"symbol": f"{s}USDT", "price": str(p)} for s, p in BINANCE.items()])
+        sym = pair[:-4] if pair.endswith("USDT") else None
+        if sym not in BINANCE:
+            return web.json_response({"code": -1121, "msg": "Invalid symbol."}, status=400)
+        return web.json_response({"symbol": pair, "price": str(BINANCE[sym])})
+
+    async def erh(self, request: web.Request):
+        await self._inject("exchangerate_host")
+        base = request.query.get("base", "USD").upper()
+        if base not in USD_RATES:
+            return web.json_response({"success": False})
+        wanted = [s for s in request.query.get("symbols", "").upper().split(",") if s] or list(USD_RATES)
+        rates = {q: USD_RATES[q] / USD_RATES[base] for q in wanted if q in USD_RATES}
+        return web.json_response({"success": True, "base": base, "timestamp": int(time.time()), "rates": rates})
+
+    async def open_er(self, request: web.Request):
+        await self._inject("open_er_api")
+        return web.json_response({"result": "success", "base_code": "USD",
+                                  "time_last_update_unix": int(time.time()), "rates": USD_RATES})
+
+    async def gold(self, request: web.Request):
+        src = request.match_info["src"]
+        if src not in self.gold_pages:
+            raise web.HTTPNotFound()
+        await self._inject(src)
+        html, etag = self.gold_pages[src]
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=html, content_type="text/html", headers={"ETag": etag})
+
+    # ===== Google Sheets (subset yang dipakai gspread di utils/sheets.py) =====
+    @staticmethod
+    def _col_index(letters: str) -> int:
+        n = 0
+        for ch in letters:
+            n = n * 26 + (ord(ch) - 64)
+        return n - 1
+
+    def _parse_range(self, rng: str):
+        """"'watchlist'!A2:A5" -> (sheet, row0, col0)."""
+        rng = unquote(rng)
+        sheet, _, cells = rng.partition("!")
+        sheet = sheet.strip("'")
+        start = cells.split(":")[0] if cells else "A1"
+        letters = "".join(ch for ch in start if ch.isalpha()).upper() or "A"
+        digits = "".join(ch for ch in start if ch.isdigit()) or "1"
+        return sheet, int(digits) - 1, self._col_index(letters)
+
+    def _write(self, rng: str, values: List[List[str]]):
+        sheet, row0, col0 = self._parse_range(rng)
+        rows = self.sheets.setdefault(sheet, [])
+        for i, vals in enumerate(values):
+            while len(rows) <= row0 + i:
+                rows.append([])
+            row = rows[row0 + i]
+            for j, v in enumerate(vals):
+                while len(row) <= col0 + j:
+                    row.append("")
+                row[col0 + j] = "" if v is None else str(v)
+
+    def _metadata(self, sid: str):
+        return {"spreadsheetId": sid, "properties": {"title": "bench", "locale": "en_US"},
+                "sheets": [{"properties": {"sheetId": i, "title": t, "index": i, "sheetType": "GRID",
+                                           "gridProperties": {"rowCount": 1000, "columnCount": 26}}}
+                           for i, t in enumerate(self.sheets)]}
+
+    async def sheets_api(self, request: web.Request):
+        await self._inject("sheets")
+        parts = request.match_info["tail"].split("/")  # v4/spreadsheets/<id>[...]
+        if len(parts) < 3:
+            raise web.HTTPNotFound()
+        sid, rest = parts[2], parts[3:]
+        if ":" in sid:
+            sid, action = sid.split(":", 1)
+            if action == "batchUpdate":  # add_worksheet
+                body = await request.json()
+                replies = []
+                for req in body.get("requests", []):
+                    title = req.get("addSheet", {}).get("properties", {}).get("title")
+                    if title:
+                        self.sheets.setdefault(title, [])
+                        props = self._metadata(sid)["sheets"][list(self.sheets).index(title)]["properties"]
+                        replies.append({"addSheet": {"properties": props}})
+                return web.json_response({"spreadsheetId": sid, "replies": replies})
+            raise web.HTTPNotFound()
+        if not rest:
+            return web.json_response(self._metadata(sid))
+        if rest[0] == "values:batchUpdate":
+            body = await request.json()
+            for item in body.get("data", []):
+                self._write(item["range"], item.get("values", []))
+            return web.json_response({"spreadsheetId": sid, "totalUpdatedRows": len(body.get("data", []))})
+        if rest[0] == "values" and len(rest) > 1:
+            rng = "/".join(rest[1:])
+            if request.method == "PUT":
+                body = await request.json()
+                self._write(rng, body.get("values", []))
+                return web.json_response({"spreadsheetId": sid, "updatedRange": unquote(rng)})
+            sheet, row0, col0 = self._parse_range(rng)
+            rows = [r[col0:] for r in self.sheets.get(sheet, [])[row0:]]
+            if request.query.get("majorDimension") == "COLUMNS":
+                width = max((len(r) for r in rows), default=0)
+                cols = [[r[c] if c < len(r) else "" for r in rows] for c in range(width)]
+                rows = [[v for v in col] for col in cols]
+                for col in rows:
+                    while col and col[-1] == "":
+                        col.pop()
+            body = {"range": unquote(rng), "majorDimension": request.query.get("majorDimension", "ROWS")}
+            if any(rows):
+                body["values"] = rows
+            return web.json_response(body)
+        raise web.HTTPNotFound()
+
+    # ===== Telegram Bot API =====
+    async def telegram(self, request: web.Request):
+        await self._inject("telegram")
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot",
+                "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": True,
+            }})
+        if method == "sendMessage":
+            chat_id = int(params.get("chat_id"))
+            text = params.get("text", "")
+            self._message_id += 1
+            if self.on_reply is not None:
+                self.on_reply(chat_id, text)
+            return web.json_response({"ok": True, "result": {
+                "message_id": self._message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": text,
+            }})
+        return web.json_response({"ok": True, "result": True})
+
+def parse_overrides(items: List[str], cast=float) -> Dict[str, float]:
+    """["yahoo_chart=200", "coingecko=0.1"] -> {"yahoo_chart": 200.0, ...}"""
+    out = {}
+    for item in items or []:
+        name, _, val = item.partition("=")
+        if name.strip() not in UPSTREAMS:
+            raise SystemExit(f"upstream tidak dikenal: {name} (pilihan: {', '.join(UPSTREAMS)})")
+        out[name.strip()] = cast(val)
+    return out
@@ -0,0 +1,151 @@
+"""
+Benchmark ekstraksi harga emas: cara lama (BeautifulSoup + find_all(string=...))
+vs adapters.gold_extract (lxml pull parser, berhenti di match pertama).
+
+    python bench/gold_extract_bench.py [--iterations 50] [--pad 20]
+
+Fixture ada di bench/fixtures/{antam,pegadaian,hargaemas}.html. File yang ada
+di repo adalah tiruan struktur halaman aslinya; untuk angka yang representatif
+simpan halaman asli, mis.:
+
+    curl -A "Mozilla/5.0" -o bench/fixtures/antam.html https://www.logammulia.com/id/harga-emas-hari-ini
+
+--pad menambahkan N blok konten pengisi sebelum </body> agar ukurannya
+mendekati halaman asli (ratusan KB). Memori diukur dua cara: peak heap Python
+(tracemalloc) dan kenaikan peak RSS di proses terpisah (mencakup alokasi C
+milik lxml/libxml2 yang tidak terlihat oleh tracemalloc).
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import resource
+import statistics
+import tracemalloc
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapters.gold_extract import (  # noqa: E402
+    _RP_REGEX, _parse_idr, _pick_reasonable, extract_antam, extract_sweep,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+_PAD_BLOCK = (
+    '<section class="pad"><div class="row">'
+    + "".join(
+        f'<div class="col"><h4>Produk {i}</h4><p>Deskripsi produk {i} dengan harga promo '
+        f'Rp {i * 1250}.000 dan cicilan ringan.</p><a href="/p/{i}">Detail</a></div>'
+        for i in range(1, 26)
+    )
+    + "</div></section>\n"
+)
+
+# ===== Cara lama (disalin dari adapters/gold.py sebelum gold_extract) =====
+def legacy_antam(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    td = soup.find("td", attrs={"data-title": re.compile(r"Harga Emas per Gram", re.I)})
+    if td and td.text.strip():
+        val = _parse_idr(td.text)
+        if val:
+            return val
+    label = soup.find(string=re.compile(r"Harga Emas per Gram", re.I))
+    if label:
+        nxt = label.parent.find_next(string=_RP_REGEX)
+        if nxt:
+            val = _parse_idr(nxt)
+            if val:
+                return val
+    texts = soup.find_all(string=_RP_REGEX)
+    candidates = [c for c in (_parse_idr(t) for t in texts) if c]
+    return _pick_reasonable(candidates)
+
+def legacy_sweep(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    texts = soup.find_all(string=_RP_REGEX)
+    candidates = [c for c in (_parse_idr(t) for t in texts) if c]
+    return _pick_reasonable(candidates)
+
+IMPLS = {
+    "antam": {"legacy": legacy_antam, "lean": lambda h: extract_antam(h)[0]},
+    "pegadaian": {"legacy": legacy_sweep, "lean": lambda h: extract_sweep(h)[0]},
+    "hargaemas": {"legacy": legacy_sweep, "lean": lambda h: extract_sweep(h)[0]},
+}
+
+def load_fixture(name, pad):
+    with open(os.path.join(FIXTURES, f"{name}.html"), "r", encoding="utf-8") as f:
+        html = f.read()
+    if pad:
+        html = html.replace("</body>", _PAD_BLOCK * pad + "</body>", 1)
+    return html
+
+def _rss_kb():
+    # VmHWM (Linux) di-reset saat exec; ru_maxrss bisa mewarisi peak proses induk.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss: KB di Linux, byte di macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def _rss_child(site, impl, pad, iterations, out):
+    import bs4  # noqa: F401  (samakan baseline import di kedua implementasi)
+    html = load_fixture(site, pad)
+    fn = IMPLS[site][impl]
+    base = _rss_kb()
+    for _ in range(iterations):
+        fn(html)
+    out.put(_rss_kb() - base)
+
+def measure(site, impl, html, iterations, pad):
+    fn = IMPLS[site][impl]
+    value = fn(html)  # warm-up
+    times = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn(html)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ctx = mp.get_context("spawn")
+    q = ctx.Queue()
+    p = ctx.Process(target=_rss_child, args=(site, impl, pad, min(iterations, 10), q))
+    p.start()
+    rss_delta = q.get()
+    p.join()
+    return {
+        "value": value,
+        "median_ms": statistics.median(times) * 1000,
+        "p95_ms": sorted(times)[int(len(times) * 0.95) - 1] * 1000,
+        "py_peak_kb": peak / 1024,
+        "rss_delta_kb": rss_delta,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=50)
+    ap.add_argument("--pad", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"{'site':<10} {'impl':<7} {'size':>8} {'value':>10} {'median ms':>10} "
+          f"{'p95 ms':>8} {'py peak KB':>11} {'RSS +KB':>8}")
+    for site in IMPLS:
+        html = load_fixture(site, args.pad)
+        for impl in ("legacy", "lean"):
+            r = measure(site, impl, html, args.iterations, args.pad)
+            print(f"{site:<10} {impl:<7} {len(html):>8} {str(r['value']):>10} {r['median_ms']:>10.2f} "
+                  f"{r['p95_ms']:>8.2f} {r['py_peak_kb']:>11.1f} {r['rss_delta_kb']:>8}")
+
+if __name__ == "__main__":
+    main()
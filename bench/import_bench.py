@@ -0,0 +1,61 @@
+"""
+Waktu import & RSS modul bot di proses bersih (cold start), plus apakah
+yfinance/pandas ikut ter-load.
+
+    python bench/import_bench.py [--runs 5] [--root PATH]
+
+--root bisa diarahkan ke checkout lain (mis. `git worktree add /tmp/old HEAD~1`)
+untuk membandingkan sebelum/sesudah. Tiap modul diukur di interpreter baru
+sebanyak --runs kali; yang dilaporkan median waktu import dan kenaikan RSS.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+MODULES = ["adapters.fx", "adapters.crypto", "adapters.stocks", "bot_handlers", "app"]
+
+_CHILD = r"""
+import os, sys, time, json
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+base = rss_kb()
+t0 = time.perf_counter()
+__import__(sys.argv[1])
+dt = time.perf_counter() - t0
+print(json.dumps({"ms": dt * 1000, "rss_kb": rss_kb() - base,
+                  "yfinance": "yfinance" in sys.modules, "pandas": "pandas" in sys.modules}))
+"""
+
+def measure(root: str, module: str, runs: int) -> dict:
+    env = {**os.environ, "BOT_TOKEN": os.environ.get("BOT_TOKEN", "1:bench"), "PYTHONPATH": root}
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _CHILD, module], cwd=root, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "ms": statistics.median(s["ms"] for s in samples),
+        "rss_kb": statistics.median(s["rss_kb"] for s in samples),
+        "yfinance": samples[-1]["yfinance"],
+        "pandas": samples[-1]["pandas"],
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--root", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = ap.parse_args()
+    print(f"{'module':<16} {'import ms':>10} {'RSS +KB':>9} {'yfinance':>9} {'pandas':>7}")
+    for module in MODULES:
+        r = measure(args.root, module, args.runs)
+        print(f"{module:<16} {r['ms']:>10.1f} {r['rss_kb']:>9.0f} {str(r['yfinance']):>9} {str(r['pandas']):>7}")
+
+if __name__ == "__main__":
+    main()
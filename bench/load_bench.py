@@ -0,0 +1,265 @@
+"""
+Load test ujung ke ujung: app.py asli (uvicorn, mode webhook) dijalankan di
+subprocess dengan semua upstream diarahkan ke bench/fake_upstreams.py, lalu
+ribuan update sintetis dikirim ke /webhook/<secret> secara bersamaan.
+Latency satu command = dari POST webhook sampai sendMessage balasannya tiba
+di Bot API tiruan.
+
+    python bench/load_bench.py [--updates 2000] [--concurrency 200]
+        [--commands price,crypto,fx,gold,watchlist] [--keys 20]
+        [--latency 50] [--upstream-latency yahoo_chart=200]
+        [--fail coingecko=0.2] [--hang antam=0.05] [--json out.json]
+
+Per command dilaporkan: commands/detik, p50/p95/p99 (ms), balasan gagal/
+timeout, dan rata-rata panggilan upstream per command. --json menyimpan hasil
+yang sama untuk dibandingkan antar commit. yfinance tidak dipakai (urutan
+hedge di-set ke tier HTTP) karena tidak bisa diarahkan ke server lokal.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstreams import UPSTREAMS, FakeUpstreams, UpstreamConfig, parse_overrides  # noqa: E402
+
+SECRET = "bench"
+BOT_TOKEN = "123456:BENCH"
+
+STOCKS = ["BBCA", "BBRI", "BMRI", "TLKM", "ASII", "ANTM", "GOTO", "AAPL", "MSFT", "NVDA"]
+CRYPTOS = ["BTC", "ETH", "SOL", "BNB", "DOGE", "ADA", "XRP", "TON", "LTC", "DOT"]
+FX_PAIRS = ["USDIDR", "EURIDR", "SGDIDR", "USDJPY", "JPYIDR", "GBPIDR", "AUDIDR", "USDSGD"]
+WATCHLIST = ["BTC", "ETH", "USDIDR", "EURIDR", "GOLD"]
+
+def _pick(pool: List[str], keys: int) -> str:
+    # --keys > ukuran pool: tambahkan ticker sintetis supaya lebih banyak cache miss.
+    i = random.randrange(max(keys, 1))
+    return pool[i] if i < len(pool) else f"{pool[i % len(pool)]}{i}"
+
+COMMANDS = {
+    "price": lambda k: f"/price {_pick(STOCKS, k)}",
+    "crypto": lambda k: f"/crypto {_pick(CRYPTOS[:10], min(k, 10))}",
+    "crypto_multi": lambda k: "/crypto " + " ".join(random.sample(CRYPTOS, 5)),
+    "fx": lambda k: f"/fx {random.choice(FX_PAIRS)}",
+    "fx_multi": lambda k: "/fx " + " ".join(random.sample(FX_PAIRS, 4)),
+    "gold": lambda k: "/gold",
+    "watchlist": lambda k: "/watchlist",
+    "start": lambda k: "/start",
+}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _update(update_id: int, chat_id: int, text: str) -> dict:
+    cmd = text.split()[0]
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(cmd)}],
+        },
+    }
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.waiters: Dict[int, asyncio.Future] = {}
+        cfg = {}
+        lat = parse_overrides(args.upstream_latency)
+        fail = parse_overrides(args.fail)
+        hang = parse_overrides(args.hang)
+        for name in UPSTREAMS:
+            cfg[name] = UpstreamConfig(
+                latency_ms=lat.get(name, args.latency if name != "telegram" else args.telegram_latency),
+                jitter=args.jitter, fail=fail.get(name, 0.0), hang=hang.get(name, 0.0),
+            )
+        self.fakes = FakeUpstreams(cfg, WATCHLIST, on_reply=self._on_reply)
+        self.proc: Optional[subprocess.Popen] = None
+        self.next_id = 1
+
+    def _on_reply(self, chat_id: int, text: str):
+        fut = self.waiters.pop(chat_id, None)
+        if fut is not None and not fut.done():
+            fut.set_result((time.perf_counter(), text))
+
+    async def start_app(self, fake_base: str) -> str:
+        port = _free_port()
+        base = f"http://127.0.0.1:{port}"
+        env = {
+            **os.environ,
+            **self.fakes.env(fake_base),
+            "BOT_TOKEN": BOT_TOKEN,
+            "WEBHOOK_SECRET": SECRET,
+            "RENDER_EXTERNAL_URL": base,
+            "SHEET_ID": "bench",
+            "HEDGE_ORDER_STOCKS": "yahoo_chart",
+            "HEDGE_ORDER_FX": "yahoo_chart,exchangerate_host",
+            "HEDGE_ORDER_CRYPTO": "coingecko,binance",
+            "PREFETCH_ENABLED": "1" if self.args.prefetch else "0",
+            "PERSIST_CACHE_PATH": "",
+            "ALERTS_PATH": "",
+            "QUOTA_ENABLED": "1" if self.args.quota else "0",
+            "BINANCE_STREAM_SYMBOLS": "",
+            "STOCK_TICKER_INDEX": os.path.join(ROOT, "data", "tickers.csv"),
+        }
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=ROOT, env=env,
+            stdout=None if self.args.verbose else subprocess.DEVNULL,
+            stderr=None if self.args.verbose else subprocess.DEVNULL,
+        )
+        async with aiohttp.ClientSession() as s:
+            for _ in range(200):
+                if self.proc.poll() is not None:
+                    raise SystemExit("app.py berhenti saat startup (jalankan dengan --verbose)")
+                try:
+                    async with s.get(f"{base}/healthz") as r:
+                        if r.status == 200:
+                            return base
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.1)
+        raise SystemExit("app.py tidak siap dalam 20 detik")
+
+    def stop_app(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    async def _one(self, session: aiohttp.ClientSession, url: str, text: str, out: dict):
+        update_id = self.next_id
+        self.next_id += 1
+        chat_id = 10_000_000 + update_id
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters[chat_id] = fut
+        t0 = time.perf_counter()
+        try:
+            async with session.post(url, json=_update(update_id, chat_id, text)) as r:
+                if r.status != 200:
+                    out["rejected"] += 1
+                    self.waiters.pop(chat_id, None)
+                    return
+            t1, reply = await asyncio.wait_for(fut, self.args.timeout)
+        except asyncio.TimeoutError:
+            out["timeouts"] += 1
+            self.waiters.pop(chat_id, None)
+            return
+        except aiohttp.ClientError:
+            out["rejected"] += 1
+            self.waiters.pop(chat_id, None)
+            return
+        out["latencies"].append(t1 - t0)
+        if reply.startswith("Gagal") or "gagal" in reply:
+            out["failed_replies"] += 1
+
+    async def run_phase(self, base: str, command: str) -> dict:
+        url = f"{base}/webhook/{SECRET}"
+        make = COMMANDS[command]
+        out = {"latencies": [], "rejected": 0, "timeouts": 0, "failed_replies": 0}
+        sem = asyncio.Semaphore(self.args.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.args.concurrency)
+
+        async def bounded(session):
+            async with sem:
+                await self._one(session, url, make(self.args.keys), out)
+
+        self.fakes.reset_calls()
+        async with aiohttp.ClientSession(connector=connector) as session:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(bounded(session) for _ in range(self.args.updates)))
+            wall = time.perf_counter() - t0
+        lat = out["latencies"]
+        calls = {k: v / self.args.updates for k, v in self.fakes.calls.items() if v and k != "telegram"}
+        return {
+            "command": command,
+            "updates": self.args.updates,
+            "replied": len(lat),
+            "rejected": out["rejected"],
+            "timeouts": out["timeouts"],
+            "failed_replies": out["failed_replies"],
+            "wall_s": wall,
+            "cmds_per_s": len(lat) / wall if wall else 0.0,
+            "p50_ms": (_pct(lat, 0.50) or 0) * 1000,
+            "p95_ms": (_pct(lat, 0.95) or 0) * 1000,
+            "p99_ms": (_pct(lat, 0.99) or 0) * 1000,
+            "mean_ms": (statistics.fmean(lat) if lat else 0) * 1000,
+            "upstream_calls_per_cmd": calls,
+        }
+
+def _print(results: List[dict]):
+    print(f"{'command':<13} {'ok':>6} {'rej':>5} {'t/o':>5} {'fail':>5} {'cmd/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  upstream calls/cmd")
+    for r in results:
+        calls = " ".join(f"{k}={v:.3f}" for k, v in sorted(r["upstream_calls_per_cmd"].items())) or "-"
+        print(f"{r['command']:<13} {r['replied']:>6} {r['rejected']:>5} {r['timeouts']:>5} "
+              f"{r['failed_replies']:>5} {r['cmds_per_s']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {calls}")
+
+async def main_async(args):
+    h = Harness(args)
+    fake_base = await h.fakes.start()
+    try:
+        base = await h.start_app(fake_base)
+        results = []
+        for command in args.commands.split(","):
+            command = command.strip()
+            if command not in COMMANDS:
+                raise SystemExit(f"command tidak dikenal: {command} (pilihan: {', '.join(COMMANDS)})")
+            results.append(await h.run_phase(base, command))
+        _print(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"args": vars(args), "results": results}, f, indent=2)
+    finally:
+        h.stop_app()
+        await h.fakes.stop()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--updates", type=int, default=2000, help="update per command")
+    ap.add_argument("--concurrency", type=int, default=200, help="update in-flight bersamaan")
+    ap.add_argument("--commands", default="price,crypto,crypto_multi,fx,fx_multi,gold,watchlist")
+    ap.add_argument("--keys", type=int, default=10, help="jumlah simbol berbeda per command (cache miss)")
+    ap.add_argument("--latency", type=float, default=50, help="latency default upstream (ms)")
+    ap.add_argument("--telegram-latency", type=float, default=5, help="latency Bot API tiruan (ms)")
+    ap.add_argument("--jitter", type=float, default=0.2, help="jitter latency relatif (0.2 = ±20%%)")
+    ap.add_argument("--upstream-latency", action="append", metavar="NAME=MS")
+    ap.add_argument("--fail", action="append", metavar="NAME=P", help="peluang HTTP 503")
+    ap.add_argument("--hang", action="append", metavar="NAME=P", help="peluang tidak menjawab (timeout)")
+    ap.add_argument("--timeout", type=float, default=60, help="detik menunggu balasan per update")
+    ap.add_argument("--prefetch", action="store_true", help="aktifkan prefetcher di app")
+    ap.add_argument("--quota", action="store_true", help="aktifkan kuota provider (batas upstream asli)")
+    ap.add_argument("--json", help="simpan hasil ke file JSON")
+    ap.add_argument("--verbose", action="store_true", help="tampilkan log app.py")
+    asyncio.run(main_async(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,45 @@
-from telegram import Update
-from telegram.ext import CommandHandler, ContextTypes, Application
+import re
+import time
+import asyncio
+import logging
+from typing import Dict
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import Application, CommandHandler, ContextTypes, InlineQueryHandler
 
 from adapters.stocks import get_stock_price
-from adapters.crypto import get_crypto_price_idr
-from adapters.fx import get_fx_rate
+from adapters.crypto import get_crypto_price_idr, get_crypto_prices_idr
+from adapters.fx import get_fx_rate, get_fx_rates
 from adapters.gold import get_gold_price_idr  # <- sumber Indonesia (Antam/Pegadaian)
+from adapters.quotes import get_quotes, history_key, resolve_asset
+from adapters.suggest import cached_quote, suggest
+from utils import alerts
 from utils.formatting import fmt_idr, fmt_usd
+from utils.history import MAX_SPAN, change, parse_window
+from utils.metrics import timed_command
+
+log = logging.getLogger(__name__)
+
+MAX_CRYPTO_BATCH = 30  # batas simbol per /crypto
+MAX_FX_BATCH = 20  # batas pair per /fx
+INLINE_DEBOUNCE = 0.3  # detik; hanya ketikan terakhir per user yang dijawab
+INLINE_MAX_RESULTS = 10
+INLINE_CACHE_TIME = 30  # detik cache jawaban di sisi Telegram
 
 HELP_TEXT = (
     "Hai! Aku bot investasi.\n"
     "Perintah yang tersedia:\n"
     "/price <TICKER> – harga saham (yfinance)\n"
-    "/crypto <SYMBOL> – harga crypto (BTC, ETH, dll)\n"
+    "/crypto <SYMBOL> [SYMBOL ...] – harga crypto (BTC, ETH, dll)\n"
     "/gold – harga emas Indonesia per gram (Antam; fallback Pegadaian)\n"
-    "/fx <PAIR> – kurs FX (mis. USDIDR, USDJPY)\n"
-    "/watchlist – lihat watchlist\n"
+    "/fx <PAIR> [PAIR ...] – kurs FX (mis. USDIDR, USDJPY)\n"
+    "/change <ASSET> [WINDOW] – perubahan harga dari data lokal (mis. /change BTC 4h)\n"
+    "/alert <ASSET> > atau < <HARGA> – notifikasi saat harga terlewati (mis. /alert BTC > 1500000000)\n"
+    "/alerts – daftar alert; /delalert <ID|all> – hapus alert\n"
+    "/watchlist – lihat watchlist + harga terkini\n"
     "/addwatch <ASSET> – tambah ke watchlist\n"
     "/delwatch <ASSET> – hapus dari watchlist\n"
+    "Inline: ketik @<nama bot> BB… di chat mana saja untuk cari simbol\n"
 )
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -33,11 +56,22 @@ async def cmd_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
         currency = data.get("currency") or ""
         await update.message.reply_text(f"{ticker}: {price} {currency}".strip())
     else:
-        await update.message.reply_text(f"Gagal mengambil harga {ticker}: {data['error']}")
+        await update.message.reply_text(f"Gagal mengambil harga {ticker}: {data['error']}{'' if data.get('busy') else _did_you_mean(ticker)}")
 
 async def cmd_crypto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
-        await update.message.reply_text("Format: /crypto <SYMBOL>, contoh: /crypto BTC")
+        await update.message.reply_text("Format: /crypto <SYMBOL> [SYMBOL ...], contoh: /crypto BTC ETH")
+        return
+    if len(context.args) > 1:
+        results = await get_crypto_prices_idr(context.args[:MAX_CRYPTO_BATCH])
+        lines = []
+        for sym, data in results.items():
+            if data["ok"]:
+                idr_txt = fmt_idr(data["idr"]) if data["idr"] else "N/A"
+                lines.append(f"{sym}-USD: {fmt_usd(data['usd'])} ≈ {idr_txt}")
+            else:
+                lines.append(f"{sym}: gagal ({data['error']})")
+        await update.message.reply_text("\n".join(lines))
         return
     sym = context.args[0].upper()
     data = await get_crypto_price_idr(sym)
@@ -47,7 +81,7 @@ async def cmd_crypto(update: Update, context: ContextTypes.DEFAULT_TYPE):
         idr_txt = fmt_idr(idr) if idr else "N/A"
         await update.message.reply_text(f"{sym}-USD: {fmt_usd(usd)} ≈ {idr_txt}")
     else:
-        await update.message.reply_text(f"Gagal mengambil harga crypto: {data['error']}")
+        await update.message.reply_text(f"Gagal mengambil harga crypto: {data['error']}{'' if data.get('busy') else _did_you_mean(sym)}")
 
 async def cmd_gold(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -64,30 +98,216 @@ async def cmd_gold(update: Update, context: ContextTypes.DEFAULT_TYPE):
         msg = f"💰 Emas per gram ({src}): {idr_txt}"
         if usd_txt:
             msg += f"  (~ {usd_txt})"
+        if data.get("stale"):
+            msg += "\n(data terakhir; sedang diperbarui)"
         msg += "\nSumber: logammulia.com (fallback: pegadaian.co.id)\n" \
                "Catatan: harga ritel Indonesia biasanya > harga spot global."
         await update.message.reply_text(msg)
     else:
         await update.message.reply_text(f"Gagal mengambil harga emas: {data.get('error','unknown')}")
 
+def _fmt_fx_ts(data: dict) -> str:
+    ts = data.get("ts")
+    if not ts:
+        return ""
+    return time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(ts))
+
 async def cmd_fx(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
-        await update.message.reply_text("Format: /fx <PAIR>, contoh: /fx USDIDR")
+        await update.message.reply_text("Format: /fx <PAIR> [PAIR ...], contoh: /fx USDIDR EURIDR")
+        return
+    if len(context.args) > 1:
+        results = await get_fx_rates(context.args[:MAX_FX_BATCH])
+        lines = []
+        stamps = set()
+        for pair, data in results.items():
+            if data["ok"]:
+                lines.append(f"{pair}: {data['rate']}")
+                if _fmt_fx_ts(data):
+                    stamps.add(_fmt_fx_ts(data))
+            else:
+                lines.append(f"{pair}: gagal ({data['error']})")
+        if stamps:
+            lines.append(f"(tabel kurs per {max(stamps)})")
+        await update.message.reply_text("\n".join(lines))
         return
     pair = context.args[0].upper()
     data = await get_fx_rate(pair)
     if data["ok"]:
-        await update.message.reply_text(f"{pair}: {data['rate']}")
+        msg = f"{pair}: {data['rate']}"
+        if _fmt_fx_ts(data):
+            msg += f"\n(tabel kurs per {_fmt_fx_ts(data)})"
+        await update.message.reply_text(msg)
     else:
         await update.message.reply_text(f"Gagal mengambil kurs {pair}: {data['error']}")
 
+# 24 jam, kecuali HISTORY_POINTS x HISTORY_MIN_INTERVAL memang lebih pendek.
+DEFAULT_CHANGE_WINDOW = "24h" if MAX_SPAN >= 86400 else f"{max(1, int(MAX_SPAN // 60))}m"
+
+def _fmt_change_price(kind: str, value: float) -> str:
+    if kind == "crypto":
+        return fmt_usd(value)
+    if kind == "gold":
+        return fmt_idr(value)
+    return f"{value:,.6g}" if kind == "fx" else f"{value:,.2f}"
+
+def _fmt_span(seconds: float) -> str:
+    if seconds >= 86400:
+        return f"{seconds / 86400:.1f} hari"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} jam"
+    return f"{seconds / 60:.0f} menit"
+
+async def cmd_change(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text(
+            "Format: /change <ASSET> [WINDOW], contoh: /change BTC 4h, /change BBCA.JK 1d, /change USDIDR 30m")
+        return
+    asset = context.args[0].upper()
+    window_txt = context.args[1] if len(context.args) > 1 else DEFAULT_CHANGE_WINDOW
+    window = parse_window(window_txt)
+    if window is None:
+        await update.message.reply_text("Window tidak valid. Pakai mis. 30m, 4h, 1d.")
+        return
+    kind, sym = history_key(asset)
+    data = change(kind, sym, window)
+    if data is None or data["points"] < 2:
+        await update.message.reply_text(
+            f"Belum cukup riwayat {asset} dalam {window_txt}. "
+            f"Riwayat terisi dari harga yang diminta (mis. /price, /crypto, /fx, /gold).")
+        return
+    pct = f"{data['pct']:+.2f}%" if data["pct"] is not None else "N/A"
+    fmt = lambda v: _fmt_change_price(kind, v)
+    await update.message.reply_text(
+        f"{asset} ({window_txt}): {pct}\n"
+        f"{fmt(data['first'])} → {fmt(data['last'])}\n"
+        f"Min {fmt(data['min'])} · Max {fmt(data['max'])}\n"
+        f"{data['spark']}\n"
+        f"({data['points']} titik, rentang {_fmt_span(data['span'])})"
+    )
+
+# ===== Alert harga =====
+_ALERT_RE = re.compile(r"^(.+?)\s*([<>])\s*([\d.,_]+)\s*(IDR|USD)?$", re.I)
+
+# Format angka Indonesia seperti yang dicetak bot ("Rp 9.000", "16.250,5"):
+# titik + tepat 3 digit = pemisah ribuan, koma = desimal. "1,500,000" (koma
+# ribuan bergaya US) juga diterima kalau grupnya lebih dari satu.
+_ID_THOUSANDS_RE = re.compile(r"([1-9]\d{0,2}(?:\.\d{3})+)(?:,(\d+))?")
+_US_THOUSANDS_RE = re.compile(r"[1-9]\d{0,2}(?:,\d{3}){2,}")
+_AMBIGUOUS_RE = re.compile(r"[1-9]\d{0,2},\d{3}")
+_DECIMAL_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+def _parse_amount(text: str) -> float:
+    """
+    '9000', '9.000', '1.500.000.000', '16.250,5', '1,5', '16250.5', '0.001',
+    '1_500_000_000', '1,500,000,000'. Input yang ambigu ('16,250': 16,25 atau
+    16250?) atau tidak jelas formatnya raise ValueError, bukan ditebak.
+    """
+    text = text.replace("_", "").strip()
+    m = _ID_THOUSANDS_RE.fullmatch(text)
+    if m:
+        return float(m.group(1).replace(".", "") + "." + (m.group(2) or "0"))
+    if _US_THOUSANDS_RE.fullmatch(text):
+        return float(text.replace(",", ""))
+    if _AMBIGUOUS_RE.fullmatch(text) or not _DECIMAL_RE.fullmatch(text):
+        raise ValueError(text)
+    return float(text.replace(",", "."))
+
+def _fmt_alert_price(a: "alerts.Alert", value: float) -> str:
+    if a.kind == "crypto":
+        return fmt_usd(value) if a.unit == "USD" else fmt_idr(value)
+    return _fmt_change_price(a.kind, value)
+
+def _fmt_alert(a: "alerts.Alert") -> str:
+    arah = "naik ke atas" if a.op == ">" else "turun ke bawah"
+    status = "" if a.armed else " (terpicu; aktif lagi setelah harga balik)"
+    return f"#{a.id} {a.symbol} {arah} {_fmt_alert_price(a, a.threshold)}{status}"
+
+async def notify_alert(bot, a: "alerts.Alert", price: float):
+    arah = "naik ke atas" if a.op == ">" else "turun ke bawah"
+    await bot.send_message(
+        a.chat_id,
+        f"🔔 Alert #{a.id}: {a.symbol} {arah} {_fmt_alert_price(a, a.threshold)}\n"
+        f"Harga sekarang: {_fmt_alert_price(a, price)}",
+    )
+
+async def cmd_alert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    m = _ALERT_RE.match(" ".join(context.args or []).strip())
+    if not m:
+        await update.message.reply_text(
+            "Format: /alert <ASSET> > <HARGA> atau /alert <ASSET> < <HARGA>\n"
+            "Contoh: /alert BTC > 1500000000, /alert BBCA.JK < 9000, /alert USDIDR > 16500, "
+            "/alert ETH < 3000 USD")
+        return
+    asset, op, amount, unit = m.group(1).strip().upper(), m.group(2), m.group(3), (m.group(4) or "").upper()
+    try:
+        threshold = _parse_amount(amount)
+    except ValueError:
+        await update.message.reply_text(
+            f"Harga tidak valid: {amount} (contoh: 9000, 9.000, 16.250,5 atau 0.05)")
+        return
+    resolved = await resolve_asset(asset)
+    if not resolved["ok"]:
+        await update.message.reply_text(f"Gagal membuat alert {asset}: {resolved['error']}")
+        return
+    kind, sym = resolved["kind"], resolved["symbol"]
+    if kind == "crypto":
+        unit = unit or "IDR"
+    elif unit:
+        await update.message.reply_text("Satuan IDR/USD hanya untuk crypto (saham & FX memakai satuan aslinya).")
+        return
+    res = alerts.add_alert(update.effective_chat.id, kind, sym, unit, op, threshold)
+    if not res["ok"]:
+        await update.message.reply_text(f"Gagal membuat alert: {res['error']}")
+        return
+    await update.message.reply_text(f"Alert dibuat: {_fmt_alert(res['alert'])}")
+
+async def cmd_alerts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    items = alerts.list_alerts(update.effective_chat.id)
+    if not items:
+        await update.message.reply_text("Belum ada alert. Buat dengan /alert <ASSET> > <HARGA>")
+        return
+    await update.message.reply_text("Alert:\n" + "\n".join(_fmt_alert(a) for a in items))
+
+async def cmd_delalert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text("Format: /delalert <ID> atau /delalert all")
+        return
+    chat_id = update.effective_chat.id
+    arg = context.args[0].lstrip("#").lower()
+    if arg in ("all", "semua"):
+        n = alerts.delete_all(chat_id)
+        await update.message.reply_text(f"{n} alert dihapus")
+        return
+    if not arg.isdigit():
+        await update.message.reply_text("ID alert harus angka (lihat /alerts)")
+        return
+    if alerts.delete_alert(chat_id, int(arg)):
+        await update.message.reply_text(f"Alert #{arg} dihapus")
+    else:
+        await update.message.reply_text(f"Alert #{arg} tidak ditemukan")
+
+def _fmt_watch_line(asset: str, kind: str, data: dict) -> str:
+    if not data.get("ok"):
+        return f"• {asset}: N/A"
+    if kind == "crypto":
+        idr_txt = fmt_idr(data["idr"]) if data.get("idr") else "N/A"
+        return f"• {asset}: {fmt_usd(data['usd'])} ≈ {idr_txt}"
+    if kind == "fx":
+        return f"• {asset}: {data['rate']}"
+    if kind == "gold":
+        idr_txt = fmt_idr(data["idr"]) if data.get("idr") else "N/A"
+        return f"• {asset}: {idr_txt}/gram"
+    return f"• {asset}: {data['price']} {data.get('currency') or ''}".rstrip()
+
 async def cmd_watchlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
     from utils.sheets import get_watchlist
     wl = await get_watchlist()
     if not wl:
         await update.message.reply_text("Watchlist kosong. Tambah dengan /addwatch <ASSET>")
         return
-    text = "Watchlist:\n" + "\n".join(f"• {x}" for x in wl)
+    quotes = await get_quotes(wl)
+    text = "Watchlist:\n" + "\n".join(_fmt_watch_line(a, k, d) for a, k, d in quotes)
     await update.message.reply_text(text)
 
 async def cmd_addwatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -108,12 +328,81 @@ async def cmd_delwatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ok, msg = await del_watch(asset)
     await update.message.reply_text(msg)
 
+# ===== Inline query (autocomplete simbol) =====
+_INLINE_COMMAND = {"stock": "/price", "crypto": "/crypto", "fx": "/fx"}
+_inline_pending: Dict[int, asyncio.Task] = {}
+
+def _did_you_mean(raw: str) -> str:
+    """Saran simbol dari index lokal untuk ticker yang gagal (prefix makin pendek)."""
+    raw = raw.upper().strip()
+    for n in range(len(raw), 1, -1):
+        hits = [s["symbol"] for s in suggest(raw[:n], 3) if s["symbol"] != raw]
+        if hits:
+            return "\nMaksud kamu: " + ", ".join(hits) + "?"
+    return ""
+
+def _fmt_inline_price(kind: str, data: dict) -> str:
+    if kind == "crypto":
+        txt = fmt_usd(data["usd"])
+        return f"{txt} ≈ {fmt_idr(data['idr'])}" if data.get("idr") else txt
+    if kind == "fx":
+        return str(data["rate"])
+    if kind == "gold":
+        return f"{fmt_idr(data['idr'])}/gram" if data.get("idr") else "N/A"
+    return f"{data['price']} {data.get('currency') or ''}".rstrip()
+
+def _inline_results(query: str):
+    results = []
+    for s in suggest(query, INLINE_MAX_RESULTS):
+        kind, sym = s["kind"], s["symbol"]
+        data = cached_quote(kind, sym)
+        command = f"{_INLINE_COMMAND[kind]} {sym}" if kind in _INLINE_COMMAND else "/gold"
+        results.append(InlineQueryResultArticle(
+            id=f"{kind}:{sym}",
+            title=f"{sym} – {s['name']}" if s["name"] else sym,
+            description=_fmt_inline_price(kind, data) if data else "Harga belum ada di cache; pilih untuk cek",
+            input_message_content=InputTextMessageContent(command),
+        ))
+    return results
+
+async def _answer_inline(inline_query):
+    await asyncio.sleep(INLINE_DEBOUNCE)
+    await inline_query.answer(_inline_results(inline_query.query), cache_time=INLINE_CACHE_TIME)
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Debounce per user: jawaban dijadwalkan setelah INLINE_DEBOUNCE; ketikan
+    baru membatalkan yang lama, jadi hanya query terakhir yang dijawab.
+    Handler langsung selesai supaya tidak menahan worker webhook.
+    """
+    q = update.inline_query
+    if not q.query.strip():
+        return
+    user_id = q.from_user.id
+    prev = _inline_pending.pop(user_id, None)
+    if prev is not None:
+        prev.cancel()
+    task = asyncio.ensure_future(_answer_inline(q))
+    _inline_pending[user_id] = task
+
+    def _done(t: asyncio.Task):
+        if _inline_pending.get(user_id) is t:
+            del _inline_pending[user_id]
+        if not t.cancelled() and t.exception() is not None:
+            log.warning("inline answer error: %s", t.exception())
+    task.add_done_callback(_done)
+
 def register_handlers(app: Application):
-    app.add_handler(CommandHandler("start", cmd_start))
-    app.add_handler(CommandHandler("price", cmd_price))
-    app.add_handler(CommandHandler("crypto", cmd_crypto))
-    app.add_handler(CommandHandler("gold", cmd_gold))      # <- sudah pakai harga Indonesia
-    app.add_handler(CommandHandler("fx", cmd_fx))
-    app.add_handler(CommandHandler("watchlist", cmd_watchlist))
-    app.add_handler(CommandHandler("addwatch", cmd_addwatch))
-    app.add_handler(CommandHandler("delwatch", cmd_delwatch))
+    app.add_handler(CommandHandler("start", timed_command("start", cmd_start)))
+    app.add_handler(CommandHandler("price", timed_command("price", cmd_price)))
+    app.add_handler(CommandHandler("crypto", timed_command("crypto", cmd_crypto)))
+    app.add_handler(CommandHandler("gold", timed_command("gold", cmd_gold)))      # <- sudah pakai harga Indonesia
+    app.add_handler(CommandHandler("fx", timed_command("fx", cmd_fx)))
+    app.add_handler(CommandHandler("change", timed_command("change", cmd_change)))
+    app.add_handler(CommandHandler("alert", timed_command("alert", cmd_alert)))
+    app.add_handler(CommandHandler("alerts", timed_command("alerts", cmd_alerts)))
+    app.add_handler(CommandHandler("delalert", timed_command("delalert", cmd_delalert)))
+    app.add_handler(CommandHandler("watchlist", timed_command("watchlist", cmd_watchlist)))
+    app.add_handler(CommandHandler("addwatch", timed_command("addwatch", cmd_addwatch)))
+    app.add_handler(CommandHandler("delwatch", timed_command("delwatch", cmd_delwatch)))
+    app.add_handler(InlineQueryHandler(timed_command("inline", inline_query)))
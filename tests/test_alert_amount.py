@@ -0,0 +1,28 @@
+import pytest
+
+from bot_handlers import _parse_amount
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("9000", 9000.0),
+    ("9.000", 9000.0),
+    ("16.250", 16250.0),
+    ("16.250,5", 16250.5),
+    ("1.500.000.000", 1_500_000_000.0),
+    ("1.500.000,25", 1_500_000.25),
+    ("1,5", 1.5),
+    ("0,125", 0.125),
+    ("16250.5", 16250.5),
+    ("0.001", 0.001),
+    ("1234.567", 1234.567),
+    ("1_500_000_000", 1_500_000_000.0),
+    ("1,500,000,000", 1_500_000_000.0),
+])
+def test_parses_indonesian_and_plain_amounts(text, expected):
+    assert _parse_amount(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", ["16,250", "1,500.5", "1.50.000", "1.5.0", "9.000,", ",5", "1,,5", ""])
+def test_rejects_ambiguous_or_malformed_amounts(text):
+    with pytest.raises(ValueError):
+        _parse_amount(text)
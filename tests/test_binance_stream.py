@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+from adapters import binance_stream
+from utils.http import close_http
+
+
+async def _until(cond, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timeout"
+        await asyncio.sleep(0.01)
+
+
+def _ticker(pair, close):
+    return json.dumps({"stream": f"{pair.lower()}@miniTicker", "data": {"e": "24hrMiniTicker", "s": pair, "c": close}})
+
+
+def test_stream_updates_book_expires_stale_prices_and_reconnects(monkeypatch):
+    monkeypatch.setattr(binance_stream, "_SYMBOLS", ["BTC", "ETH"])
+    monkeypatch.setattr(binance_stream, "_STALE_AFTER", 0.3)
+    monkeypatch.setattr(binance_stream, "_RECONNECT_MIN", 0.05)
+    monkeypatch.setattr(binance_stream, "_book", {})
+    monkeypatch.setattr(binance_stream, "_state", {"connected": False, "messages": 0, "reconnects": 0, "last_error": None})
+
+    async def scenario():
+        conns = []
+        paths = []
+
+        # Stand-in untuk stream.binance.com: catat koneksi, kirim dari sisi tes.
+        async def stream(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            paths.append(request.path_qs)
+            conns.append(ws)
+            async for _ in ws:
+                pass
+            return ws
+
+        app = web.Application()
+        app.router.add_get("/stream", stream)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(binance_stream, "_WS_URL", f"ws://127.0.0.1:{port}")
+
+        binance_stream.start_stream()
+        try:
+            await _until(lambda: conns)
+            assert paths[0] == "/stream?streams=btcusdt@miniTicker/ethusdt@miniTicker"
+
+            # 1) price book terisi dari pesan miniTicker
+            await conns[0].send_str(_ticker("BTCUSDT", "65000.5"))
+            await _until(lambda: binance_stream.stream_price_usd("BTC") is not None)
+            assert binance_stream.stream_price_usd("btc") == 65000.5
+            assert binance_stream.stream_price_usd("ETH") is None
+
+            # 2) harga lebih tua dari BINANCE_STREAM_STALE diabaikan
+            await asyncio.sleep(0.4)
+            assert binance_stream.stream_price_usd("BTC") is None
+
+            # 3) server menutup koneksi -> client tersambung lagi dan book jalan lagi
+            await _until(lambda: binance_stream._state["connected"])
+            before = len(conns)
+            await conns[-1].close()
+            await _until(lambda: len(conns) > before and binance_stream._state["connected"])
+            assert binance_stream._state["reconnects"] >= 1
+            await conns[-1].send_str(_ticker("ETHUSDT", "3100"))
+            await _until(lambda: binance_stream.stream_price_usd("ETH") is not None)
+            assert binance_stream.stream_price_usd("ETH") == 3100.0
+        finally:
+            await binance_stream.stop_stream()
+            await close_http()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from adapters import crypto
+from utils import health
+from utils.quota import QuotaExceeded
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    monkeypatch.setattr(health, "_providers", {})
+
+    async def usdidr():
+        return 16000.0
+
+    monkeypatch.setattr(crypto, "_usdidr_rate", usdidr)
+
+    def install(throttle):
+        async def get_json(provider, url, **kwargs):
+            if throttle:
+                raise QuotaExceeded(provider)
+            return {} if provider == "coingecko" else []
+
+        async def chart(sym):
+            if throttle:
+                raise QuotaExceeded("yahoo_chart")
+            return None
+
+        async def run_blocking(provider, func, *args):
+            if throttle:
+                raise QuotaExceeded(provider)
+            return None
+
+        monkeypatch.setattr(crypto, "get_json", get_json)
+        monkeypatch.setattr(crypto, "_yahoo_chart_price_usd", chart)
+        monkeypatch.setattr(crypto, "run_blocking", run_blocking)
+
+    return install
+
+
+def test_throttled_batch_reports_busy(upstreams):
+    upstreams(throttle=True)
+    results = asyncio.run(crypto.get_crypto_prices_idr(["ZZA", "ZZB"], refresh=True))
+    assert all(r["busy"] and not r["ok"] for r in results.values())
+    assert not crypto.get_crypto_price_idr_rest.peek("ZZA")[0]
+
+
+def test_unknown_symbols_report_no_data(upstreams):
+    upstreams(throttle=False)
+    results = asyncio.run(crypto.get_crypto_prices_idr(["ZZA", "ZZB"], refresh=True))
+    assert all(not r["ok"] and not r.get("busy") for r in results.values())
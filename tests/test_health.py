@@ -0,0 +1,25 @@
+import asyncio
+
+from utils import executor, health
+
+
+def test_track_excludes_provider_slot_wait(monkeypatch):
+    # Registry modul diganti salinan; semuanya dikembalikan setelah tes.
+    monkeypatch.setitem(executor._LIMITS, "test_slot", 1)
+    monkeypatch.setattr(executor, "_sems", dict(executor._sems))
+    monkeypatch.setattr(executor, "_stats", dict(executor._stats))
+    monkeypatch.setattr(health, "_providers", dict(health._providers))
+
+    async def scenario():
+        async def call():
+            async with executor.provider_slot("test_slot"):
+                await asyncio.sleep(0.05)
+            return {"ok": True}
+
+        # Panggilan kedua antri ~50 ms di semaphore sebelum "upstream" jalan.
+        await asyncio.gather(health.track("test_slot", call), health.track("test_slot", call))
+        return [lat for lat, _ in health.provider("test_slot").samples]
+
+    latencies = asyncio.run(scenario())
+    assert len(latencies) == 2
+    assert max(latencies) < 0.09
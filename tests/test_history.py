@@ -0,0 +1,40 @@
+from utils import history
+from utils.history import Series
+
+
+def test_dense_observations_keep_one_point_per_slot():
+    s = Series(capacity=100)
+    t0 = 1_000_000 * history.MIN_INTERVAL
+    for i in range(10):
+        s.append(t0 + i * 45, 100.0 + i)
+    ts, prices = s.since(0)
+    # 10 observasi berjarak 45 dtk (0..405 dtk) -> satu titik per slot 60 dtk
+    assert s.count == int(405 // history.MIN_INTERVAL) + 1
+    assert prices[-1] == 109.0
+    assert ts == sorted(ts)
+
+
+def test_same_slot_overwrites_last_point():
+    s = Series(capacity=10)
+    t0 = 1_000_000 * history.MIN_INTERVAL
+    s.append(t0, 1.0)
+    s.append(t0 + history.MIN_INTERVAL / 2, 2.0)
+    assert s.count == 1
+    assert s.since(0) == ([t0 + history.MIN_INTERVAL / 2], [2.0])
+
+
+def test_ring_buffer_wraps_and_keeps_newest():
+    s = Series(capacity=5)
+    t0 = 1_000_000 * history.MIN_INTERVAL
+    for i in range(12):
+        s.append(t0 + i * history.MIN_INTERVAL, float(i))
+    ts, prices = s.since(0)
+    assert s.count == 5
+    assert prices == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert s.since(t0 + 9.5 * history.MIN_INTERVAL)[1] == [10.0, 11.0]
+
+
+def test_default_capacity_covers_default_change_window():
+    from bot_handlers import DEFAULT_CHANGE_WINDOW
+
+    assert history.parse_window(DEFAULT_CHANGE_WINDOW) <= history.MAX_SPAN
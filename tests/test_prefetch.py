@@ -0,0 +1,46 @@
+import asyncio
+
+from utils import prefetch
+
+
+class _Cache:
+    ttl = 60
+
+    def request_rate(self, key, now):
+        return 0.0
+
+    def age(self, key, now):
+        return None
+
+    def top_keys(self, n):
+        return []
+
+
+class _Wrapper:
+    name = "fake"
+
+    def __init__(self):
+        self.cache = _Cache()
+        self.inflight = {}
+
+    def key_for(self, *args, **kwargs):
+        return (args, tuple(sorted(kwargs.items())))
+
+
+def test_batch_refresh_is_charged_per_key(monkeypatch):
+    wrapper = _Wrapper()
+    refreshed = []
+
+    async def batch(symbols, refresh=False):
+        refreshed.extend(symbols)
+
+    monkeypatch.setattr(prefetch, "_tracked", {wrapper: batch})
+    monkeypatch.setattr(prefetch, "_pinned", [(wrapper, wrapper.key_for(f"S{i}")) for i in range(20)])
+    monkeypatch.setattr(prefetch, "_sources", [])
+    monkeypatch.setattr(prefetch, "_budget", prefetch._Budget(5))
+    monkeypatch.setattr(prefetch, "_stats", dict(prefetch._stats, skipped_budget=0))
+
+    asyncio.run(prefetch.tick())
+
+    assert refreshed == [f"S{i}" for i in range(5)]
+    assert prefetch._stats["skipped_budget"] == 15
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from adapters import stocks, yahoo_chart
+from utils import health, quota
+from utils.http import close_http
+
+
+def _chart_app(statuses):
+    async def chart(request):
+        sym = request.match_info["sym"]
+        status = statuses.get(sym, 404)
+        if status == 404:
+            return web.json_response({"chart": {"result": None, "error": {
+                "code": "Not Found", "description": "No data found, symbol may be delisted"}}}, status=404)
+        if status != 200:
+            return web.json_response({"chart": {"result": None, "error": {
+                "code": "Forbidden", "description": "denied"}}}, status=status)
+        return web.json_response({"chart": {"result": [{"meta": {"regularMarketPrice": 100.0, "currency": "USD"}}],
+                                             "error": None}})
+
+    app = web.Application()
+    app.router.add_get("/v8/finance/chart/{sym}", chart)
+    return app
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    monkeypatch.setattr(stocks, "STOCK_ORDER", ["yahoo_chart"])
+    monkeypatch.setattr(stocks, "CANDIDATE_SUFFIXES", [""])
+    monkeypatch.setattr(stocks, "indexed_symbol", lambda raw: None)
+    monkeypatch.setattr(health, "_providers", {})
+    monkeypatch.setattr(quota, "_buckets", {})
+
+
+def _probe_with(monkeypatch, statuses, ticker):
+    async def scenario():
+        runner = web.AppRunner(_chart_app(statuses))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(yahoo_chart, "YAHOO_CHART_URL", f"http://127.0.0.1:{port}")
+        try:
+            return await stocks._probe(ticker)
+        finally:
+            await close_http()
+            await runner.cleanup()
+
+    return asyncio.run(scenario())
+
+
+def test_not_found_is_definitive(isolated, monkeypatch):
+    quote, resolution = _probe_with(monkeypatch, {}, "ZZZQ")
+    assert not quote["ok"]
+    assert resolution["definitive"]
+
+
+@pytest.mark.parametrize("status", [401, 403])
+def test_auth_errors_are_not_definitive(isolated, monkeypatch, status):
+    quote, resolution = _probe_with(monkeypatch, {"ZZZQ": status}, "ZZZQ")
+    assert not quote["ok"]
+    assert not resolution["definitive"]
+
+
+def test_found_symbol_resolves(isolated, monkeypatch):
+    quote, resolution = _probe_with(monkeypatch, {"AAPL": 200}, "AAPL")
+    assert quote["ok"] and quote["price"] == 100.0
+    assert resolution == {"ok": True, "symbol": "AAPL", "tier": "yahoo_chart"}
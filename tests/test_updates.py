@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from utils import updates
+
+
+@pytest.fixture(autouse=True)
+def fresh_queue(monkeypatch):
+    monkeypatch.setattr(updates, "_queue", None)
+    monkeypatch.setattr(updates, "_workers", [])
+    monkeypatch.setattr(updates, "_seen", updates.OrderedDict())
+    monkeypatch.setattr(updates, "_draining", False)
+    monkeypatch.setattr(updates, "_stats", dict(updates._stats))
+
+
+def test_stop_drains_acked_updates_then_rejects_new_ones():
+    async def scenario():
+        done = []
+
+        async def process(update):
+            await asyncio.sleep(0.01)
+            done.append(update)
+
+        updates.start_update_workers(process, n=2)
+        for i in range(6):
+            assert updates.enqueue(i, i)
+        await updates.stop_update_workers(timeout=5)
+        with pytest.raises(updates.QueueFull):
+            updates.enqueue(100, 100)
+        return done
+
+    assert sorted(asyncio.run(scenario())) == list(range(6))
+
+
+def test_stop_gives_up_after_timeout():
+    async def scenario():
+        async def process(update):
+            await asyncio.sleep(10)
+
+        updates.start_update_workers(process, n=1)
+        updates.enqueue(1, 1)
+        updates.enqueue(2, 2)
+        before = updates._stats["dropped_on_stop"]
+        await asyncio.wait_for(updates.stop_update_workers(timeout=0.05), 1)
+        return updates._stats["dropped_on_stop"] - before
+
+    assert asyncio.run(scenario()) == 2
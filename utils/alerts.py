@@ -0,0 +1,306 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.executor import run_blocking
+
+# Alert harga: aturan "naik ke atas X" / "turun ke bawah X" per simbol.
+# Tiap simbol punya index terurut (list (threshold, id) + bisect), jadi satu
+# harga baru hanya menyentuh alert yang benar-benar terlewati: O(log n + k),
+# bukan scan semua alert. Alert yang sudah terpicu dinonaktifkan sampai harga
+# balik melewati threshold sejauh ALERT_HYSTERESIS (relatif), baru aktif lagi;
+# harga yang bolak-balik di sekitar threshold tidak memicu spam notifikasi.
+# Harga datang dari adapter yang sudah ada (lihat adapters/quotes.setup_alerts);
+# tidak ada polling sendiri.
+#
+# Config (env):
+#   ALERTS_PATH          file SQLite penyimpan alert, mis. /data/alerts.db
+#                        (default kosong = hanya di memori, hilang saat restart)
+#   ALERT_HYSTERESIS     jarak re-arm relatif, 0.005 = 0.5% (default)
+#   ALERTS_MAX_PER_CHAT  batas alert per chat (default 100)
+#   ALERTS_FLUSH         detik antar flush perubahan ke disk (default 2)
+#   ALERTS_QUEUE         batas antrian notifikasi (default 1000)
+
+PATH = os.getenv("ALERTS_PATH", "")
+HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS", "0.005"))
+MAX_PER_CHAT = int(os.getenv("ALERTS_MAX_PER_CHAT", "100"))
+FLUSH_EVERY = float(os.getenv("ALERTS_FLUSH", "2"))
+QUEUE_SIZE = int(os.getenv("ALERTS_QUEUE", "1000"))
+
+log = logging.getLogger(__name__)
+
+_INF = float("inf")
+
+class Alert:
+    __slots__ = ("id", "chat_id", "kind", "symbol", "unit", "op", "threshold", "armed", "created")
+
+    def __init__(self, id: int, chat_id: int, kind: str, symbol: str, unit: str,
+                 op: str, threshold: float, armed: bool = True, created: Optional[float] = None):
+        self.id = id
+        self.chat_id = chat_id
+        self.kind = kind
+        self.symbol = symbol
+        self.unit = unit          # "" kecuali crypto: "IDR" atau "USD"
+        self.op = op              # ">" atau "<"
+        self.threshold = threshold
+        self.armed = armed
+        self.created = time.time() if created is None else created
+
+    @property
+    def book_key(self) -> Tuple[str, str, str]:
+        return self.kind, self.symbol, self.unit
+
+    def _row(self) -> tuple:
+        return (self.id, self.chat_id, self.kind, self.symbol, self.unit, self.op,
+                self.threshold, int(self.armed), self.created)
+
+class _Book:
+    """Index satu simbol; tiap list berisi (key, alert_id) urut naik."""
+    __slots__ = ("above", "below", "rearm_above", "rearm_below")
+
+    def __init__(self):
+        self.above: List[Tuple[float, int]] = []        # ">" aktif, key = threshold
+        self.below: List[Tuple[float, int]] = []        # "<" aktif, key = threshold
+        self.rearm_above: List[Tuple[float, int]] = []  # ">" terpicu, key = threshold*(1-H)
+        self.rearm_below: List[Tuple[float, int]] = []  # "<" terpicu, key = threshold*(1+H)
+
+    def _slot(self, a: Alert) -> Tuple[List[Tuple[float, int]], float]:
+        if a.op == ">":
+            return (self.above, a.threshold) if a.armed else (self.rearm_above, a.threshold * (1 - HYSTERESIS))
+        return (self.below, a.threshold) if a.armed else (self.rearm_below, a.threshold * (1 + HYSTERESIS))
+
+    def add(self, a: Alert):
+        lst, key = self._slot(a)
+        insort(lst, (key, a.id))
+
+    def remove(self, a: Alert):
+        lst, key = self._slot(a)
+        i = bisect_left(lst, (key, a.id))
+        if i < len(lst) and lst[i] == (key, a.id):
+            del lst[i]
+
+    def __len__(self):
+        return len(self.above) + len(self.below) + len(self.rearm_above) + len(self.rearm_below)
+
+_alerts: Dict[int, Alert] = {}
+_by_chat: Dict[int, Dict[int, Alert]] = {}
+_books: Dict[Tuple[str, str, str], _Book] = {}
+_next_id = 1
+
+_conn: Optional[sqlite3.Connection] = None
+_dirty: Dict[int, Optional[tuple]] = {}   # id -> row terbaru, None = dihapus
+_task: Optional[asyncio.Task] = None
+
+_notifier: Optional[Callable[[Alert, float], Awaitable[Any]]] = None
+_queue: Optional[asyncio.Queue] = None
+_sender: Optional[asyncio.Task] = None
+_stats = {"observed": 0, "fired": 0, "rearmed": 0, "dropped": 0, "notify_errors": 0, "errors": 0}
+
+def _mark(alert_id: int, row: Optional[tuple]):
+    # Tanpa ALERTS_PATH tidak ada yang di-flush; jangan menumpuk perubahan.
+    if PATH:
+        _dirty[alert_id] = row
+
+# ===== Index =====
+def _insert(a: Alert):
+    _alerts[a.id] = a
+    _by_chat.setdefault(a.chat_id, {})[a.id] = a
+    _books.setdefault(a.book_key, _Book()).add(a)
+
+def _discard(a: Alert):
+    _alerts.pop(a.id, None)
+    chat = _by_chat.get(a.chat_id)
+    if chat is not None:
+        chat.pop(a.id, None)
+        if not chat:
+            del _by_chat[a.chat_id]
+    book = _books.get(a.book_key)
+    if book is not None:
+        book.remove(a)
+        if not len(book):
+            del _books[a.book_key]
+
+def _set_armed(book: _Book, a: Alert, armed: bool):
+    book.remove(a)
+    a.armed = armed
+    book.add(a)
+    _mark(a.id, a._row())
+
+def observe(kind: str, symbol: str, unit: str, price: float):
+    """Harga baru untuk (kind, symbol, unit): picu alert yang terlewati, re-arm yang sudah balik."""
+    book = _books.get((kind, symbol, unit))
+    if book is None:
+        return
+    _stats["observed"] += 1
+    fired = book.above[:bisect_right(book.above, (price, _INF))]
+    fired += book.below[bisect_left(book.below, (price, 0)):]
+    for _, alert_id in fired:
+        a = _alerts[alert_id]
+        _set_armed(book, a, False)
+        _stats["fired"] += 1
+        _enqueue(a, price)
+    rearm = book.rearm_above[bisect_left(book.rearm_above, (price, 0)):]
+    rearm += book.rearm_below[:bisect_right(book.rearm_below, (price, _INF))]
+    for _, alert_id in rearm:
+        _set_armed(book, _alerts[alert_id], True)
+        _stats["rearmed"] += 1
+
+def watched() -> List[Tuple[str, str, str]]:
+    """(kind, symbol, unit) yang punya alert; untuk prefetch."""
+    return list(_books)
+
+# ===== API =====
+def add_alert(chat_id: int, kind: str, symbol: str, unit: str, op: str, threshold: float) -> Dict[str, Any]:
+    global _next_id
+    if op not in (">", "<"):
+        return {"ok": False, "error": "Operator harus > atau <"}
+    if not threshold > 0:
+        return {"ok": False, "error": "Harga harus lebih dari 0"}
+    if len(_by_chat.get(chat_id, ())) >= MAX_PER_CHAT:
+        return {"ok": False, "error": f"Maksimal {MAX_PER_CHAT} alert per chat"}
+    a = Alert(_next_id, chat_id, kind, symbol.upper(), unit, op, float(threshold))
+    _next_id += 1
+    _insert(a)
+    _mark(a.id, a._row())
+    return {"ok": True, "alert": a}
+
+def list_alerts(chat_id: int) -> List[Alert]:
+    return sorted(_by_chat.get(chat_id, {}).values(), key=lambda a: a.id)
+
+def delete_alert(chat_id: int, alert_id: int) -> bool:
+    a = _by_chat.get(chat_id, {}).get(alert_id)
+    if a is None:
+        return False
+    _discard(a)
+    _mark(a.id, None)
+    return True
+
+def delete_all(chat_id: int) -> int:
+    alerts = list(_by_chat.get(chat_id, {}).values())
+    for a in alerts:
+        _discard(a)
+        _mark(a.id, None)
+    return len(alerts)
+
+# ===== Notifikasi =====
+def set_notifier(fn: Optional[Callable[[Alert, float], Awaitable[Any]]]):
+    global _notifier
+    _notifier = fn
+
+def _enqueue(a: Alert, price: float):
+    if _queue is None:
+        _stats["dropped"] += 1
+        return
+    try:
+        _queue.put_nowait((a, price))
+    except asyncio.QueueFull:
+        _stats["dropped"] += 1
+
+async def _send_loop():
+    while True:
+        a, price = await _queue.get()
+        if _notifier is None or a.id not in _alerts:
+            continue
+        try:
+            await _notifier(a, price)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _stats["notify_errors"] += 1
+            log.warning("notify error: %s", e)
+
+# ===== SQLite (lewat executor "disk") =====
+def _open_sync(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS alerts ("
+        " id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL, kind TEXT NOT NULL, symbol TEXT NOT NULL,"
+        " unit TEXT NOT NULL, op TEXT NOT NULL, threshold REAL NOT NULL, armed INTEGER NOT NULL,"
+        " created REAL NOT NULL)"
+    )
+    conn.commit()
+    return conn
+
+def _load_sync() -> List[tuple]:
+    return _conn.execute(
+        "SELECT id, chat_id, kind, symbol, unit, op, threshold, armed, created FROM alerts"
+    ).fetchall()
+
+def _write_sync(upserts: List[tuple], deletes: List[Tuple[int]]):
+    if upserts:
+        _conn.executemany("INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", upserts)
+    if deletes:
+        _conn.executemany("DELETE FROM alerts WHERE id = ?", deletes)
+    _conn.commit()
+
+async def flush():
+    if _conn is None or not _dirty:
+        return
+    changes = dict(_dirty)
+    _dirty.clear()
+    upserts = [row for row in changes.values() if row is not None]
+    deletes = [(alert_id,) for alert_id, row in changes.items() if row is None]
+    try:
+        await run_blocking("disk", _write_sync, upserts, deletes)
+    except Exception as e:
+        _stats["errors"] += 1
+        log.warning("write error: %s", e)
+        for alert_id, row in changes.items():
+            _dirty.setdefault(alert_id, row)
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(FLUSH_EVERY)
+        await flush()
+
+async def start_alerts():
+    """Muat alert dari disk, mulai flusher dan pengirim notifikasi."""
+    global _conn, _task, _queue, _sender, _next_id
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        _sender = asyncio.create_task(_send_loop())
+    if not PATH or _conn is not None:
+        return
+    try:
+        _conn = await run_blocking("disk", _open_sync, PATH)
+        rows = await run_blocking("disk", _load_sync)
+    except Exception as e:
+        _stats["errors"] += 1
+        log.warning("open/load error: %s", e)
+        _conn = None
+        return
+    for alert_id, chat_id, kind, symbol, unit, op, threshold, armed, created in rows:
+        _insert(Alert(alert_id, chat_id, kind, symbol, unit, op, threshold, bool(armed), created))
+        _next_id = max(_next_id, alert_id + 1)
+    _task = asyncio.create_task(_flush_loop())
+
+async def stop_alerts():
+    global _conn, _task, _queue, _sender
+    for task in (_task, _sender):
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _task = _sender = _queue = None
+    if _conn is not None:
+        await flush()
+        await run_blocking("disk", _conn.close)
+        _conn = None
+
+def alert_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "alerts": len(_alerts),
+        "symbols": len(_books),
+        "chats": len(_by_chat),
+        "pending_writes": len(_dirty),
+        "queued": _queue.qsize() if _queue is not None else 0,
+        "persistent": _conn is not None,
+    }
@@ -1,19 +1,287 @@
+import os
+import sys
 import time
+import asyncio
+import logging
+from collections import OrderedDict
 from functools import wraps
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
 
-def cached(ttl: int = 60):
-    store = {}
+# Batas default per fungsi ber-@cached (bisa di-override per dekorator).
+DEFAULT_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+DEFAULT_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+DEFAULT_NEGATIVE_TTL = float(os.getenv("CACHE_NEGATIVE_TTL", "10"))
+# Half-life (detik) skor permintaan per key, dipakai prefetcher untuk top-N.
+DEMAND_HALF_LIFE = float(os.getenv("CACHE_DEMAND_HALF_LIFE", "300"))
+
+log = logging.getLogger(__name__)
+
+# "module.func" -> wrapper ber-@cached, untuk cache_stats()
+_registry: Dict[str, Any] = {}
+# Dipanggil (name, key, value) tiap entri positif baru untuk fungsi
+# ber-persist=True; dipasang oleh utils.persist kalau tier disk aktif.
+_persist_hook = None
+
+# Dipanggil (name, key, value) tiap entri positif baru untuk semua fungsi
+# ber-@cached (hasil fetch maupun prime), mis. oleh utils.history.
+_store_listeners: List[Callable[[str, Any, Any], None]] = []
+
+def set_persist_hook(fn):
+    global _persist_hook
+    _persist_hook = fn
+
+def add_store_listener(fn: Callable[[str, Any, Any], None]):
+    if fn not in _store_listeners:
+        _store_listeners.append(fn)
+
+def registry() -> Dict[str, Any]:
+    return _registry
+
+def _approx_size(obj: Any, _depth: int = 0) -> int:
+    """Perkiraan kasar ukuran objek (byte), cukup untuk dict/list hasil adapter."""
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _approx_size(k, _depth + 1) + _approx_size(v, _depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += _approx_size(v, _depth + 1)
+    return size
+
+def is_negative(val: Any) -> bool:
+    """Hasil gagal ala adapter: {"ok": False, ...}."""
+    return isinstance(val, dict) and val.get("ok") is False
+
+def is_transient(val: Any) -> bool:
+    """Gagal sementara ({"ok": False, "busy": True}, mis. kuota penuh): tidak di-cache sama sekali."""
+    return isinstance(val, dict) and val.get("ok") is False and bool(val.get("busy"))
+
+class TTLCache:
+    """
+    LRU + TTL dengan batas jumlah entri dan perkiraan byte.
+    Hasil negatif ({"ok": False}) memakai TTL pendek tersendiri.
+    Semua timestamp memakai time.monotonic().
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.negative_ttl = min(negative_ttl, ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (val, ts, size, negative)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int, bool]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        # key -> (skor ber-decay, ts terakhir); dibatasi max_entries
+        self._demand: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _ttl_for(self, negative: bool) -> float:
+        return self.negative_ttl if negative else self.ttl
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Tuple[bool, Any]:
+        now = time.monotonic() if now is None else now
+        entry = self._data.get(key)
+        if entry is not None:
+            val, ts, _, negative = entry
+            if now - ts < self._ttl_for(negative):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, val
+            self._remove(key)
+            self.expirations += 1
+        self.misses += 1
+        return False, None
+
+    def peek(self, key: Hashable, now: Optional[float] = None) -> Tuple[bool, Any]:
+        """Seperti get() tapi tanpa menyentuh statistik maupun urutan LRU."""
+        now = time.monotonic() if now is None else now
+        entry = self._data.get(key)
+        if entry is not None:
+            val, ts, _, negative = entry
+            if now - ts < self._ttl_for(negative):
+                return True, val
+        return False, None
+
+    def age(self, key: Hashable, now: Optional[float] = None) -> Optional[float]:
+        """Umur entri (detik) atau None kalau tidak ada."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic() if now is None else now
+        return now - entry[1]
+
+    def note_request(self, key: Hashable, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        score, last = self._demand.pop(key, (0.0, now))
+        score = score * 0.5 ** ((now - last) / DEMAND_HALF_LIFE) + 1.0
+        self._demand[key] = (score, now)
+        if len(self._demand) > self.max_entries:
+            self._demand.popitem(last=False)
+
+    def request_rate(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Perkiraan permintaan per detik untuk key ini (skor ber-decay)."""
+        entry = self._demand.get(key)
+        if entry is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        score, last = entry
+        score *= 0.5 ** ((now - last) / DEMAND_HALF_LIFE)
+        # Skor ber-decay eksponensial ~ rate * half_life / ln 2
+        return score * 0.6931 / DEMAND_HALF_LIFE
+
+    def top_keys(self, n: int) -> List[Hashable]:
+        now = time.monotonic()
+        ranked = sorted(self._demand, key=lambda k: self.request_rate(k, now), reverse=True)
+        return ranked[:n]
+
+    def put(self, key: Hashable, val: Any, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if key in self._data:
+            self._remove(key)
+        size = _approx_size(key) + _approx_size(val)
+        if size > self.max_bytes:
+            return  # terlalu besar, jangan cache sama sekali
+        self._data[key] = (val, now, size, is_negative(val))
+        self.bytes += size
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+        }
+
+def _consume_exception(task: asyncio.Task):
+    # Hindari warning "exception was never retrieved" kalau semua
+    # penunggu sudah di-cancel sebelum task selesai.
+    if not task.cancelled():
+        task.exception()
+
+def _make_key(args, kwargs):
+    return (args, tuple(sorted(kwargs.items())))
+
+def cached(ttl: int = 60, negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+           max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+           persist: bool = False):
+    """
+    persist=True: entri positif juga ditulis ke tier disk (utils.persist)
+    kalau aktif, dan dimuat lagi saat startup dengan timestamp aslinya.
+    """
+    store = TTLCache(ttl, negative_ttl=negative_ttl, max_entries=max_entries, max_bytes=max_bytes)
+    inflight = {}
+    coalesced = {}
     def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        def _put(key, val):
+            if is_transient(val):
+                return
+            store.put(key, val)
+            if is_negative(val):
+                return
+            if persist and _persist_hook is not None:
+                _persist_hook(name, key, val)
+            for listener in _store_listeners:
+                try:
+                    listener(name, key, val)
+                except Exception as e:
+                    log.warning("store listener error: %s", e)
+
+        async def _fill(key):
+            args, kwargs = key
+            try:
+                val = await func(*args, **dict(kwargs))
+                _put(key, val)
+                return val
+            finally:
+                inflight.pop(key, None)
+
+        def _start(key):
+            task = asyncio.ensure_future(_fill(key))
+            task.add_done_callback(_consume_exception)
+            inflight[key] = task
+            return task
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            key = (args, tuple(sorted(kwargs.items())))
-            now = time.time()
-            if key in store:
-                val, ts = store[key]
-                if now - ts < ttl:
-                    return val
-            val = await func(*args, **kwargs)
-            store[key] = (val, now)
-            return val
+            key = _make_key(args, kwargs)
+            store.note_request(key)
+            found, val = store.get(key)
+            if found:
+                return val
+            # Single-flight: miss bersamaan untuk key yang sama menunggu satu
+            # task yang sama dan berbagi hasil maupun exception-nya. Task
+            # tidak ikut batal kalau pemanggil pertama di-cancel.
+            task = inflight.get(key)
+            if task is None:
+                task = _start(key)
+            else:
+                store.coalesced += 1
+                coalesced[key] = coalesced.get(key, 0) + 1
+                # Counter per key dibatasi sama seperti store-nya.
+                if len(coalesced) > store.max_entries:
+                    coalesced.pop(next(iter(coalesced)))
+            return await asyncio.shield(task)
+
+        wrapper.name = name
+        wrapper.persist = persist
+
+        def key_for(*args, **kwargs):
+            return _make_key(args, kwargs)
+
+        def peek(*args, **kwargs):
+            """(found, value) dari cache tanpa memanggil fungsi aslinya."""
+            return store.peek(_make_key(args, kwargs))
+
+        def prime(value, *args, **kwargs):
+            """Isi entri cache untuk argumen ini, mis. dari hasil batch."""
+            _put(_make_key(args, kwargs), value)
+
+        async def refresh_key(key):
+            """Paksa fetch ulang key ini (tetap single-flight), lalu isi cache."""
+            task = inflight.get(key) or _start(key)
+            return await asyncio.shield(task)
+
+        wrapper.cache = store
+        wrapper.key_for = key_for
+        wrapper.refresh_key = refresh_key
+        wrapper.peek = peek
+        wrapper.prime = prime
+        wrapper.inflight = inflight
+        wrapper.coalesced = coalesced
+        _registry[wrapper.name] = wrapper
         return wrapper
     return decorator
+
+def cache_stats():
+    out = {}
+    for name, w in _registry.items():
+        st = w.cache.stats()
+        st["inflight"] = len(w.inflight)
+        st["coalesced_by_key"] = {repr(k): n for k, n in w.coalesced.items()}
+        out[name] = st
+    return out
@@ -0,0 +1,162 @@
+import os
+import time
+import asyncio
+import functools
+import contextvars
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils import quota
+
+# Shared thread pool for every blocking provider call (yfinance, gspread).
+# Each provider also gets its own concurrency cap so one slow upstream
+# cannot take all workers from the others; async HTTP calls share the same
+# caps through provider_slot(). Before taking a slot every call also waits
+# for its provider's rate quota (utils.quota), so the caps bound concurrency
+# and the buckets bound requests per second.
+#
+# Config (env):
+#   BLOCKING_POOL_SIZE            total worker threads (default 16)
+#   PROVIDER_CONCURRENCY          "yfinance=4,coingecko=2,sheets=1" overrides
+#   PROVIDER_CONCURRENCY_DEFAULT  cap for providers not listed (default 4)
+
+_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+_DEFAULT_LIMIT = int(os.getenv("PROVIDER_CONCURRENCY_DEFAULT", "4"))
+
+_LIMITS: Dict[str, int] = {
+    "yfinance": 6,
+    "yahoo_chart": 6,
+    "coingecko": 2,
+    "binance": 4,
+    "exchangerate_host": 2,
+    "open_er_api": 2,
+    "sheets": 2,
+    "disk": 1,
+}
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    out = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        name, val = part.split("=", 1)
+        try:
+            out[name.strip()] = max(1, int(val))
+        except ValueError:
+            continue
+    return out
+
+_LIMITS.update(_parse_limits(os.getenv("PROVIDER_CONCURRENCY", "")))
+
+# Total waktu antri kuota + slot provider di context saat ini; dipakai
+# utils.health supaya latency upstream tidak ikut menghitung antrian kita.
+_queue_wait: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar(
+    "provider_queue_wait", default=None)
+
+def track_queue_wait() -> Tuple[List[float], contextvars.Token]:
+    """Mulai menghitung waktu antri slot; return ([detik], token untuk reset_queue_wait)."""
+    acc = [0.0]
+    return acc, _queue_wait.set(acc)
+
+def reset_queue_wait(token: contextvars.Token):
+    _queue_wait.reset(token)
+
+async def _acquire_slot(provider: str):
+    t0 = time.monotonic()
+    await quota.acquire(provider)
+    sem, st = _provider(provider)
+    st["waiting"] += 1
+    try:
+        await sem.acquire()
+    finally:
+        st["waiting"] -= 1
+        acc = _queue_wait.get()
+        if acc is not None:
+            acc[0] += time.monotonic() - t0
+    return sem, st
+
+_pool: Optional[ThreadPoolExecutor] = None
+_sems: Dict[str, asyncio.Semaphore] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=_POOL_SIZE, thread_name_prefix="blocking")
+    return _pool
+
+def _provider(name: str):
+    if name not in _sems:
+        _sems[name] = asyncio.Semaphore(_LIMITS.get(name, _DEFAULT_LIMIT))
+        _stats[name] = {"waiting": 0, "running": 0, "calls": 0, "errors": 0}
+    return _sems[name], _stats[name]
+
+async def run_blocking(provider: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Jalankan fungsi sync di thread pool bersama, dibatasi per provider.
+    Slot provider baru dilepas saat thread benar-benar selesai, jadi cap
+    tetap berlaku walau pemanggil di-cancel (mis. kalah race).
+    """
+    sem, st = await _acquire_slot(provider)
+
+    loop = asyncio.get_running_loop()
+    st["running"] += 1
+
+    def _release():
+        st["running"] -= 1
+        st["calls"] += 1
+        sem.release()
+
+    def _on_done(cf):
+        if not cf.cancelled() and cf.exception() is not None:
+            st["errors"] += 1
+        try:
+            loop.call_soon_threadsafe(_release)
+        except RuntimeError:
+            pass  # loop sudah ditutup (shutdown)
+
+    try:
+        cf = _get_pool().submit(functools.partial(func, *args, **kwargs))
+    except BaseException:
+        _release()
+        raise
+    cf.add_done_callback(_on_done)
+    return await asyncio.wrap_future(cf)
+
+@asynccontextmanager
+async def provider_slot(provider: str):
+    """
+    Slot konkurensi provider untuk panggilan yang sudah async (HTTP via
+    utils.http), supaya cap dan statistik antrian sama dengan run_blocking.
+    """
+    sem, st = await _acquire_slot(provider)
+    st["running"] += 1
+    try:
+        yield
+    except Exception:
+        st["errors"] += 1
+        raise
+    finally:
+        st["running"] -= 1
+        st["calls"] += 1
+        sem.release()
+
+def executor_stats() -> Dict[str, Any]:
+    pool_queue = 0
+    if _pool is not None:
+        pool_queue = _pool._work_queue.qsize()
+    return {
+        "pool_size": _POOL_SIZE,
+        "pool_queue": pool_queue,
+        "providers": {
+            name: {**st, "limit": _LIMITS.get(name, _DEFAULT_LIMIT)}
+            for name, st in _stats.items()
+        },
+    }
+
+def shutdown_executor():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
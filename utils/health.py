@@ -0,0 +1,185 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from utils import metrics
+from utils.executor import reset_queue_wait, track_queue_wait
+from utils.quota import QuotaExceeded
+
+# Registry kesehatan provider upstream: latency & error rate bergulir per
+# provider, plus circuit breaker (closed -> open -> half-open). Provider yang
+# open dilewati sampai waktunya probe; satu probe half-open yang sukses
+# menutup breaker lagi, yang gagal membukanya lebih lama (backoff).
+#
+# Config (env):
+#   HEALTH_WINDOW         jumlah sampel terakhir per provider (default 50)
+#   HEALTH_MIN_SAMPLES    minimal sampel sebelum statistik dipakai untuk urutan (default 5)
+#   HEALTH_OPEN_AFTER     gagal berturut-turut sebelum breaker open (default 3)
+#   HEALTH_ERROR_RATE     error rate (di atas MIN_SAMPLES) yang membuka breaker (default 0.5)
+#   HEALTH_OPEN_SECONDS   lama open pertama (default 30; dobel tiap probe gagal, maks 300)
+
+WINDOW = int(os.getenv("HEALTH_WINDOW", "50"))
+MIN_SAMPLES = int(os.getenv("HEALTH_MIN_SAMPLES", "5"))
+OPEN_AFTER = int(os.getenv("HEALTH_OPEN_AFTER", "3"))
+ERROR_RATE = float(os.getenv("HEALTH_ERROR_RATE", "0.5"))
+OPEN_SECONDS = float(os.getenv("HEALTH_OPEN_SECONDS", "30"))
+MAX_OPEN_SECONDS = 300.0
+
+# Perkiraan latency untuk provider yang belum punya cukup sampel.
+_UNKNOWN_LATENCY = 1.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpen(Exception):
+    pass
+
+class ProviderHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: deque = deque(maxlen=WINDOW)  # (latency, ok)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_for = OPEN_SECONDS
+        self.probing = False
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    # ----- statistik -----
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        lat = sorted(l for l, ok in self.samples if ok)
+        if not lat:
+            return None
+        return lat[min(len(lat) - 1, int(q * len(lat)))]
+
+    def expected_cost(self) -> float:
+        """Perkiraan detik sampai dapat jawaban; dipakai untuk mengurutkan."""
+        if len(self.samples) < MIN_SAMPLES:
+            return _UNKNOWN_LATENCY
+        p50 = self.percentile(0.5)
+        if p50 is None:
+            p50 = max(l for l, _ in self.samples)
+        return p50 * (1.0 + 4.0 * self.error_rate())
+
+    # ----- breaker -----
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_for:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def record(self, latency: float, ok: bool):
+        self.calls += 1
+        self.samples.append((latency, ok))
+        if ok:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.open_for = OPEN_SECONDS
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self.open_for = min(self.open_for * 2, MAX_OPEN_SECONDS)
+                self._open()
+            elif self.state == CLOSED and (
+                self.consecutive_failures >= OPEN_AFTER
+                or (len(self.samples) >= MIN_SAMPLES and self.error_rate() >= ERROR_RATE)
+            ):
+                self._open()
+        self.probing = False
+
+    def release(self):
+        """Panggilan di-cancel (mis. kalah race): tidak dihitung sukses/gagal."""
+        self.probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "error_rate": round(self.error_rate(), 3),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "open_for": self.open_for if self.state != CLOSED else 0,
+        }
+
+_providers: Dict[str, ProviderHealth] = {}
+
+def provider(name: str) -> ProviderHealth:
+    h = _providers.get(name)
+    if h is None:
+        h = _providers[name] = ProviderHealth(name)
+    return h
+
+def rank(names: Sequence[str], provider_of: Callable[[str], str] = lambda n: n) -> List[str]:
+    """
+    Urutkan nama menurut kesehatan: breaker open paling belakang, lalu
+    perkiraan latency (p50 x penalti error). Urutan config dipakai sebagai
+    tie-breaker, jadi provider tanpa data tetap di posisi aslinya.
+    """
+    def key(item):
+        idx, name = item
+        h = provider(provider_of(name))
+        is_open = h.state == OPEN and time.monotonic() - h.opened_at < h.open_for
+        return (is_open, h.expected_cost(), idx)
+    return [name for _, name in sorted(enumerate(names), key=key)]
+
+async def track(name: str, factory: Callable[[], Awaitable[Any]],
+                is_ok: Callable[[Any], bool] = lambda v: True) -> Any:
+    """
+    Jalankan panggilan provider lewat breaker-nya. Raise CircuitOpen kalau
+    breaker menolak; exception dan hasil yang is_ok(...) == False dicatat gagal.
+    """
+    h = provider(name)
+    if not h.allow():
+        metrics.observe_provider(name, None, "rejected")
+        raise CircuitOpen(name)
+    # Latency dihitung sejak slot provider didapat: antrian kuota & semaphore
+    # kita sendiri (utils.executor) dikurangkan supaya tidak dianggap lambatnya upstream.
+    waited, token = track_queue_wait()
+    t0 = time.monotonic()
+    try:
+        val = await factory()
+    except asyncio.CancelledError:
+        h.release()
+        metrics.observe_provider(name, None, "cancelled")
+        raise
+    except QuotaExceeded:
+        # Ditahan kuota kita sendiri, bukan kegagalan upstream.
+        h.release()
+        metrics.observe_provider(name, None, "throttled")
+        raise
+    except Exception as e:
+        elapsed = max(0.0, time.monotonic() - t0 - waited[0])
+        h.record(elapsed, False)
+        metrics.observe_provider(name, elapsed, "timeout" if isinstance(e, asyncio.TimeoutError) else "error")
+        raise
+    finally:
+        reset_queue_wait(token)
+    elapsed = max(0.0, time.monotonic() - t0 - waited[0])
+    ok = is_ok(val)
+    h.record(elapsed, ok)
+    metrics.observe_provider(name, elapsed, "ok" if ok else "empty")
+    return val
+
+def health_stats() -> Dict[str, Any]:
+    return {name: h.stats() for name, h in sorted(_providers.items())}
@@ -0,0 +1,101 @@
+import os
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils import health, quota
+
+# Hedged racing antar provider: provider pertama langsung jalan, provider
+# berikutnya menyusul setelah hedge delay (atau segera kalau yang sedang
+# jalan gagal). Jawaban valid pertama menang, sisanya di-cancel.
+#
+# Config per kelas aset (env), mis. untuk "crypto":
+#   HEDGE_ORDER_CRYPTO  urutan provider, mis. "coingecko,binance,yfinance"
+#   HEDGE_DELAY_CRYPTO  detik sebelum provider berikutnya ikut (0 = semua
+#                       langsung paralel; nilai besar = fallback serial)
+#
+# Urutan config hanya titik awal: race() mengurutkan ulang attempts menurut
+# utils.health (breaker open paling belakang, lalu latency x error rate) dan
+# mencatat hasil tiap provider ke registry kesehatan. Provider yang breakernya
+# open langsung dianggap gagal tanpa request. Saat meluncurkan attempt, provider
+# yang kuotanya (utils.quota) tidak tersedia dalam hedge delay dilompati dulu
+# selama masih ada alternatif.
+
+Attempt = Tuple[str, Callable[[], Awaitable[Any]]]
+
+# Nama attempt yang berbagi upstream dengan provider lain (tier saham).
+PROVIDER_OF = {"yf_fast": "yfinance", "yf_history": "yfinance"}
+
+def provider_of(name: str) -> str:
+    return PROVIDER_OF.get(name, name)
+
+def hedge_config(asset_class: str, default_order: List[str], default_delay: float) -> Tuple[List[str], float]:
+    key = asset_class.upper()
+    order_env = os.getenv(f"HEDGE_ORDER_{key}", "")
+    order = [p.strip() for p in order_env.split(",") if p.strip()] or list(default_order)
+    try:
+        delay = float(os.getenv(f"HEDGE_DELAY_{key}", default_delay))
+    except ValueError:
+        delay = default_delay
+    return order, max(0.0, delay)
+
+def ordered_attempts(order: List[str], factories: Dict[str, Callable[[], Awaitable[Any]]]) -> List[Attempt]:
+    """Susun attempts sesuai urutan config; nama yang tidak dikenal diabaikan."""
+    return [(name, factories[name]) for name in order if name in factories]
+
+def _valid(val: Any) -> bool:
+    return val is not None
+
+async def race(attempts: List[Attempt], delay: float,
+               is_valid: Callable[[Any], bool] = _valid) -> Tuple[Optional[str], Any]:
+    """
+    Return (nama_provider, hasil) dari jawaban valid pertama,
+    atau (None, None) kalau semua provider gagal. Kalau tidak ada jawaban
+    valid dan minimal satu provider ditolak kuota kita sendiri, raise
+    quota.QuotaExceeded supaya pemanggil bisa membedakan "sibuk" dari
+    "tidak ada data".
+    """
+    factories = dict(attempts)
+    queue = [(name, factories[name]) for name in health.rank([n for n, _ in attempts], provider_of)]
+    pending: Dict[asyncio.Task, str] = {}
+    throttled = []
+
+    def _launch():
+        # Utamakan provider yang kuotanya tersedia sebelum hedge berikutnya.
+        i = next((i for i, (n, _) in enumerate(queue)
+                  if quota.admit_within(provider_of(n), delay * 1000)), 0)
+        name, factory = queue.pop(i)
+        pending[asyncio.ensure_future(health.track(provider_of(name), factory))] = name
+
+    try:
+        if queue:
+            _launch()
+        while pending:
+            done, _ = await asyncio.wait(
+                pending.keys(),
+                timeout=delay if queue else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                # Hedge: provider yang jalan masih lambat, ikutkan berikutnya.
+                _launch()
+                continue
+            for task in done:
+                name = pending.pop(task)
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    if isinstance(task.exception(), quota.QuotaExceeded):
+                        throttled.append(name)
+                    continue
+                val = task.result()
+                if is_valid(val):
+                    return name, val
+            # Ada yang gagal: langsung coba provider berikutnya.
+            if queue:
+                _launch()
+        if throttled:
+            raise quota.QuotaExceeded(",".join(throttled))
+        return None, None
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,186 @@
+import os
+import re
+import time
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.cache import add_store_listener
+
+# Riwayat harga ringkas di memori: per simbol satu ring buffer ukuran tetap
+# berisi dua array('d') (timestamp & harga), tanpa objek Python per titik.
+# Diisi dari setiap harga segar yang diamati adapter (hasil fetch/prime
+# fungsi @cached yang di-track, plus harga stream Binance), jadi /change
+# bisa menghitung perubahan tanpa request history ke upstream.
+#
+# Config (env):
+#   HISTORY_POINTS        titik per simbol (default 1440, ~23 KB per simbol)
+#   HISTORY_MIN_INTERVAL  detik; satu titik per slot sepanjang ini, observasi
+#                         di slot yang sama menimpa titik terakhir (default 60,
+#                         jadi 1440 titik ≈ 24 jam untuk simbol yang terus diamati)
+#   HISTORY_MAX_SYMBOLS   batas jumlah simbol; yang paling lama tidak
+#                         di-update dibuang (default 500)
+
+POINTS = int(os.getenv("HISTORY_POINTS", "1440"))
+MIN_INTERVAL = float(os.getenv("HISTORY_MIN_INTERVAL", "60"))
+# Rentang terpanjang yang bisa dicakup satu series (detik).
+MAX_SPAN = POINTS * MIN_INTERVAL if MIN_INTERVAL > 0 else float("inf")
+MAX_SYMBOLS = int(os.getenv("HISTORY_MAX_SYMBOLS", "500"))
+
+log = logging.getLogger(__name__)
+
+_SPARK = "▁▂▃▄▅▆▇█"
+
+class Series:
+    __slots__ = ("ts", "price", "head", "count")
+
+    def __init__(self, capacity: int = POINTS):
+        self.ts = array("d", bytes(8 * capacity))
+        self.price = array("d", bytes(8 * capacity))
+        self.head = 0    # slot untuk titik berikutnya
+        self.count = 0
+
+    def append(self, ts: float, price: float):
+        cap = len(self.ts)
+        if self.count and MIN_INTERVAL > 0:
+            # Satu titik per slot waktu MIN_INTERVAL: observasi di slot yang sama
+            # menimpa titik terakhir. Dibandingkan per slot (bukan dengan ts titik
+            # yang baru ditimpa) supaya simbol yang diamati lebih rapat dari
+            # MIN_INTERVAL tetap bertambah satu titik per slot.
+            last = (self.head - 1) % cap
+            if ts // MIN_INTERVAL == self.ts[last] // MIN_INTERVAL:
+                self.ts[last], self.price[last] = ts, price
+                return
+        self.ts[self.head], self.price[self.head] = ts, price
+        self.head = (self.head + 1) % cap
+        self.count = min(self.count + 1, cap)
+
+    def since(self, start_ts: float) -> Tuple[List[float], List[float]]:
+        """Titik dengan ts >= start_ts, urut kronologis."""
+        cap = len(self.ts)
+        first = (self.head - self.count) % cap
+        # Titik urut naik: cari awal jendela dengan binary search.
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts[(first + mid) % cap] < start_ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        idx = [(first + i) % cap for i in range(lo, self.count)]
+        return [self.ts[i] for i in idx], [self.price[i] for i in idx]
+
+    def nbytes(self) -> int:
+        return self.ts.itemsize * len(self.ts) + self.price.itemsize * len(self.price)
+
+_series: "OrderedDict[Tuple[str, str], Series]" = OrderedDict()
+# Dipanggil untuk setiap harga yang dicatat: fn(kind, symbol, price),
+# mis. mesin alert (utils.alerts lewat adapters.quotes.setup_alerts).
+_listeners: List[Callable[[str, str, float], None]] = []
+# nama wrapper @cached -> (kind, fungsi harga dari nilai cache)
+_tracked: Dict[str, Tuple[str, Callable[[Any], Optional[float]], Optional[Callable[[str], str]]]] = {}
+
+def record(kind: str, symbol: str, price: Optional[float], ts: Optional[float] = None):
+    if price is None:
+        return
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return
+    key = (kind, symbol.upper())
+    s = _series.get(key)
+    if s is None:
+        s = _series[key] = Series()
+        if len(_series) > MAX_SYMBOLS:
+            _series.popitem(last=False)
+    else:
+        _series.move_to_end(key)
+    s.append(time.time() if ts is None else ts, price)
+    for listener in _listeners:
+        try:
+            listener(kind, key[1], price)
+        except Exception as e:
+            log.warning("listener error: %s", e)
+
+def add_listener(fn: Callable[[str, str, float], None]):
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+def _on_store(name: str, key, val):
+    spec = _tracked.get(name)
+    if spec is None:
+        return
+    kind, price_of, symbol_of = spec
+    args = key[0]
+    symbol = str(args[0]) if args else kind
+    if symbol_of is not None:
+        symbol = symbol_of(symbol)
+    record(kind, symbol, price_of(val))
+
+def track(wrapper, kind: str, price_of: Callable[[Any], Optional[float]],
+          symbol_of: Optional[Callable[[str], str]] = None):
+    """
+    Catat harga setiap entri positif baru milik wrapper @cached ini.
+    Simbol = argumen pertama (atau `kind` kalau tanpa argumen), lewat
+    symbol_of kalau diberikan (mis. ticker mentah -> simbol Yahoo).
+    """
+    _tracked[wrapper.name] = (kind, price_of, symbol_of)
+    add_store_listener(_on_store)
+
+# ===== Analisis =====
+_WINDOW_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([mhdj]?)$", re.I)
+_UNIT = {"m": 60, "h": 3600, "j": 3600, "d": 86400, "": 3600}
+
+def parse_window(text: str) -> Optional[float]:
+    """"30m", "4h"/"4j", "1d", "6" (jam) -> detik; None kalau tidak valid."""
+    m = _WINDOW_RE.match((text or "").strip())
+    if not m:
+        return None
+    seconds = float(m.group(1)) * _UNIT[m.group(2).lower()]
+    return seconds if seconds > 0 else None
+
+def sparkline(values: List[float], width: int = 24) -> str:
+    if not values:
+        return ""
+    if len(values) > width:
+        # Ambil nilai terakhir tiap bucket supaya panjangnya tetap.
+        step = len(values) / width
+        values = [values[min(len(values) - 1, int((i + 1) * step) - 1)] for i in range(width)]
+    lo, hi = min(values), max(values)
+    if hi == lo:
+        return _SPARK[len(_SPARK) // 2] * len(values)
+    scale = (len(_SPARK) - 1) / (hi - lo)
+    return "".join(_SPARK[int((v - lo) * scale)] for v in values)
+
+def change(kind: str, symbol: str, window: float) -> Optional[Dict[str, Any]]:
+    """
+    Ringkasan harga dalam `window` detik terakhir: first/last/pct/min/max,
+    jumlah titik dan sparkline. None kalau belum ada data.
+    """
+    s = _series.get((kind, symbol.upper()))
+    if s is None:
+        return None
+    ts, prices = s.since(time.time() - window)
+    if not prices:
+        return None
+    first, last = prices[0], prices[-1]
+    return {
+        "first": first,
+        "last": last,
+        "pct": (last - first) / first * 100 if first else None,
+        "min": min(prices),
+        "max": max(prices),
+        "points": len(prices),
+        "span": ts[-1] - ts[0],
+        "spark": sparkline(prices),
+    }
+
+def history_stats() -> Dict[str, Any]:
+    return {
+        "symbols": len(_series),
+        "points": sum(s.count for s in _series.values()),
+        "bytes": sum(s.nbytes() for s in _series.values()),
+        "capacity_per_symbol": POINTS,
+        "max_symbols": MAX_SYMBOLS,
+    }
@@ -0,0 +1,112 @@
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from utils import quota
+from utils.executor import provider_slot
+
+# Satu ClientSession untuk seluruh umur aplikasi: pool koneksi per host,
+# keep-alive dan cache DNS, jadi handshake TCP+TLS ke Yahoo/CoinGecko/
+# Binance/exchangerate.host/situs emas cukup sekali per koneksi.
+# aiohttp belum mendukung HTTP/2; koneksi tetap HTTP/1.1 keep-alive.
+#
+# Config (env):
+#   HTTP_POOL_SIZE      total koneksi (default 100)
+#   HTTP_POOL_PER_HOST  koneksi per host (default 10)
+#   HTTP_KEEPALIVE      detik koneksi idle dipertahankan (default 60)
+#   HTTP_DNS_TTL        detik cache DNS (default 300)
+
+_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))
+_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
+_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+
+_session: Optional[aiohttp.ClientSession] = None
+
+# Jeda kuota kalau upstream membalas 429 tanpa Retry-After.
+_DEFAULT_RETRY_AFTER = 30.0
+
+def _throttled(provider: str, resp: aiohttp.ClientResponse):
+    """429: tahan bucket kuota provider sesuai Retry-After sebelum raise."""
+    try:
+        seconds = float(resp.headers.get("Retry-After", _DEFAULT_RETRY_AFTER))
+    except ValueError:
+        seconds = _DEFAULT_RETRY_AFTER
+    quota.backoff(provider, seconds)
+
+def get_session() -> aiohttp.ClientSession:
+    """Session bersama; dibuat lazily kalau start_http() belum dipanggil."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=_POOL_SIZE,
+            limit_per_host=_POOL_PER_HOST,
+            ttl_dns_cache=_DNS_TTL,
+            keepalive_timeout=_KEEPALIVE,
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+async def start_http():
+    get_session()
+
+async def close_http():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def get_json(provider: str, url: str, *, params: Optional[Dict[str, Any]] = None,
+                   headers: Optional[Dict[str, str]] = None, timeout: float = 8,
+                   missing: Tuple[int, ...] = (400, 404)) -> Optional[Any]:
+    """
+    GET JSON; None kalau status ada di `missing` (cara provider bilang simbol
+    tidak dikenal, mis. 404 Yahoo, 400 Binance). Status >= 400 lainnya (401,
+    403, 429, 5xx) di-raise supaya tercatat sebagai kegagalan provider
+    (utils.health), bukan "tidak ada data".
+    """
+    async with provider_slot(provider):
+        async with get_session().get(url, params=params, headers=headers,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if resp.status == 429:
+                _throttled(provider, resp)
+            if resp.status in missing:
+                return None
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+async def get_text(provider: str, url: str, *, params: Optional[Dict[str, Any]] = None,
+                   headers: Optional[Dict[str, str]] = None, timeout: float = 25) -> str:
+    """GET teks; raise untuk status non-2xx."""
+    async with provider_slot(provider):
+        async with get_session().get(url, params=params, headers=headers,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if resp.status == 429:
+                _throttled(provider, resp)
+            resp.raise_for_status()
+            return await resp.text()
+
+async def get_conditional(provider: str, url: str, *, etag: Optional[str] = None,
+                          last_modified: Optional[str] = None,
+                          headers: Optional[Dict[str, str]] = None,
+                          timeout: float = 25) -> Tuple[int, Optional[str], Optional[str], Optional[str]]:
+    """
+    GET dengan If-None-Match / If-Modified-Since.
+    Return (status, text|None kalau 304, etag, last_modified); raise untuk status >= 400.
+    """
+    req_headers = dict(headers or {})
+    if etag:
+        req_headers["If-None-Match"] = etag
+    if last_modified:
+        req_headers["If-Modified-Since"] = last_modified
+    async with provider_slot(provider):
+        async with get_session().get(url, headers=req_headers,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if resp.status == 304:
+                return 304, None, etag, last_modified
+            if resp.status == 429:
+                _throttled(provider, resp)
+            resp.raise_for_status()
+            text = await resp.text()
+            return resp.status, text, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
@@ -0,0 +1,220 @@
+import os
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Metrik format teks Prometheus untuk GET /metrics, tanpa dependency baru.
+# Di hot path cuma ada increment counter / bisect bucket histogram; angka
+# cache, executor, antrian webhook dan breaker dibaca dari stats yang sudah
+# ada saat di-scrape.
+#
+# Config (env):
+#   METRICS_LOOP_INTERVAL  detik antar sampel lag event loop (default 0.5; 0 = mati)
+
+LOOP_INTERVAL = float(os.getenv("METRICS_LOOP_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        _metrics.append(self)
+
+    def inc(self, *labels, n: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self, out: List[str]):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} counter")
+        for labels, v in self._values.items():
+            out.append(f"{self.name}{_labels(self.label_names, labels)} {_num(v)}")
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [hitungan per bucket (non-kumulatif) + overflow, sum, count]
+        self._series: Dict[Tuple, list] = {}
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        s[0][bisect_left(self.buckets, value)] += 1
+        s[1] += value
+        s[2] += 1
+
+    def render(self, out: List[str]):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        for labels, (counts, total, n) in self._series.items():
+            acc = 0
+            for b, c in zip(self.buckets, counts):
+                acc += c
+                le = 'le="%s"' % b
+                out.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {acc}")
+            inf = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.label_names, labels, inf)} {n}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.label_names, labels)} {n}")
+
+log = logging.getLogger(__name__)
+
+_metrics: List[Any] = []
+
+# ===== Metrik yang diisi langsung =====
+COMMAND_SECONDS = Histogram("bot_command_duration_seconds", "Durasi handler command Telegram.", ["command"])
+COMMAND_ERRORS = Counter("bot_command_errors_total", "Handler command yang raise exception.", ["command"])
+PROVIDER_SECONDS = Histogram("provider_request_duration_seconds",
+                             "Durasi panggilan upstream yang selesai (sukses maupun gagal).", ["provider"])
+PROVIDER_CALLS = Counter("provider_requests_total",
+                         "Panggilan upstream per hasil: ok, empty, error, timeout, rejected, cancelled.",
+                         ["provider", "outcome"])
+WEBHOOK_WAIT_SECONDS = Histogram("webhook_queue_wait_seconds", "Lama update menunggu di antrian webhook.")
+WEBHOOK_PROCESS_SECONDS = Histogram("webhook_process_duration_seconds", "Lama memproses satu update webhook.")
+LOOP_LAG_SECONDS = Histogram("event_loop_lag_seconds", "Keterlambatan event loop dari jadwal sleep.",
+                             buckets=LAG_BUCKETS)
+GOLD_SOURCE = Counter("gold_source_results_total",
+                      "Hasil scrape per sumber emas: ok, not_modified, no_value, error.", ["source", "result"])
+
+def observe_provider(provider: str, seconds: Optional[float], outcome: str):
+    PROVIDER_CALLS.inc(provider, outcome)
+    if seconds is not None:
+        PROVIDER_SECONDS.observe(seconds, provider)
+
+def timed_command(command: str, handler: Callable) -> Callable:
+    """Bungkus handler command supaya durasi & error-nya tercatat."""
+    @wraps(handler)
+    async def wrapper(update, context):
+        t0 = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            COMMAND_ERRORS.inc(command)
+            raise
+        finally:
+            COMMAND_SECONDS.observe(time.perf_counter() - t0, command)
+    return wrapper
+
+# ===== Lag event loop =====
+_loop_task: Optional[asyncio.Task] = None
+_loop_lag_last = 0.0
+
+async def _monitor_loop():
+    global _loop_lag_last
+    while True:
+        t0 = time.monotonic()
+        await asyncio.sleep(LOOP_INTERVAL)
+        _loop_lag_last = max(0.0, time.monotonic() - t0 - LOOP_INTERVAL)
+        LOOP_LAG_SECONDS.observe(_loop_lag_last)
+
+def start_loop_monitor():
+    global _loop_task
+    if LOOP_INTERVAL > 0 and (_loop_task is None or _loop_task.done()):
+        _loop_task = asyncio.create_task(_monitor_loop())
+
+async def stop_loop_monitor():
+    global _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        try:
+            await _loop_task
+        except asyncio.CancelledError:
+            pass
+        _loop_task = None
+
+# ===== Metrik yang dibaca dari stats saat scrape =====
+def _family(out: List[str], name: str, kind: str, help: str, samples: List[Tuple[Dict[str, Any], Any]]):
+    out.append(f"# HELP {name} {help}")
+    out.append(f"# TYPE {name} {kind}")
+    for labels, v in samples:
+        if v is None:
+            continue
+        out.append(f"{name}{_labels(list(labels), list(labels.values()))} {_num(v)}")
+
+def _collect_cache(out: List[str]):
+    from utils.cache import cache_stats
+    stats = cache_stats()
+    for field in ("hits", "misses", "evictions", "expirations", "coalesced"):
+        _family(out, f"cache_{field}_total", "counter", f"Cache {field} per fungsi @cached.",
+                [({"cache": name}, st[field]) for name, st in stats.items()])
+    _family(out, "cache_entries", "gauge", "Jumlah entri cache.",
+            [({"cache": name}, st["size"]) for name, st in stats.items()])
+    _family(out, "cache_bytes", "gauge", "Perkiraan byte cache.",
+            [({"cache": name}, st["bytes"]) for name, st in stats.items()])
+
+def _collect_executor(out: List[str]):
+    from utils.executor import executor_stats
+    stats = executor_stats()
+    _family(out, "executor_pool_queue", "gauge", "Pekerjaan antri di thread pool.", [({}, stats["pool_queue"])])
+    providers = stats["providers"].items()
+    _family(out, "executor_running", "gauge", "Panggilan blocking yang sedang jalan.",
+            [({"provider": p}, st.get("running")) for p, st in providers])
+    _family(out, "executor_waiting", "gauge", "Panggilan yang menunggu slot provider.",
+            [({"provider": p}, st.get("waiting")) for p, st in providers])
+
+def _collect_webhook(out: List[str]):
+    from utils.updates import update_queue_stats
+    st = update_queue_stats()
+    _family(out, "webhook_queue_depth", "gauge", "Update di antrian webhook.", [({}, st["depth"])])
+    _family(out, "webhook_oldest_wait_seconds", "gauge", "Umur update tertua di antrian.",
+            [({}, st["oldest_wait"] or 0.0)])
+    for field in ("received", "duplicates", "rejected_full", "processed", "errors"):
+        _family(out, f"webhook_{field}_total", "counter", f"Update webhook: {field}.", [({}, st[field])])
+
+_BREAKER_STATE = {"closed": 0, "half_open": 1, "open": 2}
+
+def _collect_health(out: List[str]):
+    from utils.health import health_stats
+    stats = health_stats().items()
+    _family(out, "provider_breaker_state", "gauge", "Circuit breaker: 0 closed, 1 half-open, 2 open.",
+            [({"provider": p}, _BREAKER_STATE.get(st["state"], 0)) for p, st in stats])
+    _family(out, "provider_error_rate", "gauge", "Error rate di jendela bergulir.",
+            [({"provider": p}, st["error_rate"]) for p, st in stats])
+
+def _collect_quota(out: List[str]):
+    from utils.quota import quota_stats
+    stats = quota_stats().items()
+    _family(out, "quota_tokens", "gauge", "Token tersisa di bucket kuota provider.",
+            [({"bucket": b}, st["tokens"]) for b, st in stats])
+    _family(out, "quota_waiting", "gauge", "Panggilan yang antri menunggu kuota.",
+            [({"bucket": b}, st["waiting"]) for b, st in stats])
+    for field in ("admitted", "queued", "throttled", "backoffs"):
+        _family(out, f"quota_{field}_total", "counter", f"Kuota provider: {field}.",
+                [({"bucket": b}, st[field]) for b, st in stats])
+
+def _collect_loop(out: List[str]):
+    _family(out, "event_loop_lag_last_seconds", "gauge", "Sampel lag event loop terakhir.",
+            [({}, _loop_lag_last)])
+
+_COLLECTORS = [_collect_cache, _collect_executor, _collect_webhook, _collect_health, _collect_quota, _collect_loop]
+
+def render_metrics() -> str:
+    out: List[str] = []
+    for m in _metrics:
+        m.render(out)
+    for collect in _COLLECTORS:
+        try:
+            collect(out)
+        except Exception as e:
+            log.warning("%s error: %s", collect.__name__, e)
+    return "\n".join(out) + "\n"
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.cache import registry, set_persist_hook
+from utils.executor import run_blocking
+
+# Tier cache persisten (SQLite) supaya restart/cold start di Render tidak
+# mulai dari cache kosong. Entri positif fungsi @cached(persist=True) ditulis
+# ke disk (dikumpulkan lalu di-flush tiap PERSIST_FLUSH detik) dan dimuat
+# lagi saat startup dengan timestamp aslinya, jadi TTL tetap dihitung dari
+# waktu fetch sebenarnya.
+#
+# Config (env):
+#   PERSIST_CACHE_PATH     path file SQLite (kosong = tier disk mati)
+#   PERSIST_FLUSH          detik antar flush tulisan (default 1)
+#   PERSIST_MAX_ROWS       batas jumlah baris (default 5000)
+#   PERSIST_MAX_BYTES      batas ukuran file (default 16 MB)
+#   PERSIST_MAX_AGE        baris lebih tua dari ini dibuang (default 86400)
+#   PERSIST_COMPACT_EVERY  detik antar kompaksi (default 600)
+
+PATH = os.getenv("PERSIST_CACHE_PATH", "")
+FLUSH_EVERY = float(os.getenv("PERSIST_FLUSH", "1"))
+MAX_ROWS = int(os.getenv("PERSIST_MAX_ROWS", "5000"))
+MAX_BYTES = int(os.getenv("PERSIST_MAX_BYTES", str(16 * 1024 * 1024)))
+MAX_AGE = float(os.getenv("PERSIST_MAX_AGE", "86400"))
+COMPACT_EVERY = float(os.getenv("PERSIST_COMPACT_EVERY", "600"))
+
+log = logging.getLogger(__name__)
+
+_conn: Optional[sqlite3.Connection] = None
+_pending: Dict[Tuple[str, str], Tuple[str, float]] = {}
+_task: Optional[asyncio.Task] = None
+_stats = {"loaded": 0, "written": 0, "compactions": 0, "deleted": 0, "errors": 0}
+
+# ===== Serialisasi key/value =====
+def _encode_key(key) -> str:
+    args, kwargs = key
+    return json.dumps([list(args), [list(kv) for kv in kwargs]], separators=(",", ":"))
+
+def _decode_key(raw: str):
+    args, kwargs = json.loads(raw)
+    return (tuple(args), tuple(tuple(kv) for kv in kwargs))
+
+# ===== SQLite (selalu dipanggil lewat executor "disk") =====
+def _open_sync(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache ("
+        " name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, ts REAL NOT NULL,"
+        " PRIMARY KEY (name, key))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS cache_ts ON cache (ts)")
+    conn.commit()
+    return conn
+
+def _load_sync(min_ts: float) -> List[Tuple[str, str, str, float]]:
+    return _conn.execute("SELECT name, key, value, ts FROM cache WHERE ts >= ?", (min_ts,)).fetchall()
+
+def _write_sync(rows: List[Tuple[str, str, str, float]]):
+    _conn.executemany(
+        "INSERT INTO cache (name, key, value, ts) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(name, key) DO UPDATE SET value = excluded.value, ts = excluded.ts",
+        rows,
+    )
+    _conn.commit()
+
+def _compact_sync() -> int:
+    deleted = _conn.execute("DELETE FROM cache WHERE ts < ?", (time.time() - MAX_AGE,)).rowcount
+    deleted += _conn.execute(
+        "DELETE FROM cache WHERE rowid NOT IN (SELECT rowid FROM cache ORDER BY ts DESC LIMIT ?)",
+        (MAX_ROWS,),
+    ).rowcount
+    page_size = _conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = _conn.execute("PRAGMA page_count").fetchone()[0]
+    if page_size * pages > MAX_BYTES:
+        # Masih kebesaran: buang seperempat baris tertua.
+        total = _conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        deleted += _conn.execute(
+            "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY ts ASC LIMIT ?)",
+            (max(1, total // 4),),
+        ).rowcount
+    _conn.commit()
+    if deleted:
+        _conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        _conn.execute("VACUUM")
+    return deleted
+
+def _close_sync():
+    _conn.close()
+
+# ===== Hook dari utils.cache =====
+def _record(name: str, key, value: Any):
+    try:
+        _pending[(name, _encode_key(key))] = (json.dumps(value, separators=(",", ":")), time.time())
+    except (TypeError, ValueError):
+        pass  # tidak bisa di-serialisasi, lewati
+
+async def flush():
+    if _conn is None or not _pending:
+        return
+    rows = [(name, key, val, ts) for (name, key), (val, ts) in _pending.items()]
+    _pending.clear()
+    try:
+        await run_blocking("disk", _write_sync, rows)
+        _stats["written"] += len(rows)
+    except Exception as e:
+        _stats["errors"] += 1
+        log.warning("write error: %s", e)
+
+async def compact():
+    if _conn is None:
+        return
+    try:
+        _stats["deleted"] += await run_blocking("disk", _compact_sync)
+        _stats["compactions"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        log.warning("compact error: %s", e)
+
+async def _load():
+    now_wall, now_mono = time.time(), time.monotonic()
+    rows = await run_blocking("disk", _load_sync, now_wall - MAX_AGE)
+    wrappers = registry()
+    for name, raw_key, raw_val, ts in rows:
+        wrapper = wrappers.get(name)
+        if wrapper is None or not wrapper.persist:
+            continue
+        try:
+            key = _decode_key(raw_key)
+            val = json.loads(raw_val)
+            # Petakan timestamp wall-clock asli ke jam monotonic proses ini.
+            wrapper.cache.put(key, val, now=now_mono - (now_wall - ts))
+            _stats["loaded"] += 1
+        except (TypeError, ValueError):
+            continue
+
+async def _run():
+    last_compact = time.monotonic()
+    while True:
+        await asyncio.sleep(FLUSH_EVERY)
+        await flush()
+        if time.monotonic() - last_compact >= COMPACT_EVERY:
+            last_compact = time.monotonic()
+            await compact()
+
+async def open_persistent_cache():
+    """Buka DB, muat entri yang masih berlaku ke cache, mulai flusher."""
+    global _conn, _task
+    if not PATH or _conn is not None:
+        return
+    try:
+        _conn = await run_blocking("disk", _open_sync, PATH)
+        await _load()
+    except Exception as e:
+        _stats["errors"] += 1
+        log.warning("open/load error: %s", e)
+        return
+    set_persist_hook(_record)
+    _task = asyncio.create_task(_run())
+
+async def close_persistent_cache():
+    global _conn, _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if _conn is not None:
+        set_persist_hook(None)
+        await flush()
+        await run_blocking("disk", _close_sync)
+        _conn = None
+
+def persist_stats() -> Dict[str, Any]:
+    return {**_stats, "enabled": bool(PATH), "open": _conn is not None, "pending": len(_pending)}
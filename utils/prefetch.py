@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from utils import quota
+
+# Scheduler latar belakang yang menyegarkan entri @cached sebelum TTL-nya
+# habis, supaya perintah interaktif hampir selalu kena cache hangat.
+#
+# Sumber target:
+#   - pin(wrapper, *args)       selalu dijaga hangat (USDIDR, emas)
+#   - add_source(fn)            target dinamis, mis. entri watchlist Sheet
+#   - track(wrapper, batch=fn)  top-N key paling sering diminta
+# Key yang jarang diminta dibiarkan kedaluwarsa; key yang makin sering
+# diminta di-refresh makin awal (lead time naik mengikuti rate).
+#
+# Config (env):
+#   PREFETCH_ENABLED           "0" untuk mematikan (default aktif)
+#   PREFETCH_TICK              detik antar putaran (default 5)
+#   PREFETCH_TOP_N             top-N key per fungsi yang dilacak (default 20)
+#   PREFETCH_BUDGET_PER_MIN    batas global panggilan upstream/menit (default 60)
+#   PREFETCH_MIN_DEMAND        minimal perkiraan permintaan per TTL agar key
+#                              non-pinned ikut di-refresh (default 1)
+
+_ENABLED = os.getenv("PREFETCH_ENABLED", "1") != "0"
+_TICK = float(os.getenv("PREFETCH_TICK", "5"))
+_TOP_N = int(os.getenv("PREFETCH_TOP_N", "20"))
+_BUDGET_PER_MIN = float(os.getenv("PREFETCH_BUDGET_PER_MIN", "60"))
+_MIN_DEMAND = float(os.getenv("PREFETCH_MIN_DEMAND", "1"))
+
+log = logging.getLogger(__name__)
+
+Target = Tuple[Any, Hashable]  # (wrapper @cached, cache key)
+
+_pinned: List[Target] = []
+_tracked: Dict[Any, Optional[Callable[[List[Any]], Awaitable[Any]]]] = {}
+_sources: List[Callable[[], Awaitable[List[Tuple[Any, tuple]]]]] = []
+_task: Optional[asyncio.Task] = None
+_stats = {"ticks": 0, "refreshed": 0, "batches": 0, "skipped_budget": 0, "errors": 0}
+
+class _Budget:
+    """Token bucket sederhana untuk batas panggilan upstream global."""
+
+    def __init__(self, per_min: float):
+        self.capacity = max(1.0, per_min)
+        self.rate = per_min / 60.0
+        self.tokens = self.capacity
+        self.ts = time.monotonic()
+
+    def take(self, n: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def take_up_to(self, n: int) -> int:
+        """Ambil maks. n token utuh; return jumlah yang didapat."""
+        granted = 0
+        while granted < n and self.take():
+            granted += 1
+        return granted
+
+_budget = _Budget(_BUDGET_PER_MIN)
+
+def pin(wrapper, *args, **kwargs):
+    _pinned.append((wrapper, wrapper.key_for(*args, **kwargs)))
+
+def track(wrapper, batch: Optional[Callable[[List[Any]], Awaitable[Any]]] = None):
+    """
+    Lacak top-N key wrapper ini. Kalau `batch` diberikan, key yang jatuh
+    tempo di-refresh sekaligus lewat batch(list argumen pertama).
+    """
+    _tracked[wrapper] = batch
+
+def add_source(fn: Callable[[], Awaitable[List[Tuple[Any, tuple]]]]):
+    """fn() -> [(wrapper, args)], dipanggil tiap putaran."""
+    _sources.append(fn)
+
+def _lead(ttl: float, demand: float) -> float:
+    # Refresh sedikit sebelum habis; key yang lebih panas lebih awal
+    # (maks. separuh TTL) supaya tidak pernah sempat kedaluwarsa.
+    base = max(_TICK * 1.5, ttl * 0.1)
+    return min(ttl * 0.5, base * (1.0 + min(demand, 20.0) / 10.0))
+
+def _due(wrapper, key: Hashable, pinned: bool, now: float) -> bool:
+    cache = wrapper.cache
+    if key in wrapper.inflight:
+        return False
+    demand = cache.request_rate(key, now) * cache.ttl
+    if not pinned and demand < _MIN_DEMAND:
+        return False
+    age = cache.age(key, now)
+    if age is None:
+        return pinned
+    return age >= cache.ttl - _lead(cache.ttl, demand)
+
+async def _collect() -> Dict[Target, bool]:
+    targets: Dict[Target, bool] = {t: True for t in _pinned}
+    for src in _sources:
+        try:
+            for wrapper, args in await src():
+                targets[(wrapper, wrapper.key_for(*args))] = True
+        except Exception as e:
+            _stats["errors"] += 1
+            log.warning("source error: %s", e)
+    for wrapper in _tracked:
+        for key in wrapper.cache.top_keys(_TOP_N):
+            targets.setdefault((wrapper, key), False)
+    return targets
+
+async def _refresh_one(wrapper, key):
+    try:
+        await wrapper.refresh_key(key)
+        _stats["refreshed"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        log.warning("refresh %s%s error: %s", wrapper.name, key[0], e)
+
+async def _refresh_batch(batch, wrapper, keys):
+    try:
+        await batch([k[0][0] for k in keys], refresh=True)
+        _stats["batches"] += 1
+        _stats["refreshed"] += len(keys)
+    except Exception as e:
+        _stats["errors"] += 1
+        log.warning("batch %s error: %s", wrapper.name, e)
+
+async def tick():
+    now = time.monotonic()
+    targets = await _collect()
+    due: Dict[Any, List[Hashable]] = {}
+    for (wrapper, key), pinned in targets.items():
+        if _due(wrapper, key, pinned, now):
+            due.setdefault(wrapper, []).append(key)
+
+    jobs = []
+    for wrapper, keys in due.items():
+        batch = _tracked.get(wrapper)
+        if batch is not None and len(keys) > 1 and all(len(k[0]) == 1 and not k[1] for k in keys):
+            # Adapter batch bisa jatuh ke satu panggilan per simbol (chart JSON
+            # saham, fallback crypto), jadi tiap key dihitung satu panggilan;
+            # kalau budget kurang, batch dipotong, bukan dibatalkan semua.
+            granted = _budget.take_up_to(len(keys))
+            if granted:
+                jobs.append(_refresh_batch(batch, wrapper, keys[:granted]))
+            _stats["skipped_budget"] += len(keys) - granted
+            continue
+        for key in keys:
+            if _budget.take():
+                jobs.append(_refresh_one(wrapper, key))
+            else:
+                _stats["skipped_budget"] += 1
+    if jobs:
+        await asyncio.gather(*jobs)
+    _stats["ticks"] += 1
+
+async def _run():
+    # Semua refresh (dan task turunannya) antri di belakang command interaktif.
+    quota.set_priority(quota.BACKGROUND)
+    while True:
+        try:
+            await tick()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _stats["errors"] += 1
+            log.warning("tick error: %s", e)
+        await asyncio.sleep(_TICK)
+
+def start_prefetch():
+    global _task
+    if _ENABLED and _task is None:
+        _task = asyncio.create_task(_run())
+
+async def stop_prefetch():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+def prefetch_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "enabled": _ENABLED,
+        "running": _task is not None,
+        "budget_tokens": round(_budget.tokens, 2),
+        "pinned": len(_pinned),
+        "tracked": [w.name for w in _tracked],
+    }
@@ -0,0 +1,226 @@
+import os
+import time
+import heapq
+import asyncio
+import contextvars
+from typing import Any, Dict, List, Optional, Tuple
+
+# Penjadwal kuota keluar: satu token bucket per upstream (diisi sesuai batas
+# yang diketahui), dengan antrian prioritas supaya command interaktif selalu
+# didahulukan dari refresh latar belakang (prefetch, sync Sheet). Semua
+# panggilan provider lewat sini (utils.executor: run_blocking/provider_slot),
+# jadi burst tidak lagi berujung 429. admit_within() menjawab "apakah
+# panggilan ini bisa jalan dalam X ms", dipakai race() untuk langsung
+# melompat ke provider lain daripada mengantri.
+#
+# Prioritas dibawa contextvar: set_priority(BACKGROUND) di task latar
+# belakang, task turunannya ikut mewarisi.
+#
+# Config (env):
+#   QUOTA_ENABLED                0 = tanpa pembatasan (default 1)
+#   QUOTA_LIMITS                 override "coingecko=30/60:10,binance=1200/60"
+#                                (panggilan/detik[:burst]) per bucket
+#   QUOTA_MAX_WAIT               detik maksimal antri untuk interaktif (default 5)
+#   QUOTA_MAX_WAIT_BACKGROUND    detik maksimal antri untuk latar belakang (default 30)
+#   QUOTA_BACKGROUND_RESERVE     bagian burst yang tidak boleh dipakai latar
+#                                belakang, disisakan untuk interaktif (default 0.2)
+
+ENABLED = os.getenv("QUOTA_ENABLED", "1") != "0"
+MAX_WAIT = float(os.getenv("QUOTA_MAX_WAIT", "5"))
+MAX_WAIT_BACKGROUND = float(os.getenv("QUOTA_MAX_WAIT_BACKGROUND", "30"))
+BACKGROUND_RESERVE = float(os.getenv("QUOTA_BACKGROUND_RESERVE", "0.2"))
+
+INTERACTIVE, BACKGROUND = 0, 1
+
+# bucket -> (panggilan, per detik, burst). Angka dari batas publik tiap
+# layanan, dibulatkan ke bawah supaya ada ruang.
+_LIMITS: Dict[str, Tuple[float, float, float]] = {
+    "yahoo": (2000, 3600, 30),         # batas tak resmi ~2000/jam per IP
+    "coingecko": (30, 60, 10),         # plan publik/demo: 30/menit
+    "binance": (1200, 60, 50),         # 6000 weight/menit, ticker/price ≤ 4 weight
+    "exchangerate_host": (60, 60, 5),
+    "open_er_api": (10, 60, 3),        # endpoint gratis, data update harian
+    "sheets": (60, 60, 10),            # 60 read/menit per user
+    # situs emas: tanpa batas resmi, cukup sopan (hasil di-cache 30 menit)
+    "antam": (10, 60, 3),
+    "pegadaian": (10, 60, 3),
+    "hargaemas": (10, 60, 3),
+}
+
+# Provider executor/health -> bucket (yfinance & chart JSON sama-sama Yahoo).
+BUCKET_OF = {
+    "yfinance": "yahoo",
+    "yahoo_chart": "yahoo",
+}
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, float, float]]:
+    out = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        name, val = part.split("=", 1)
+        try:
+            rate, _, burst = val.partition(":")
+            calls, _, per = rate.partition("/")
+            calls, per = float(calls), float(per or 1)
+            out[name.strip()] = (calls, per, float(burst) if burst else max(1.0, calls / per))
+        except ValueError:
+            continue
+    return out
+
+_LIMITS.update(_parse_limits(os.getenv("QUOTA_LIMITS", "")))
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("quota_priority", default=INTERACTIVE)
+
+def set_priority(priority: int) -> contextvars.Token:
+    return _priority.set(priority)
+
+def current_priority() -> int:
+    return _priority.get()
+
+class QuotaExceeded(Exception):
+    """Kuota provider tidak akan tersedia dalam batas waktu tunggu."""
+
+BUSY_ERROR = "Provider sedang sibuk (batas request tercapai), coba lagi sebentar lagi"
+
+def busy_result(**extra) -> Dict[str, Any]:
+    """Hasil gagal sementara karena kuota; tidak di-cache (lihat utils.cache.is_transient)."""
+    return {"ok": False, "busy": True, "error": BUSY_ERROR, **extra}
+
+class Bucket:
+    def __init__(self, name: str, calls: float, per: float, burst: float):
+        self.name = name
+        self.rate = calls / per
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []   # heap (priority, seq, future)
+        self.seq = 0
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.stats = {"admitted": 0, "queued": 0, "throttled": 0, "backoffs": 0}
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _need(self, priority: int) -> float:
+        return 1.0 + (self.burst * BACKGROUND_RESERVE if priority == BACKGROUND else 0.0)
+
+    def eta(self, priority: int) -> float:
+        """Perkiraan detik sampai panggilan dengan prioritas ini diizinkan."""
+        now = time.monotonic()
+        self._refill(now)
+        ahead = sum(1 for p, _, f in self.waiters if p <= priority and not f.done())
+        deficit = ahead + self._need(priority) - self.tokens
+        wait = deficit / self.rate if deficit > 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    async def acquire(self, priority: int, max_wait: float):
+        now = time.monotonic()
+        self._refill(now)
+        if not self.waiters and now >= self.paused_until and self.tokens >= self._need(priority):
+            self.tokens -= 1
+            self.stats["admitted"] += 1
+            return
+        if self.eta(priority) > max_wait:
+            self.stats["throttled"] += 1
+            raise QuotaExceeded(self.name)
+        fut = asyncio.get_running_loop().create_future()
+        self.seq += 1
+        heapq.heappush(self.waiters, (priority, self.seq, fut))
+        self.stats["queued"] += 1
+        self._schedule()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.tokens += 1  # token sudah diberikan tapi pemanggil batal: kembalikan
+            raise
+        self.stats["admitted"] += 1
+
+    def _schedule(self):
+        # Selalu hitung ulang: waiter baru bisa lebih prioritas dari kepala lama.
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        if not self.waiters:
+            return
+        now = time.monotonic()
+        priority = self.waiters[0][0]
+        deficit = self._need(priority) - self.tokens
+        delay = max(deficit / self.rate if deficit > 0 else 0.0, self.paused_until - now)
+        self.handle = asyncio.get_running_loop().call_later(delay, self._drain)
+
+    def _drain(self):
+        self.handle = None
+        now = time.monotonic()
+        self._refill(now)
+        while self.waiters and now >= self.paused_until:
+            priority, _, fut = self.waiters[0]
+            if fut.done():
+                heapq.heappop(self.waiters)
+                continue
+            if self.tokens < self._need(priority):
+                break
+            heapq.heappop(self.waiters)
+            self.tokens -= 1
+            fut.set_result(None)
+        self._schedule()
+
+    def backoff(self, seconds: float):
+        """Upstream membalas 429: kosongkan bucket dan tahan selama `seconds`."""
+        self.tokens = min(self.tokens, 0.0)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.stats["backoffs"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            **self.stats,
+            "rate_per_s": round(self.rate, 3),
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "waiting": sum(1 for _, _, f in self.waiters if not f.done()),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+        }
+
+_buckets: Dict[str, Bucket] = {}
+
+def _bucket(provider: str) -> Optional[Bucket]:
+    if not ENABLED:
+        return None
+    name = BUCKET_OF.get(provider, provider)
+    b = _buckets.get(name)
+    if b is None:
+        limit = _LIMITS.get(name)
+        if limit is None:
+            return None  # provider tanpa batas yang diketahui (mis. disk)
+        b = _buckets[name] = Bucket(name, *limit)
+    return b
+
+async def acquire(provider: str, max_wait: Optional[float] = None):
+    """
+    Tunggu giliran kuota provider sesuai prioritas context saat ini.
+    Raise QuotaExceeded kalau perkiraan tunggu melebihi max_wait.
+    """
+    b = _bucket(provider)
+    if b is None:
+        return
+    priority = _priority.get()
+    if max_wait is None:
+        max_wait = MAX_WAIT_BACKGROUND if priority == BACKGROUND else MAX_WAIT
+    await b.acquire(priority, max_wait)
+
+def admit_within(provider: str, ms: float) -> bool:
+    """Apakah panggilan ke provider ini (prioritas context saat ini) bisa jalan dalam `ms` milidetik."""
+    b = _bucket(provider)
+    return b is None or b.eta(_priority.get()) * 1000 <= ms
+
+def backoff(provider: str, seconds: float):
+    b = _bucket(provider)
+    if b is not None:
+        b.backoff(seconds)
+
+def quota_stats() -> Dict[str, Any]:
+    return {name: b.snapshot() for name, b in sorted(_buckets.items())}
@@ -1,14 +1,51 @@
 import os
 import json
-from typing import Optional, Dict, Any, List
-from utils.cache import cached
+import time
+import asyncio
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+from utils import quota
+from utils.executor import run_blocking
+
+log = logging.getLogger(__name__)
 
 _gspread = None
 _gclient = None
 _gsheet = None
+_worksheets: Dict[str, Any] = {}
+
+# Snapshot tab `settings`: satu batch read seluruh tab ke dict di memori,
+# di-refresh di latar belakang tiap SETTINGS_REFRESH detik (default 30).
+SETTINGS_REFRESH = float(os.getenv("SETTINGS_REFRESH", "30"))
+_settings: Optional[Dict[str, str]] = None
+_settings_ts = 0.0          # monotonic; waktu percobaan load terakhir
+_settings_error: Optional[str] = None
+_settings_inflight: Optional[asyncio.Task] = None
+_settings_loop: Optional[asyncio.Task] = None
+
+# Base URL Sheets API alternatif (mis. server lokal bench/load_bench.py);
+# kalau diisi, request tidak diautentikasi dan GOOGLE_CREDENTIALS_JSON tidak dipakai.
+SHEETS_API_URL = os.getenv("SHEETS_API_URL", "").rstrip("/")
+_SHEETS_API_DEFAULT = "https://sheets.googleapis.com"
+
+def _rewriting_session(base: str):
+    import requests
+
+    class _Session(requests.Session):
+        def request(self, method, url, *args, **kwargs):
+            if url.startswith(_SHEETS_API_DEFAULT):
+                url = base + url[len(_SHEETS_API_DEFAULT):]
+            return super().request(method, url, *args, **kwargs)
+
+    return _Session()
 
 def _ensure_gspread():
     global _gspread, _gclient, _gsheet
+    if _gspread is None and SHEETS_API_URL:
+        import gspread
+        _gspread = gspread
+        _gclient = gspread.Client(auth=None, session=_rewriting_session(SHEETS_API_URL))
+        _gsheet = _gclient.open_by_key(os.getenv("SHEET_ID") or "local")
     if _gspread is None:
         import gspread
         from google.oauth2.service_account import Credentials
@@ -30,66 +67,239 @@ def _ensure_gspread():
         _gsheet = _gclient.open_by_key(sheet_id)
 
 def _worksheet(name: str):
+    ws = _worksheets.get(name)
+    if ws is not None:
+        return ws
     _ensure_gspread()
     try:
-        return _gsheet.worksheet(name)
+        ws = _gsheet.worksheet(name)
     except Exception:
-        return _gsheet.add_worksheet(title=name, rows=100, cols=10)
+        ws = _gsheet.add_worksheet(title=name, rows=100, cols=10)
+    _worksheets[name] = ws
+    return ws
 
-@cached(ttl=30)
-async def get_setting(key: str) -> Optional[str]:
+# ===== Blocking gspread calls (dijalankan di executor) =====
+def _load_settings_sync() -> Dict[str, str]:
     ws = _worksheet("settings")
-    header = ws.row_values(1)
-    if not header:
+    rows = ws.get_all_values()
+    if not rows or not rows[0]:
         ws.update("A1:B1", [["key", "value"]])
-        return None
-    keys = ws.col_values(1)
-    values = ws.col_values(2)
-    mapping = {k: v for k, v in zip(keys[1:], values[1:])}
-    return mapping.get(key)
+        return {}
+    return {r[0]: r[1] for r in rows[1:] if len(r) >= 2 and r[0]}
 
-@cached(ttl=10)
-async def get_watchlist() -> List[str]:
+def _apply_watch_ops(items: List[str], ops: List[Tuple[str, str]]) -> List[str]:
+    out = list(items)
+    index = set(out)
+    for op, asset in ops:
+        if op == "add" and asset not in index:
+            out.append(asset)
+            index.add(asset)
+        elif op == "del" and asset in index:
+            out.remove(asset)
+            index.discard(asset)
+    return out
+
+def _read_watchlist_sync() -> List[str]:
     ws = _worksheet("watchlist")
-    header = ws.row_values(1)
-    if not header:
+    col = ws.col_values(1)
+    if not col:
         ws.update("A1:A1", [["asset"]])
         return []
-    assets = ws.col_values(1)[1:]
-    return [a for a in assets if a.strip()]
+    return [a.strip() for a in col[1:] if a.strip()]
 
-async def add_watch(asset: str):
+def _flush_watch_sync(ops: List[Tuple[str, str]]) -> List[str]:
+    """Baca kolom A, terapkan ops, tulis balik dengan satu batch_update."""
     ws = _worksheet("watchlist")
-    wl = await get_watchlist()
-    if asset in wl:
+    col = ws.col_values(1)
+    rows = col[1:] if col else []
+    items = _apply_watch_ops([a.strip() for a in rows if a.strip()], ops)
+    updates = []
+    if not col:
+        updates.append({"range": "A1:A1", "values": [["asset"]]})
+    n = max(len(rows), len(items))
+    if n:
+        # Baris sisa dikosongkan supaya hapus tidak meninggalkan data lama.
+        values = [[a] for a in items] + [[""]] * (n - len(items))
+        updates.append({"range": f"A2:A{n + 1}", "values": values})
+    if updates:
+        ws.batch_update(updates)
+    return items
+
+# ===== Public API =====
+async def _refresh_settings():
+    global _settings, _settings_ts, _settings_error
+    _settings_ts = time.monotonic()
+    try:
+        _settings = await run_blocking("sheets", _load_settings_sync)
+        _settings_error = None
+    except Exception as e:
+        _settings_error = str(e)
+        raise
+
+def _kick_settings_refresh() -> asyncio.Task:
+    global _settings_inflight
+    if _settings_inflight is None or _settings_inflight.done():
+        _settings_inflight = asyncio.ensure_future(_refresh_settings())
+        _settings_inflight.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return _settings_inflight
+
+async def get_setting(key: str) -> Optional[str]:
+    """
+    Baca dari snapshot settings. Hanya load pertama yang menunggu Sheets;
+    setelah itu snapshot basi dipakai dulu sambil refresh jalan di belakang.
+    """
+    stale = time.monotonic() - _settings_ts >= SETTINGS_REFRESH
+    if _settings is None:
+        if not stale and _settings_error:
+            raise RuntimeError(_settings_error)
+        await asyncio.shield(_kick_settings_refresh())
+    elif stale:
+        _kick_settings_refresh()
+    return _settings.get(key)
+
+async def _settings_refresh_loop():
+    quota.set_priority(quota.BACKGROUND)
+    while True:
+        try:
+            await asyncio.shield(_kick_settings_refresh())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("settings refresh error: %s", e)
+        await asyncio.sleep(SETTINGS_REFRESH)
+
+def start_settings_refresh():
+    global _settings_loop
+    if _settings_loop is None:
+        _settings_loop = asyncio.create_task(_settings_refresh_loop())
+
+async def stop_settings_refresh():
+    global _settings_loop
+    if _settings_loop is not None:
+        _settings_loop.cancel()
+        try:
+            await _settings_loop
+        except asyncio.CancelledError:
+            pass
+        _settings_loop = None
+
+# ===== Watchlist mirror =====
+# Mirror di memori (list + set index) dengan mutasi write-behind: add/del
+# langsung mengubah mirror dan masuk antrian, lalu di-flush ke Sheet sebagai
+# satu batch_update tiap WATCHLIST_FLUSH detik. Tiap WATCHLIST_RECONCILE
+# detik mirror disamakan lagi dengan Sheet (Sheet tetap sumber kebenaran,
+# ditambah mutasi yang belum ter-flush).
+WATCHLIST_FLUSH = float(os.getenv("WATCHLIST_FLUSH", "5"))
+WATCHLIST_RECONCILE = float(os.getenv("WATCHLIST_RECONCILE", "60"))
+_wl_items: Optional[List[str]] = None
+_wl_index: set = set()
+_wl_pending: List[Tuple[str, str]] = []
+_wl_lock: Optional[asyncio.Lock] = None
+_wl_synced = 0.0
+_wl_loop: Optional[asyncio.Task] = None
+
+def _wl_set(items: List[str]):
+    global _wl_items, _wl_index
+    _wl_items = items
+    _wl_index = set(items)
+
+def _get_wl_lock() -> asyncio.Lock:
+    global _wl_lock
+    if _wl_lock is None:
+        _wl_lock = asyncio.Lock()
+    return _wl_lock
+
+async def reconcile_watchlist():
+    global _wl_synced
+    async with _get_wl_lock():
+        items = await run_blocking("sheets", _read_watchlist_sync)
+        _wl_set(_apply_watch_ops(items, _wl_pending))
+        _wl_synced = time.monotonic()
+
+async def flush_watchlist():
+    global _wl_synced
+    async with _get_wl_lock():
+        if not _wl_pending:
+            return
+        ops = list(_wl_pending)
+        items = await run_blocking("sheets", _flush_watch_sync, ops)
+        del _wl_pending[:len(ops)]
+        _wl_set(_apply_watch_ops(items, _wl_pending))
+        _wl_synced = time.monotonic()
+
+async def _ensure_watchlist():
+    if _wl_items is None:
+        await reconcile_watchlist()
+
+async def get_watchlist() -> List[str]:
+    await _ensure_watchlist()
+    return list(_wl_items)
+
+async def add_watch(asset: str):
+    asset = asset.strip()
+    await _ensure_watchlist()
+    if asset in _wl_index:
         return True, "Sudah ada di watchlist"
-    ws.append_row([asset])
+    _wl_items.append(asset)
+    _wl_index.add(asset)
+    _wl_pending.append(("add", asset))
     return True, f"Ditambahkan: {asset}"
 
 async def del_watch(asset: str):
-    ws = _worksheet("watchlist")
-    data = ws.col_values(1)
-    for idx, val in enumerate(data, start=1):
-        if val.strip() == "asset":
-            continue
-        if val.strip() == asset:
-            ws.delete_rows(idx)
-            return True, f"Dihapus: {asset}"
-    return False, "Tidak ditemukan"
+    asset = asset.strip()
+    await _ensure_watchlist()
+    if asset not in _wl_index:
+        return False, "Tidak ditemukan"
+    _wl_items.remove(asset)
+    _wl_index.discard(asset)
+    _wl_pending.append(("del", asset))
+    return True, f"Dihapus: {asset}"
+
+async def _watchlist_sync_loop():
+    quota.set_priority(quota.BACKGROUND)
+    while True:
+        await asyncio.sleep(WATCHLIST_FLUSH)
+        try:
+            await flush_watchlist()
+            if time.monotonic() - _wl_synced >= WATCHLIST_RECONCILE:
+                await reconcile_watchlist()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("watchlist sync error: %s", e)
+
+def start_watchlist_sync():
+    global _wl_loop
+    if _wl_loop is None:
+        _wl_loop = asyncio.create_task(_watchlist_sync_loop())
+
+async def stop_watchlist_sync():
+    global _wl_loop
+    if _wl_loop is not None:
+        _wl_loop.cancel()
+        try:
+            await _wl_loop
+        except asyncio.CancelledError:
+            pass
+        _wl_loop = None
+    try:
+        await flush_watchlist()
+    except Exception as e:
+        log.warning("watchlist final flush error: %s", e)
 
 
 async def diag_info():
     ok = True
     details = {}
     try:
-        _ = _worksheet("settings")
+        _ = await run_blocking("sheets", _worksheet, "settings")
         details["settings"] = "ok"
     except Exception as e:
         ok = False
         details["settings"] = f"error: {e}"
 
     try:
-        _ = _worksheet("watchlist")
+        _ = await run_blocking("sheets", _worksheet, "watchlist")
         details["watchlist"] = "ok"
     except Exception as e:
         ok = False
@@ -0,0 +1,141 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils import metrics
+
+# Antrian update webhook: handler HTTP cuma validasi + enqueue lalu langsung
+# balas 200, pool worker yang memproses. Antrian terbatas (penuh = 503, jadi
+# Telegram mengulang nanti) dan update_id yang sudah pernah masuk dibuang.
+# Saat shutdown antrian dikuras dulu: update baru ditolak 503 (Telegram akan
+# mengirim ulang ke instance berikutnya), yang sudah di-ack diproses sampai
+# habis atau WEBHOOK_DRAIN_TIMEOUT, baru worker di-cancel.
+#
+# Config (env):
+#   WEBHOOK_QUEUE_SIZE     kapasitas antrian (default 1000)
+#   WEBHOOK_WORKERS        jumlah worker (default 8)
+#   WEBHOOK_DEDUP_SIZE     jumlah update_id terakhir yang diingat (default 5000)
+#   WEBHOOK_DRAIN_TIMEOUT  detik maksimal menguras antrian saat shutdown (default 20)
+
+QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", "5000"))
+DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "20"))
+
+log = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    pass
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_seen: "OrderedDict[int, None]" = OrderedDict()
+_draining = False
+_stats: Dict[str, Any] = {
+    "received": 0,
+    "duplicates": 0,
+    "rejected_full": 0,
+    "rejected_draining": 0,
+    "dropped_on_stop": 0,
+    "processed": 0,
+    "errors": 0,
+    "lag_last": 0.0,      # detik antri sebelum diproses
+    "lag_max": 0.0,
+    "process_last": 0.0,  # detik memproses satu update
+}
+
+def _get_queue() -> asyncio.Queue:
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    return _queue
+
+def enqueue(update_id: int, update: Any) -> bool:
+    """
+    Masukkan update ke antrian. Return False kalau duplikat (sudah pernah
+    diterima); raise QueueFull kalau antrian penuh atau sedang shutdown.
+    """
+    _stats["received"] += 1
+    if _draining:
+        _stats["rejected_draining"] += 1
+        raise QueueFull()
+    if update_id in _seen:
+        _stats["duplicates"] += 1
+        return False
+    try:
+        _get_queue().put_nowait((time.monotonic(), update))
+    except asyncio.QueueFull:
+        _stats["rejected_full"] += 1
+        raise QueueFull()
+    _seen[update_id] = None
+    if len(_seen) > DEDUP_SIZE:
+        _seen.popitem(last=False)
+    return True
+
+async def _worker(process: Callable[[Any], Awaitable[Any]]):
+    q = _get_queue()
+    while True:
+        ts, update = await q.get()
+        start = time.monotonic()
+        lag = start - ts
+        _stats["lag_last"] = lag
+        _stats["lag_max"] = max(_stats["lag_max"], lag)
+        metrics.WEBHOOK_WAIT_SECONDS.observe(lag)
+        try:
+            await process(update)
+            _stats["processed"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _stats["errors"] += 1
+            log.warning("update error: %s", e)
+        finally:
+            _stats["process_last"] = time.monotonic() - start
+            metrics.WEBHOOK_PROCESS_SECONDS.observe(_stats["process_last"])
+            q.task_done()
+
+def start_update_workers(process: Callable[[Any], Awaitable[Any]], n: int = WORKERS):
+    global _draining
+    _draining = False
+    for _ in range(max(1, n) - len(_workers)):
+        _workers.append(asyncio.create_task(_worker(process)))
+
+async def stop_update_workers(timeout: float = DRAIN_TIMEOUT):
+    """
+    Tolak update baru (503), tunggu antrian yang sudah di-ack selesai diproses
+    (maks `timeout` detik), baru cancel worker.
+    """
+    global _draining
+    _draining = True
+    q = _get_queue()
+    if _workers:
+        try:
+            await asyncio.wait_for(q.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    # Yang masih antri/diproses setelah timeout hilang; catat supaya kelihatan.
+    unfinished = q._unfinished_tasks
+    if unfinished:
+        _stats["dropped_on_stop"] += unfinished
+        log.warning("shutdown: %d update belum selesai diproses dibuang", unfinished)
+    for t in _workers:
+        t.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+def update_queue_stats() -> Dict[str, Any]:
+    q = _get_queue()
+    oldest = None
+    if q.qsize():
+        oldest = time.monotonic() - q._queue[0][0]
+    return {
+        **_stats,
+        "depth": q.qsize(),
+        "draining": _draining,
+        "capacity": QUEUE_SIZE,
+        "workers": len(_workers),
+        "oldest_wait": oldest,
+    }